@@ -1,4 +1,6 @@
+import logging
 from sqlmodel import SQLModel
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     AsyncSession,
@@ -6,11 +8,28 @@ from sqlalchemy.ext.asyncio import (
     AsyncEngine,
 )
 from sqlalchemy.exc import SQLAlchemyError
+from app.database.migrations import pending_migrations, stamp
+from app.database.schema import WaterLevelData
+from app.database.partition import ensure_partitioned_tables
 from app.settings import load_settings
 from typing import AsyncGenerator
 
-_async_engine: AsyncEngine | None
-_AsyncSessionLocal: async_sessionmaker[AsyncSession] | None
+logger = logging.getLogger(__name__)
+_async_engine: AsyncEngine | None = None
+_AsyncSessionLocal: async_sessionmaker[AsyncSession] | None = None
+
+
+def get_engine() -> AsyncEngine:
+    if _async_engine is None:
+        raise RuntimeError("init_db() must be called before get_engine()")
+    return _async_engine
+
+
+def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """获取会话工厂, 供请求之外的后台任务使用"""
+    if _AsyncSessionLocal is None:
+        raise RuntimeError("init_db() must be called before get_sessionmaker()")
+    return _AsyncSessionLocal
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
@@ -28,6 +47,12 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
 
 
 async def init_db() -> None:
+    """
+    创建连接和不存在的表
+
+    新数据库由 create_all 直接创建最新结构, 全部迁移标记为已应用;
+    已有数据库的迁移需单独执行 python -m app.database.migrations upgrade
+    """
     settings = load_settings()
 
     global _async_engine, _AsyncSessionLocal
@@ -43,5 +68,20 @@ async def init_db() -> None:
     _AsyncSessionLocal = async_sessionmaker(
         _async_engine, expire_on_commit=False, class_=AsyncSession
     )
+    async with _async_engine.connect() as conn:
+        fresh = not await conn.run_sync(
+            lambda sync: inspect(sync).has_table(WaterLevelData.__tablename__)
+        )
+    await ensure_partitioned_tables(_async_engine)
     async with _async_engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
+    if fresh:
+        await stamp(_async_engine)
+        return
+    pending = await pending_migrations(_async_engine)
+    if pending:
+        logger.warning(
+            "有 %d 个未应用的数据库迁移 %s, 请执行 python -m app.database.migrations upgrade",
+            len(pending),
+            [migration.version for migration in pending],
+        )
@@ -0,0 +1,366 @@
+"""
+数据库迁移
+
+create_all 只会创建不存在的表, 无法给已有数据库补充索引或约束;
+这里按版本号顺序执行迁移, 已执行的版本记录在 schemamigration 表中;
+迁移不在应用启动时执行, 发布时单独运行一次 upgrade, 启动时只提示未应用的迁移
+
+用法:
+    python -m app.database.migrations upgrade   执行未应用的迁移
+    python -m app.database.migrations upgrade --delete-duplicates
+                                                建唯一索引前删除重复数据, 保留最新写入的一条
+    python -m app.database.migrations status    查看迁移状态
+    python -m app.database.migrations explain   打印热点查询的执行计划
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+from dotenv import load_dotenv
+from pydantic import BaseModel
+from sqlalchemy import Executable, func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlmodel import SQLModel
+from app.database.schema import SchemaMigration, Station, User, WaterLevelData, RainfallData
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock 的键, 同时只允许一个进程执行迁移
+MIGRATION_LOCK_KEY = 0x5348_4D49
+
+
+class MigrationError(Exception):
+    """迁移需要人工确认或处理时抛出"""
+
+
+class Migration(BaseModel):
+    version: int
+    name: str
+    # 按数据库方言给出的SQL语句, "default" 用于未单独列出的方言
+    statements: dict[str, list[str]]
+    # PostgreSQL 的 CREATE INDEX CONCURRENTLY 不能在事务中执行
+    transactional: bool = True
+    # 迁移创建的索引; PostgreSQL 上全部存在且有效时直接标记为已应用,
+    # CONCURRENTLY 建索引失败留下的无效索引在执行前删除
+    indexes: list[str] = []
+    # 建唯一索引 (station_id, measure_at) 的表, 有重复数据时需确认后才删除
+    deduplicate: str | None = None
+
+    def statements_for(self, dialect: str) -> list[str]:
+        return self.statements.get(dialect, self.statements.get("default", []))
+
+
+def _measurement_index_statements(table: str) -> dict[str, list[str]]:
+    index = f"ux_{table}_station_measure"
+    return {
+        "postgresql": [
+            f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {index} "
+            f"ON {table} (station_id, measure_at DESC) INCLUDE (value)",
+            f"DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_station_id",
+        ],
+        "default": [
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {table} (station_id, measure_at DESC)",
+            f"DROP INDEX IF EXISTS ix_{table}_station_id",
+        ],
+    }
+
+
+def _duplicates_statement(table: str) -> str:
+    """与同一测站同一时刻的其他数据重复、将被删除的行数"""
+    return (
+        f"SELECT COALESCE(SUM(n - 1), 0) FROM "
+        f"(SELECT COUNT(*) AS n FROM {table} GROUP BY station_id, measure_at HAVING COUNT(*) > 1) d"
+    )
+
+
+def _delete_duplicates_statement(dialect: str, table: str) -> str:
+    """删除重复数据, 保留最新写入（id最大）的一条"""
+    if dialect == "postgresql":
+        return (
+            f"DELETE FROM {table} a USING {table} b "
+            f"WHERE a.station_id = b.station_id AND a.measure_at = b.measure_at AND a.id < b.id"
+        )
+    return (
+        f"DELETE FROM {table} WHERE id NOT IN "
+        f"(SELECT MAX(id) FROM {table} GROUP BY station_id, measure_at)"
+    )
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(
+        version=1,
+        name="waterleveldata_station_measure_index",
+        statements=_measurement_index_statements("waterleveldata"),
+        transactional=False,
+        indexes=["ux_waterleveldata_station_measure"],
+        deduplicate="waterleveldata",
+    ),
+    Migration(
+        version=2,
+        name="rainfalldata_station_measure_index",
+        statements=_measurement_index_statements("rainfalldata"),
+        transactional=False,
+        indexes=["ux_rainfalldata_station_measure"],
+        deduplicate="rainfalldata",
+    ),
+    Migration(
+        version=3,
+        name="alert_open_index",
+        statements={
+            "postgresql": [
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_alert_open "
+                "ON alert (trigger_at DESC, station_id) WHERE status <> 'RESOLVED'",
+            ],
+            "default": [
+                "CREATE INDEX IF NOT EXISTS ix_alert_open "
+                "ON alert (trigger_at DESC, station_id) WHERE status <> 'RESOLVED'",
+            ],
+        },
+        transactional=False,
+        indexes=["ix_alert_open"],
+    ),
+    Migration(
+        version=4,
+        name="station_listing_indexes",
+        statements={
+            "postgresql": [
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_station_city_active "
+                "ON station (city_id, is_active, id)",
+                # 非C排序规则下 LIKE 'abc%' 只能使用 text_pattern_ops 索引
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_station_name_pattern "
+                "ON station (name text_pattern_ops)",
+            ],
+            "default": [
+                "CREATE INDEX IF NOT EXISTS ix_station_city_active "
+                "ON station (city_id, is_active, id)",
+            ],
+        },
+        transactional=False,
+        indexes=["ix_station_city_active", "ix_station_name_pattern"],
+    ),
+]
+
+
+async def _applied_versions(conn: AsyncConnection) -> set[int]:
+    result = await conn.execute(select(SchemaMigration.version))
+    return set(result.scalars().all())
+
+
+async def _index_validity(conn: AsyncConnection, indexes: list[str]) -> dict[str, bool]:
+    """PostgreSQL 上已存在的索引及其是否有效"""
+    result = await conn.execute(
+        text(
+            "SELECT c.relname, i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = ANY(:names)"
+        ),
+        {"names": indexes},
+    )
+    return {name: valid for name, valid in result.all()}
+
+
+async def _prepare_indexes(engine: AsyncEngine, migration: Migration) -> bool:
+    """
+    检查迁移创建的索引, 全部存在且有效时返回True;
+    删除无效的索引, 否则 CREATE INDEX IF NOT EXISTS 会把它当作已存在而跳过
+    """
+    if engine.dialect.name != "postgresql" or not migration.indexes:
+        return False
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        validity = await _index_validity(conn, migration.indexes)
+        for name, valid in validity.items():
+            if not valid:
+                logger.warning("删除无效的索引 %s 后重新创建", name)
+                await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    return len(validity) == len(migration.indexes) and all(validity.values())
+
+
+async def _deduplicate(engine: AsyncEngine, table: str, delete_duplicates: bool) -> None:
+    async with engine.begin() as conn:
+        duplicates = (await conn.execute(text(_duplicates_statement(table)))).scalar_one()
+        if not duplicates:
+            return
+        if not delete_duplicates:
+            raise MigrationError(
+                f"{table} 中有 {duplicates} 行同一测站同一时刻的重复数据, "
+                f"确认删除后使用 --delete-duplicates 重新执行"
+            )
+        await conn.execute(text(_delete_duplicates_statement(engine.dialect.name, table)))
+    logger.warning("删除 %s 中 %d 行重复数据", table, duplicates)
+
+
+async def _run(engine: AsyncEngine, migration: Migration) -> None:
+    statements = migration.statements_for(engine.dialect.name)
+    if migration.transactional:
+        async with engine.begin() as conn:
+            for statement in statements:
+                await conn.execute(text(statement))
+        return
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for statement in statements:
+            await conn.execute(text(statement))
+
+
+async def _record(engine: AsyncEngine, migrations: list[Migration]) -> None:
+    async with engine.begin() as conn:
+        for migration in migrations:
+            await conn.execute(
+                SchemaMigration.__table__.insert().values(  # type: ignore
+                    version=migration.version, name=migration.name
+                )
+            )
+
+
+async def pending_migrations(engine: AsyncEngine) -> list[Migration]:
+    async with engine.connect() as conn:
+        applied = await _applied_versions(conn)
+    return [m for m in sorted(MIGRATIONS, key=lambda m: m.version) if m.version not in applied]
+
+
+async def stamp(engine: AsyncEngine) -> None:
+    """将全部迁移标记为已应用, 用于由 create_all 直接创建最新结构的新数据库"""
+    await _record(engine, await pending_migrations(engine))
+
+
+async def migrate(engine: AsyncEngine, delete_duplicates: bool = False) -> list[int]:
+    """
+    执行所有未应用的迁移, 返回本次执行的版本号
+
+    PostgreSQL 上持有 advisory lock, 多个进程同时执行时依次进行, 后执行的进程跳过已应用的版本;
+    有重复数据时抛出 MigrationError, delete_duplicates 为True时删除重复数据
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all, tables=[SchemaMigration.__table__])
+
+    async with engine.connect() as lock:
+        # 自动提交, 等待锁的连接不会开启事务而阻塞 CREATE INDEX CONCURRENTLY
+        lock = await lock.execution_options(isolation_level="AUTOCOMMIT")
+        locked = engine.dialect.name == "postgresql"
+        if locked:
+            await lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            executed = []
+            for migration in await pending_migrations(engine):
+                if not await _prepare_indexes(engine, migration):
+                    if migration.deduplicate is not None:
+                        await _deduplicate(engine, migration.deduplicate, delete_duplicates)
+                    await _run(engine, migration)
+                await _record(engine, [migration])
+                executed.append(migration.version)
+            return executed
+        finally:
+            if locked:
+                await lock.execute(
+                    text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY}
+                )
+
+
+def hot_queries(dialect: str) -> dict[str, Executable]:
+    """热点查询, 用于升级后检查索引是否生效"""
+    from app.services.series import Aggregation, bucket_expression
+
+    station_id = 1
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=30)
+    from app.services.alerts import open_alerts_statement
+    from app.services.station_list import name_prefix
+
+    queries: dict[str, Executable] = {
+        "用户认证": select(User).where(User.username == "admin"),
+        "未解除报警": open_alerts_statement(None, 100),
+        "城市未解除报警": open_alerts_statement([1, 2, 3], 100),
+        "城市启用测站列表": select(Station.id, Station.name)
+        .where(Station.city_id == 1, Station.is_active.is_(True), Station.id > 100)  # type: ignore
+        .order_by(Station.id)  # type: ignore
+        .limit(100),
+        "测站名称前缀": select(Station.id, Station.name)
+        .where(name_prefix(dialect, "水文"))
+        .order_by(Station.id)  # type: ignore
+        .limit(100),
+    }
+    for label, model in (("水位", WaterLevelData), ("雨量", RainfallData)):
+        queries[f"{label}最新数据"] = (
+            select(model)
+            .where(model.station_id == station_id)
+            .order_by(model.measure_at.desc())  # type: ignore
+            .limit(100)
+        )
+        # 分区表上应只扫描范围内的分区
+        queries[f"{label}时间段原始数据"] = (
+            select(model.measure_at, model.value)
+            .where(
+                model.station_id == station_id,
+                model.measure_at >= start,  # type: ignore
+                model.measure_at < end,  # type: ignore
+            )
+            .order_by(model.measure_at)  # type: ignore
+        )
+        bucket = bucket_expression(
+            dialect,
+            model.measure_at,  # type: ignore
+            Aggregation.DAY,
+        ).label("bucket")
+        queries[f"{label}按天聚合"] = (
+            select(bucket, func.avg(model.value), func.count())
+            .where(
+                model.station_id == station_id,
+                model.measure_at >= start,  # type: ignore
+                model.measure_at < end,  # type: ignore
+            )
+            .group_by(bucket)
+        )
+    return queries
+
+
+async def explain(engine: AsyncEngine, print_fn: Callable[[str], None] = print) -> None:
+    """打印每个热点查询的执行计划"""
+    dialect = engine.dialect.name
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+    async with engine.connect() as conn:
+        for name, statement in hot_queries(dialect).items():
+            compiled = statement.compile(
+                dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+            )
+            sql = str(compiled)
+            print_fn(f"== {name}")
+            print_fn(sql)
+            for row in (await conn.execute(text(prefix + sql))).all():
+                print_fn("  " + " | ".join(str(column) for column in row))
+            print_fn("")
+
+
+async def _main(command: str, delete_duplicates: bool) -> None:
+    from app.database.engine import init_db, get_engine
+
+    await init_db()
+    engine = get_engine()
+    try:
+        if command == "upgrade":
+            executed = await migrate(engine, delete_duplicates=delete_duplicates)
+            print(f"迁移完成, 执行版本: {executed}" if executed else "没有未应用的迁移")
+        elif command == "status":
+            async with engine.connect() as conn:
+                applied = await _applied_versions(conn)
+            for migration in MIGRATIONS:
+                state = "已应用" if migration.version in applied else "未应用"
+                print(f"{migration.version:>4}  {state}  {migration.name}")
+        elif command == "explain":
+            await explain(engine)
+    except MigrationError as e:
+        print(f"迁移中止: {e}")
+        sys.exit(1)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="数据库迁移工具")
+    parser.add_argument("command", choices=["upgrade", "status", "explain"])
+    parser.add_argument("--delete-duplicates", action="store_true", help="建唯一索引前删除重复数据")
+    args = parser.parse_args()
+    asyncio.run(_main(args.command, args.delete_duplicates))
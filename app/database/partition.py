@@ -0,0 +1,292 @@
+"""
+测量数据按月分区
+
+仅在 PostgreSQL 且开启 database.partition_by_month 时生效, 其他情况下保持普通表;
+分区由应用启动时和后台任务按月预先创建, 删除整月数据只需删除对应分区;
+不在已建分区范围内的数据写入 DEFAULT 分区, 之后创建对应月份的分区时移入该分区
+
+用法:
+    python -m app.database.partition status          查看分区
+    python -m app.database.partition convert         将已有的普通表转换为分区表
+    python -m app.database.partition drop --before 2024-01
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import date, datetime, timezone
+from dotenv import load_dotenv
+from sqlalchemy import MetaData, PrimaryKeyConstraint, Table, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from app.database.schema import WaterLevelData, RainfallData
+from app.settings import load_settings
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES: list[Table] = [
+    WaterLevelData.__table__,  # type: ignore
+    RainfallData.__table__,  # type: ignore
+]
+
+_maintainer: asyncio.Task | None = None
+
+
+def partitioning_enabled(engine: AsyncEngine) -> bool:
+    return engine.dialect.name == "postgresql" and load_settings().database.partition_by_month
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def partitioned_table(table: Table) -> Table:
+    """
+    生成分区表定义
+
+    分区表的主键和唯一索引必须包含分区键, 因此主键改为 (id, measure_at)
+    """
+    copy = table.to_metadata(MetaData())
+    copy.c.measure_at.nullable = False
+    copy.c.measure_at.primary_key = True
+    copy.c.id.autoincrement = True
+    copy.append_constraint(PrimaryKeyConstraint("id", "measure_at"))
+    copy.dialect_options["postgresql"]["partition_by"] = "RANGE (measure_at)"
+    return copy
+
+
+async def relkind(conn: AsyncConnection, table: str) -> str | None:
+    """返回表类型: p 为分区表, r 为普通表, 不存在时为None"""
+    statement = text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)")
+    return (await conn.execute(statement, {"table": table})).scalar()
+
+
+async def list_partitions(conn: AsyncConnection, table: str) -> list[str]:
+    statement = text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+    )
+    return list((await conn.execute(statement, {"table": table})).scalars().all())
+
+
+async def create_default_partition(conn: AsyncConnection, table: str) -> None:
+    default = default_partition_name(table)
+    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {default} PARTITION OF {table} DEFAULT"))
+
+
+async def create_partition(conn: AsyncConnection, table: str, month: date) -> None:
+    """
+    创建月份分区
+
+    DEFAULT 分区中已有该月数据时不能直接创建, 先建同结构的表并把数据移入, 再挂载为分区
+    """
+    name = partition_name(table, month)
+    if await relkind(conn, name) is not None:
+        return
+    start, end = month, add_months(month, 1)
+    # asyncpg 按列类型 timestamptz 编码参数, 需传入带时区的 datetime
+    params = {
+        "start": datetime(start.year, start.month, 1, tzinfo=timezone.utc),
+        "end": datetime(end.year, end.month, 1, tzinfo=timezone.utc),
+    }
+    bounds = f"FROM ('{start:%Y-%m-%d} 00:00:00+00') TO ('{end:%Y-%m-%d} 00:00:00+00')"
+    default = default_partition_name(table)
+    misplaced = None
+    if await relkind(conn, default) is not None:
+        statement = text(
+            f"SELECT 1 FROM {default} WHERE measure_at >= :start AND measure_at < :end LIMIT 1"
+        )
+        misplaced = (await conn.execute(statement, params)).first()
+    if misplaced is None:
+        await conn.execute(text(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}"))
+        return
+    await conn.execute(
+        text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    )
+    result = await conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {default} "
+            f"WHERE measure_at >= :start AND measure_at < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        params,
+    )
+    await conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    logger.info("从 %s 移入 %d 行数据到新分区 %s", default, result.rowcount, name)
+
+
+async def create_partitions(engine: AsyncEngine, first: date | None = None) -> None:
+    """创建从 first（默认为 months_behind 个月前）到 months_ahead 个月后的所有分区"""
+    settings = load_settings().database
+    this_month = date.today().replace(day=1)
+    month = first or add_months(this_month, -settings.partition_months_behind)
+    last = add_months(this_month, settings.partition_months_ahead)
+    async with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            if await relkind(conn, table.name) != "p":
+                continue
+            await create_default_partition(conn, table.name)
+            current = month
+            while current <= last:
+                await create_partition(conn, table.name, current)
+                current = add_months(current, 1)
+
+
+async def ensure_partitioned_tables(engine: AsyncEngine) -> None:
+    """在 create_all 之前创建分区表, 已存在的普通表只给出提示, 需手动执行 convert"""
+    if not partitioning_enabled(engine):
+        return
+    async with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            kind = await relkind(conn, table.name)
+            if kind is None:
+                await conn.run_sync(partitioned_table(table).create)
+            elif kind != "p":
+                logger.warning(
+                    "%s 是普通表, 请执行 python -m app.database.partition convert 转换为分区表",
+                    table.name,
+                )
+    await create_partitions(engine)
+
+
+async def convert_table(engine: AsyncEngine, table: Table) -> None:
+    """将普通表转换为分区表, 在一个事务中完成, 期间会锁表"""
+    name, legacy = table.name, f"{table.name}_legacy"
+    async with engine.begin() as conn:
+        if await relkind(conn, name) != "r":
+            return
+        await conn.execute(text(f"ALTER TABLE {name} RENAME TO {legacy}"))
+        await conn.execute(text(f"ALTER TABLE {legacy} DROP CONSTRAINT IF EXISTS {name}_pkey"))
+        for index in table.indexes:
+            await conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        await conn.execute(
+            text(f"ALTER SEQUENCE IF EXISTS {name}_id_seq RENAME TO {legacy}_id_seq")
+        )
+        await conn.run_sync(partitioned_table(table).create)
+        await create_default_partition(conn, name)
+
+        first = (await conn.execute(text(f"SELECT min(measure_at) FROM {legacy}"))).scalar()
+        settings = load_settings().database
+        this_month = date.today().replace(day=1)
+        month = first.astimezone(timezone.utc).date().replace(day=1) if first else this_month
+        last = add_months(this_month, settings.partition_months_ahead)
+        while month <= last:
+            await create_partition(conn, name, month)
+            month = add_months(month, 1)
+
+        columns = ", ".join(column.name for column in table.columns)
+        await conn.execute(text(f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {legacy}"))
+        await conn.execute(
+            text(
+                f"SELECT setval('{name}_id_seq', "
+                f"(SELECT coalesce(max(id), 0) + 1 FROM {name}), false)"
+            )
+        )
+        await conn.execute(text(f"DROP TABLE {legacy}"))
+
+
+async def drop_partitions_before(
+    engine: AsyncEngine, before: date, tables: list[str] | None = None
+) -> list[str]:
+    """
+    删除结束时间不晚于 before 所在月初的分区, 返回被删除的分区名; tables 为空时处理全部表
+
+    DEFAULT 分区中早于该时间的数据逐行删除
+    """
+    if not partitioning_enabled(engine):
+        return []
+    cutoff = before.replace(day=1)
+    dropped = []
+    async with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            if tables is not None and table.name not in tables:
+                continue
+            default = default_partition_name(table.name)
+            if await relkind(conn, default) is not None:
+                await conn.execute(
+                    text(f"DELETE FROM {default} WHERE measure_at < :cutoff"),
+                    {"cutoff": datetime(cutoff.year, cutoff.month, 1, tzinfo=timezone.utc)},
+                )
+            for partition in await list_partitions(conn, table.name):
+                suffix = partition.removeprefix(f"{table.name}_p")
+                if not suffix.isdigit():
+                    continue
+                month = date(int(suffix[:4]), int(suffix[4:]), 1)
+                if add_months(month, 1) <= cutoff:
+                    await conn.execute(text(f"DROP TABLE {partition}"))
+                    dropped.append(partition)
+    return dropped
+
+
+async def _maintain(engine: AsyncEngine, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await create_partitions(engine, first=date.today().replace(day=1))
+        except Exception:
+            logger.exception("预创建分区失败")
+
+
+def start_partition_maintainer() -> None:
+    """后台定期预创建未来月份的分区"""
+    from app.database.engine import get_engine
+
+    global _maintainer
+    engine = get_engine()
+    if partitioning_enabled(engine) and _maintainer is None:
+        _maintainer = asyncio.create_task(_maintain(engine, interval=86400))
+
+
+async def stop_partition_maintainer() -> None:
+    global _maintainer
+    if _maintainer is not None:
+        _maintainer.cancel()
+        try:
+            await _maintainer
+        except asyncio.CancelledError:
+            pass
+        _maintainer = None
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from app.database.engine import init_db, get_engine
+
+    await init_db()
+    engine = get_engine()
+    if not partitioning_enabled(engine):
+        print("未启用分区（需要 PostgreSQL 并设置 database.partition_by_month）")
+    elif args.command == "status":
+        async with engine.connect() as conn:
+            for table in PARTITIONED_TABLES:
+                partitions = await list_partitions(conn, table.name)
+                print(f"{table.name}: {await relkind(conn, table.name)}")
+                for partition in partitions:
+                    print(f"  {partition}")
+    elif args.command == "convert":
+        for table in PARTITIONED_TABLES:
+            await convert_table(engine, table)
+        print("转换完成")
+    elif args.command == "drop":
+        if args.before is None:
+            raise SystemExit("drop 需要指定 --before YYYY-MM")
+        before = datetime.strptime(args.before, "%Y-%m").date()
+        for partition in await drop_partitions_before(engine, before):
+            print(f"已删除 {partition}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="测量数据分区工具")
+    parser.add_argument("command", choices=["status", "convert", "drop"])
+    parser.add_argument("--before", help="drop: 删除该月（YYYY-MM）之前的分区")
+    asyncio.run(_main(parser.parse_args()))
@@ -1,8 +1,8 @@
 from datetime import datetime
-from typing import Optional
+from typing import NamedTuple, Optional
 from sqlmodel import SQLModel, Field
 from enum import Enum
-from sqlalchemy import Column, DateTime
+from sqlalchemy import Column, DateTime, Index, text
 from sqlalchemy.sql import func
 
 
@@ -17,6 +17,11 @@ class AlertType(str, Enum):
     RAINFALL = "rainfall"
 
 
+class RollupGranularity(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+
 class UserRole(str, Enum):
     ADMIN = "admin"
     USER = "user"
@@ -51,6 +56,12 @@ class City(SQLModel, table=True):
 class Station(SQLModel, table=True):
     """测站模型"""
 
+    __table_args__ = (
+        # 测站列表按城市和启用状态过滤并按id分页;
+        # PostgreSQL 上另有 text_pattern_ops 的名称索引用于前缀过滤, 见迁移 station_listing_indexes
+        Index("ix_station_city_active", "city_id", "is_active", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True)
     code: str = Field(index=True)
@@ -73,8 +84,19 @@ class Station(SQLModel, table=True):
 class WaterLevelData(SQLModel, table=True):
     """水表数据模型"""
 
+    __table_args__ = (
+        # 按测站过滤并按时间排序的覆盖索引, 同时保证同一测站同一时刻只有一条数据
+        Index(
+            "ux_waterleveldata_station_measure",
+            "station_id",
+            text("measure_at DESC"),
+            unique=True,
+            postgresql_include=["value"],
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    station_id: int = Field(default=None, index=True)
+    station_id: int = Field(default=None)
     value: float
     measure_at: datetime = Field(
         default_factory=func.now,
@@ -93,8 +115,19 @@ class WaterLevelData(SQLModel, table=True):
 class RainfallData(SQLModel, table=True):
     """雨量数据模型"""
 
+    __table_args__ = (
+        # 按测站过滤并按时间排序的覆盖索引, 同时保证同一测站同一时刻只有一条数据
+        Index(
+            "ux_rainfalldata_station_measure",
+            "station_id",
+            text("measure_at DESC"),
+            unique=True,
+            postgresql_include=["value"],
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    station_id: int = Field(default=None, index=True)
+    station_id: int = Field(default=None)
     value: float
     measure_at: datetime = Field(
         default_factory=func.now,
@@ -110,9 +143,69 @@ class RainfallData(SQLModel, table=True):
     )
 
 
+MeasurementModel = type[WaterLevelData] | type[RainfallData]
+
+
+class MeasurementRow(NamedTuple):
+    """已写入的测量数据"""
+
+    id: int
+    station_id: int
+    measure_at: datetime
+    value: float
+
+
+class RollupBase(SQLModel):
+    """按测站和时间桶汇总的统计数据"""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    station_id: int
+    granularity: RollupGranularity
+    bucket_at: datetime = Field(sa_type=DateTime(timezone=True))  # type: ignore
+    min_value: float
+    max_value: float
+    sum_value: float
+    count: int
+    first_at: datetime = Field(sa_type=DateTime(timezone=True))  # type: ignore
+    last_at: datetime = Field(sa_type=DateTime(timezone=True))  # type: ignore
+
+
+class WaterLevelRollup(RollupBase, table=True):
+    """水位汇总模型"""
+
+    __table_args__ = (
+        Index("ux_waterlevelrollup_bucket", "station_id", "granularity", "bucket_at", unique=True),
+    )
+
+
+class RainfallRollup(RollupBase, table=True):
+    """雨量汇总模型"""
+
+    __table_args__ = (
+        Index("ux_rainfallrollup_bucket", "station_id", "granularity", "bucket_at", unique=True),
+    )
+
+
+ROLLUP_MODELS: dict[MeasurementModel, type[WaterLevelRollup] | type[RainfallRollup]] = {
+    WaterLevelData: WaterLevelRollup,
+    RainfallData: RainfallRollup,
+}
+
+
 class Alert(SQLModel, table=True):
     """报警模型"""
 
+    __table_args__ = (
+        # 只包含未解除报警的部分索引, 大小与当前报警数量相关而与历史无关
+        Index(
+            "ix_alert_open",
+            text("trigger_at DESC"),
+            "station_id",
+            postgresql_where=text("status <> 'RESOLVED'"),
+            sqlite_where=text("status <> 'RESOLVED'"),
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     station_id: int = Field(default=None, index=True)
     alert_type: AlertType
@@ -139,3 +232,14 @@ class Alert(SQLModel, table=True):
         default=None,
         sa_column=Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now()),
     )
+
+
+class SchemaMigration(SQLModel, table=True):
+    """数据库迁移记录"""
+
+    version: int = Field(primary_key=True)
+    name: str
+    applied_at: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now()),
+    )
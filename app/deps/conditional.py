@@ -0,0 +1,103 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Annotated, Awaitable, Callable
+from fastapi import Depends, HTTPException, Request, Response
+from app.database.schema import MeasurementModel
+from app.services.change_markers import Validators, get_change_tracker
+from app.services.encoding import Layout, accepts_binary
+from app.services.metadata import MetadataCache, get_metadata
+
+# 条件请求的响应由客户端缓存, 每次使用前需要重新验证
+CACHE_CONTROL = "private, no-cache"
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 使用弱比较"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(",")
+    )
+
+
+def _not_modified(request: Request, validators: Validators) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # 同时提供时忽略 If-Modified-Since
+        return _etag_matches(if_none_match, validators.etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return validators.last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def _last_modified(validators: Validators) -> str | None:
+    """
+    Last-Modified 只精确到秒, 修改发生在当前这一秒内时不返回:
+    否则同一秒内的后续写入不改变该值, 只使用 If-Modified-Since 的客户端会得到过期的304
+    """
+    last_modified = validators.last_modified.replace(microsecond=0)
+    if last_modified >= datetime.now(timezone.utc).replace(microsecond=0):
+        return None
+    return format_datetime(last_modified, usegmt=True)
+
+
+def check_validators(
+    request: Request, response: Response, validators: Validators, vary: str | None = None
+) -> None:
+    """
+    条件请求命中时直接返回304, 否则在响应中加入 ETag 和 Last-Modified
+
+    作为依赖在接口函数之前执行, 命中时不执行查询也不序列化; 304与200带有相同的缓存相关响应头
+    """
+    headers = {"ETag": validators.etag, "Cache-Control": CACHE_CONTROL}
+    last_modified = _last_modified(validators)
+    if last_modified is not None:
+        headers["Last-Modified"] = last_modified
+    if vary is not None:
+        headers["Vary"] = vary
+    if _not_modified(request, validators):
+        raise HTTPException(304, headers=headers)
+    response.headers.update(headers)
+
+
+def _representation(request: Request) -> str:
+    """同一地址按 Accept 请求头和 layout 参数返回不同格式, 各格式的 ETag 不同"""
+    if accepts_binary(request.headers.get("accept")):
+        return "binary"
+    return request.query_params.get("layout", Layout.ROWS.value)
+
+
+def station_data_conditional(
+    model: MeasurementModel, require_end: bool = False
+) -> Callable[..., Awaitable[None]]:
+    """
+    按测站数据的变更标记处理条件请求
+
+    require_end 用于默认以当前时间为结束时间的接口, 未指定 end 时结果会随时间变化, 不做处理
+    """
+
+    async def dependency(request: Request, response: Response, station_id: int) -> None:
+        tracker = get_change_tracker()
+        if tracker is None or (require_end and "end" not in request.query_params):
+            return
+        validators = tracker.validators(model, station_id, _representation(request))
+        check_validators(request, response, validators, vary="Accept")
+
+    return dependency
+
+
+async def metadata_conditional(
+    request: Request,
+    response: Response,
+    metadata: Annotated[MetadataCache, Depends(get_metadata)],
+) -> None:
+    """按元数据缓存的版本处理测站/城市信息的条件请求, 只用于响应内容来自元数据缓存的接口"""
+    tracker = get_change_tracker()
+    if tracker is not None:
+        check_validators(request, response, tracker.metadata_validators(metadata))
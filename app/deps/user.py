@@ -1,31 +1,101 @@
-from fastapi import HTTPException, Header, Depends
+from fastapi import HTTPException, Header, Query
+from sqlalchemy import event, inspect
 from sqlmodel import select
 from app.database.schema import User
 import jwt
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.database.engine import get_session
+import time
+from app.database.engine import get_sessionmaker
+from app.services.ttl_cache import TTLCache, CacheStats
 from app.settings import load_settings
 from typing import Annotated
 
+_principal_cache: TTLCache[str, User] | None = None
+
+
+def get_principal_cache() -> TTLCache[str, User]:
+    """
+    已认证用户缓存, 以token为键, 有效期不超过token本身的过期时间
+
+    只缓存启用的用户; 通过ORM删除用户、修改 is_active 或密码时自动淘汰, 但只淘汰当前进程的缓存,
+    多进程部署或直接修改数据库时, 最长在 principal_ttl 秒内仍接受其token
+    """
+    global _principal_cache
+    if _principal_cache is None:
+        settings = load_settings()
+        _principal_cache = TTLCache(
+            max_size=settings.cache.principal_max_size, ttl=settings.cache.principal_ttl
+        )
+    return _principal_cache
+
+
+def evict_principal(username: str) -> int:
+    """淘汰该用户的所有缓存, 通过ORM删除或修改用户时自动调用"""
+    return get_principal_cache().evict_where(lambda _, user: user.username == username)
+
+
+@event.listens_for(User, "after_update")
+def _evict_changed_user(mapper, connection, user: User) -> None:
+    state = inspect(user)
+    if any(state.attrs[name].history.has_changes() for name in ("is_active", "password")):
+        evict_principal(user.username)
+
+
+@event.listens_for(User, "after_delete")
+def _evict_deleted_user(mapper, connection, user: User) -> None:
+    evict_principal(user.username)
+
+
+def principal_cache_stats() -> CacheStats:
+    return get_principal_cache().stats()
+
 
 async def get_current_user(
     Authorization: Annotated[str | None, Header()] = None,
-    session: AsyncSession = Depends(get_session),
 ) -> User:
     if Authorization is None:
         raise HTTPException(status_code=401, detail="请提供有效的请求头")
 
-    settings = load_settings()
-
     # 去除BEARER前缀
-    token = Authorization[7:]
-    decoded_token = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-    username = decoded_token["sub"]
-    try:
-        user = await session.execute(select(User).where(User.username == username))
-        user = user.scalars().first()
-        if user is None:
-            raise HTTPException(status_code=401, detail="未找到用户")
+    return await authenticate(Authorization[7:])
+
+
+async def get_stream_user(
+    Authorization: Annotated[str | None, Header()] = None,
+    token: Annotated[str | None, Query()] = None,
+) -> User:
+    """WebSocket/SSE 连接的认证, 浏览器无法设置请求头时通过 token 查询参数传递"""
+    if Authorization is not None:
+        return await authenticate(Authorization[7:])
+    if token is None:
+        raise HTTPException(status_code=401, detail="请提供有效的请求头")
+    return await authenticate(token)
+
+
+async def authenticate(token: str) -> User:
+    """校验jwt token并返回对应的用户"""
+    cache = get_principal_cache()
+    user = cache.get(token)
+    if user is not None:
+        if not user.is_active:
+            cache.pop(token)
+            raise HTTPException(status_code=401, detail="用户已停用")
         return user
+
+    settings = load_settings()
+    try:
+        decoded_token = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
     except jwt.exceptions.PyJWTError:
         raise HTTPException(status_code=401, detail="无效的jwt token")
+    username = decoded_token["sub"]
+
+    # 缓存未命中时才从连接池获取连接
+    async with get_sessionmaker()() as session:
+        statement = select(User).where(User.username == username)
+        user = (await session.execute(statement)).scalars().first()
+    if user is None:
+        raise HTTPException(status_code=401, detail="未找到用户")
+    if not user.is_active:
+        raise HTTPException(status_code=401, detail="用户已停用")
+    expire = decoded_token.get("exp")
+    cache.set(token, user, ttl=None if expire is None else expire - time.time())
+    return user
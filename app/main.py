@@ -3,7 +3,15 @@ from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 from app.settings import load_settings
 from app.database.engine import init_db
+from app.database.partition import start_partition_maintainer, stop_partition_maintainer
 from app.router import router_register
+from app.services.accumulation import load_accumulator
+from app.services.alerts import start_alert_engine, stop_alert_engine
+from app.services.buffer import start_write_buffer, stop_write_buffer
+from app.services.hot_tier import load_hot_tier
+from app.services.metadata import load_metadata
+from app.services.query_cache import close_query_cache
+from app.services.retention import start_retention_job, stop_retention_job
 from fastapi.middleware.cors import CORSMiddleware
 
 
@@ -12,9 +20,22 @@ async def lifespan(app: FastAPI):
     load_dotenv()
     load_settings()
     await init_db()
+    await load_metadata()
+    await load_hot_tier()
+    await load_accumulator()
+    await start_alert_engine()
+    await start_write_buffer()
+    start_partition_maintainer()
+    start_retention_job()
 
     yield
 
+    await stop_retention_job()
+    await stop_partition_maintainer()
+    await stop_write_buffer()
+    await stop_alert_engine()
+    await close_query_cache()
+
 
 app = FastAPI(lifespan=lifespan)
 app = router_register(app)
@@ -2,6 +2,9 @@ from .auth import router as auth
 from .user import router as user
 from .station import router as station
 from .data import router as data
+from .dashboard import router as dashboard
+from .live import router as live
+from .alert import router as alert
 from fastapi import FastAPI
 
 
@@ -10,4 +13,7 @@ def router_register(app: FastAPI) -> FastAPI:
     app.include_router(user)
     app.include_router(station)
     app.include_router(data)
+    app.include_router(dashboard)
+    app.include_router(live)
+    app.include_router(alert)
     return app
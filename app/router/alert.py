@@ -0,0 +1,144 @@
+from datetime import datetime, timezone
+from typing import Annotated
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+from app.database.engine import get_session
+from app.database.schema import Alert, AlertStatus
+from app.deps.user import get_current_user
+from app.services.alerts import (
+    AlertEngineStats,
+    AlertRecord,
+    get_alert_engine,
+    list_open_alerts,
+)
+from app.services.metadata import MetadataCache, get_metadata
+
+router = APIRouter(
+    prefix="/alert",
+    tags=["alert"],
+    dependencies=[Depends(get_current_user)],
+)
+
+
+class AlertList(BaseModel):
+    count: int
+    alerts: list[AlertRecord]
+
+
+def station_filter(
+    metadata: MetadataCache, station_id: int | None, city_id: int | None
+) -> list[int] | None:
+    """将测站/城市条件转换为测站id列表, 都未指定时返回None"""
+    if station_id is not None:
+        return [station_id]
+    if city_id is not None:
+        if metadata.city(city_id) is None:
+            raise HTTPException(404, "没有找到城市信息")
+        return [station.id for station in metadata.stations_of_city(city_id)]  # type: ignore
+    return None
+
+
+@router.get("/active", response_model=AlertList)
+async def read_active_alerts(
+    metadata: Annotated[MetadataCache, Depends(get_metadata)],
+    station_id: Annotated[int | None, Query()] = None,
+    city_id: Annotated[int | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+):
+    """
+    获取未解除的报警, 按触发时间倒序
+    """
+    count, alerts = await list_open_alerts(station_filter(metadata, station_id, city_id), limit)
+    return AlertList(count=count, alerts=alerts)
+
+
+@router.get("", response_model=list[AlertRecord])
+async def read_alerts(
+    session: Annotated[AsyncSession, Depends(get_session)],
+    metadata: Annotated[MetadataCache, Depends(get_metadata)],
+    status: Annotated[AlertStatus | None, Query()] = None,
+    station_id: Annotated[int | None, Query()] = None,
+    city_id: Annotated[int | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+    offset: Annotated[int, Query(ge=0)] = 0,
+):
+    """
+    获取报警记录, 按触发时间倒序
+    """
+    statement = select(Alert)
+    if status is not None:
+        statement = statement.where(Alert.status == status)
+    station_ids = station_filter(metadata, station_id, city_id)
+    if station_ids is not None:
+        statement = statement.where(Alert.station_id.in_(station_ids))  # type: ignore
+    statement = (
+        statement.order_by(Alert.trigger_at.desc(), Alert.id.desc())  # type: ignore
+        .limit(limit)
+        .offset(offset)
+    )
+    return (await session.execute(statement)).scalars().all()
+
+
+async def change_status(session: AsyncSession, alert_id: int, status: AlertStatus) -> AlertRecord:
+    """
+    确认或解除报警
+
+    报警引擎开启时在引擎中修改, 保证边缘检测状态与数据库一致
+    """
+    engine = get_alert_engine()
+    if engine is not None:
+        if engine.has_unsaved:
+            await engine.flush()
+        record = engine.find(alert_id)
+        if record is not None:
+            if status == AlertStatus.RESOLVED:
+                engine.resolve(record)
+            else:
+                engine.acknowledge(record)
+            await engine.flush()
+            return record
+
+    alert = await session.get(Alert, alert_id)
+    if alert is None:
+        raise HTTPException(404, "报警不存在")
+    if alert.status == AlertStatus.RESOLVED:
+        raise HTTPException(409, "报警已解除")
+    alert.status = status
+    if status == AlertStatus.RESOLVED:
+        alert.revolved_at = datetime.now(timezone.utc)
+    await session.commit()
+    await session.refresh(alert)
+    return AlertRecord.model_validate(alert, from_attributes=True)
+
+
+@router.post("/{alert_id}/acknowledge", response_model=AlertRecord)
+async def acknowledge_alert(
+    alert_id: Annotated[int, Path()],
+    session: Annotated[AsyncSession, Depends(get_session)],
+):
+    """
+    确认报警
+    """
+    return await change_status(session, alert_id, AlertStatus.ACKNOWLEDGED)
+
+
+@router.post("/{alert_id}/resolve", response_model=AlertRecord)
+async def resolve_alert(
+    alert_id: Annotated[int, Path()],
+    session: Annotated[AsyncSession, Depends(get_session)],
+):
+    """
+    解除报警
+    """
+    return await change_status(session, alert_id, AlertStatus.RESOLVED)
+
+
+@router.get("/engine/stats", response_model=AlertEngineStats | None)
+async def read_alert_engine_stats():
+    """
+    获取报警引擎状态, 未启用时返回null
+    """
+    engine = get_alert_engine()
+    return engine.stats() if engine is not None else None
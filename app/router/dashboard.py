@@ -0,0 +1,38 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, HTTPException, Path
+from app.deps.user import get_current_user
+from app.services.city_stats import CityOverview, CityStats, get_overview
+from app.services.dashboard import DashboardSummary, get_summary
+
+router = APIRouter(
+    prefix="/dashboard",
+    tags=["dashboard"],
+    dependencies=[Depends(get_current_user)],
+)
+
+
+@router.get("/summary", response_model=DashboardSummary)
+async def read_summary():
+    """
+    获取大屏汇总数据: 测站数量、各测站最新数据和活动报警
+    """
+    return await get_summary()
+
+
+@router.get("/cities", response_model=CityOverview)
+async def read_city_overview():
+    """
+    获取各城市及全国的水位、雨量统计
+    """
+    return await get_overview()
+
+
+@router.get("/cities/{city_id}", response_model=CityStats)
+async def read_city_stats(city_id: Annotated[int, Path()]):
+    """
+    获取指定城市的水位、雨量统计
+    """
+    for stats in (await get_overview()).cities:
+        if stats.city_id == city_id:
+            return stats
+    raise HTTPException(404, "没有找到城市信息")
@@ -1,10 +1,57 @@
-from fastapi import APIRouter, Depends, Query, HTTPException, Form, Path
-from typing import Annotated
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    Form,
+    Header,
+    HTTPException,
+    Path,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+)
+from typing import Annotated, Any
 from sqlmodel import select
+from app.deps.conditional import station_data_conditional
 from app.deps.user import get_current_user
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
 from app.database.engine import get_session
-from app.database.schema import Station, WaterLevelData, RainfallData
+from app.database.schema import WaterLevelData, RainfallData, MeasurementModel, MeasurementRow
+from app.services.ingest import (
+    IngestResult,
+    after_commit,
+    after_insert,
+    ingest_json,
+    ingest_ndjson,
+    ingest_csv,
+)
+from app.services.accumulation import (
+    AccumulationSource,
+    AccumulatorStats,
+    StationAccumulation,
+    database_totals,
+    get_accumulator,
+)
+from app.services.batch_read import as_columns, as_rows, read_latest_many
+from app.services.buffer import BufferStats, get_write_buffer
+from app.services.export import MEDIA_TYPES, ExportFormat, export_measurements, format_available
+from app.services.encoding import (
+    BinaryResponse,
+    Columns,
+    ColumnarResponse,
+    Layout,
+    accepts_binary,
+)
+from app.services.hot_tier import HotTierStats, get_hot_tier, to_micros
+from app.services.metadata import MetadataCache, get_metadata
+from app.services.pagination import MeasurementPage, SortOrder, read_page
+from app.services.query_cache import QueryCacheStats, cached, get_query_cache, station_tag
+from app.services.retention import RetentionStats, get_retention_job
+from app.services.series import Aggregation, Series, query_series
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime, timezone
 
@@ -15,23 +62,403 @@ router = APIRouter(
 )
 
 
-@router.get("/{station_id}/water-level")
+async def read_latest(
+    session: AsyncSession, model: MeasurementModel, station_id: int, limit: int
+) -> list[dict[str, Any]]:
+    """最新 limit 条数据, 包含全部字段"""
+    query = (
+        select(model)
+        .where(model.station_id == station_id)
+        .order_by(model.measure_at.desc())  # type: ignore
+        .limit(limit)
+    )
+    return [item.model_dump() for item in (await session.execute(query)).scalars().all()]
+
+
+async def read_latest_compact(
+    session: AsyncSession, model: MeasurementModel, station_id: int, limit: int
+) -> list[dict[str, Any]]:
+    """与 read_latest 相同, 不包括 created_at 和 updated_at; 优先从热缓存读取"""
+    hot_tier = get_hot_tier()
+    if hot_tier is not None:
+        data = hot_tier.latest(model, station_id, limit)
+        if data is not None:
+            return data
+    query = (
+        select(model.id, model.station_id, model.value, model.measure_at)
+        .where(model.station_id == station_id)
+        .order_by(model.measure_at.desc())  # type: ignore
+        .limit(limit)
+    )
+    return [row._asdict() for row in (await session.execute(query)).all()]
+
+
+async def read_latest_columns(
+    session: AsyncSession, model: MeasurementModel, station_id: int, limit: int
+) -> Columns:
+    """与 read_latest 相同, 只读取时间和数值两列"""
+    hot_tier = get_hot_tier()
+    if hot_tier is not None:
+        columns = hot_tier.latest_columns(model, station_id, limit)
+        if columns is not None:
+            return Columns(*columns)
+    query = (
+        select(model.measure_at, model.value)
+        .where(model.station_id == station_id)
+        .order_by(model.measure_at.desc())  # type: ignore
+        .limit(limit)
+    )
+    rows = (await session.execute(query)).all()
+    return Columns([to_micros(row[0]) for row in rows], [row[1] for row in rows])
+
+
+async def latest_response(
+    session: AsyncSession,
+    model: MeasurementModel,
+    station_id: int,
+    limit: int,
+    layout: Layout,
+    accept: str | None,
+    response: Response,
+):
+    """按 Accept 请求头和 layout 参数选择响应格式"""
+    response.headers["Vary"] = "Accept"
+    if accepts_binary(accept):
+        columns = await read_latest_columns(session, model, station_id, limit)
+        return BinaryResponse([(station_id, columns)], headers=response.headers)
+    if layout == Layout.COLUMNAR:
+        columns = await read_latest_columns(session, model, station_id, limit)
+        return ColumnarResponse(columns, headers=response.headers)
+    if layout == Layout.COMPACT:
+        return await read_latest_compact(session, model, station_id, limit)
+    return await read_latest(session, model, station_id, limit)
+
+
+def series_response(series: Series, accept: str | None, response: Response):
+    response.headers["Vary"] = "Accept"
+    if accepts_binary(accept):
+        columns = Columns(
+            [to_micros(point.t) for point in series.points],
+            [point.value for point in series.points],
+        )
+        return BinaryResponse([(series.station_id, columns)], headers=response.headers)
+    return series
+
+
+async def latest_many_response(
+    session: AsyncSession,
+    model: MeasurementModel,
+    metadata: MetadataCache,
+    station_ids: list[int],
+    city_ids: list[int],
+    limit: int,
+    start: datetime | None,
+    end: datetime | None,
+    layout: Layout,
+    accept: str | None,
+    response: Response,
+):
+    stations = metadata.select_stations(station_ids, city_ids)
+    if not stations:
+        raise HTTPException(400, "请指定测站或城市")
+    points = await read_latest_many(session, model, stations, limit, start, end)
+    response.headers["Vary"] = "Accept"
+    if accepts_binary(accept):
+        return BinaryResponse(as_columns(points), headers=response.headers)
+    if layout == Layout.COLUMNAR:
+        return ColumnarResponse(as_columns(points), headers=response.headers)
+    return as_rows(points)
+
+
+@router.get("/water-level/latest")
+async def read_water_level_latest_many(
+    response: Response,
+    session: Annotated[AsyncSession, Depends(get_session)],
+    metadata: Annotated[MetadataCache, Depends(get_metadata)],
+    station_id: Annotated[list[int], Query()] = [],
+    city_id: Annotated[list[int], Query()] = [],
+    limit: Annotated[int, Query(ge=1, le=1000)] = 1,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    layout: Layout = Layout.ROWS,
+    accept: Annotated[str | None, Header()] = None,
+):
+    """
+    一次获取多个站点（或城市下全部站点）各自最新的水位数据, 按站点分组
+
+    指定 start/end 时只取该时间段内的数据; 支持列式JSON和二进制帧
+    """
+    return await latest_many_response(
+        session,
+        WaterLevelData,
+        metadata,
+        station_id,
+        city_id,
+        limit,
+        start,
+        end,
+        layout,
+        accept,
+        response,
+    )
+
+
+@router.get("/rainfall/latest")
+async def read_rainfall_latest_many(
+    response: Response,
+    session: Annotated[AsyncSession, Depends(get_session)],
+    metadata: Annotated[MetadataCache, Depends(get_metadata)],
+    station_id: Annotated[list[int], Query()] = [],
+    city_id: Annotated[list[int], Query()] = [],
+    limit: Annotated[int, Query(ge=1, le=1000)] = 1,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    layout: Layout = Layout.ROWS,
+    accept: Annotated[str | None, Header()] = None,
+):
+    """
+    一次获取多个站点（或城市下全部站点）各自最新的雨量数据, 按站点分组
+
+    指定 start/end 时只取该时间段内的数据; 支持列式JSON和二进制帧
+    """
+    return await latest_many_response(
+        session,
+        RainfallData,
+        metadata,
+        station_id,
+        city_id,
+        limit,
+        start,
+        end,
+        layout,
+        accept,
+        response,
+    )
+
+
+@router.get("/rainfall/accumulation", response_model=list[StationAccumulation])
+async def read_rainfall_accumulation(
+    session: Annotated[AsyncSession, Depends(get_session)],
+    metadata: Annotated[MetadataCache, Depends(get_metadata)],
+    station_id: Annotated[list[int], Query()] = [],
+    city_id: Annotated[list[int], Query()] = [],
+    at: datetime | None = None,
+    source: AccumulationSource = AccumulationSource.MEMORY,
+):
+    """
+    获取站点截至指定时间（默认当前）1/3/6/24/72小时的累计雨量
+
+    默认读取内存中增量维护的结果; 指定 at 或 source=database 时用SQL重新计算, 可用于核对
+    """
+    stations = metadata.select_stations(station_id, city_id)
+    if not stations:
+        raise HTTPException(400, "请指定测站或城市")
+    accumulator = get_accumulator()
+    if accumulator is None or at is not None or source == AccumulationSource.DATABASE:
+        return await database_totals(session, stations, at)
+    return accumulator.accumulations(stations)
+
+
+@router.post("/rainfall/accumulation/rebuild")
+async def rebuild_rainfall_accumulation(
+    metadata: Annotated[MetadataCache, Depends(get_metadata)],
+    station_id: Annotated[list[int], Query()] = [],
+    city_id: Annotated[list[int], Query()] = [],
+):
+    """
+    从数据库重新加载累计雨量, 不指定站点和城市时重新加载全部站点
+    """
+    accumulator = get_accumulator()
+    if accumulator is None:
+        raise HTTPException(404, "累计雨量未启用")
+    stations = metadata.select_stations(station_id, city_id) if station_id or city_id else None
+    return {"points": await accumulator.rebuild(stations)}
+
+
+@router.get("/rainfall/accumulation/stats", response_model=AccumulatorStats)
+async def read_rainfall_accumulation_stats():
+    """
+    获取累计雨量的内存占用和迟到数据统计
+    """
+    accumulator = get_accumulator()
+    if accumulator is None:
+        raise HTTPException(404, "累计雨量未启用")
+    return accumulator.stats()
+
+
+@router.get(
+    "/{station_id}/water-level",
+    dependencies=[Depends(station_data_conditional(WaterLevelData))],
+)
 async def read_water_level_data(
+    response: Response,
     session: Annotated[AsyncSession, Depends(get_session)],
     station_id: Annotated[int, Path()],
     limit: Annotated[int, Query(ge=1, le=1000)],
+    layout: Layout = Layout.ROWS,
+    accept: Annotated[str | None, Header()] = None,
 ):
     """
     获取指定站点的指定时间段内的水位数据
+
+    layout=compact 时不返回 created_at 和 updated_at, layout=columnar 时返回列式JSON;
+    Accept 为 application/vnd.smarthydra.series 时返回二进制帧
     """
-    query = (
-        select(WaterLevelData)
-        .where(WaterLevelData.station_id == station_id)
-        .order_by(WaterLevelData.measure_at.desc())
-        .limit(limit)
+    return await latest_response(
+        session, WaterLevelData, station_id, limit, layout, accept, response
+    )
+
+
+@router.get(
+    "/{station_id}/water-level/history",
+    response_model=MeasurementPage,
+    dependencies=[Depends(station_data_conditional(WaterLevelData))],
+)
+async def read_water_level_history(
+    session: Annotated[AsyncSession, Depends(get_session)],
+    station_id: Annotated[int, Path()],
+    start: datetime | None = None,
+    end: datetime | None = None,
+    order: SortOrder = SortOrder.DESC,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+    cursor: str | None = None,
+):
+    """
+    分页获取指定站点的历史水位数据, 使用返回的游标获取下一页或上一页
+    """
+    return await read_page(session, WaterLevelData, station_id, start, end, order, limit, cursor)
+
+
+@router.get(
+    "/{station_id}/water-level/series",
+    response_model=Series,
+    dependencies=[Depends(station_data_conditional(WaterLevelData, require_end=True))],
+)
+async def read_water_level_series(
+    response: Response,
+    session: Annotated[AsyncSession, Depends(get_session)],
+    station_id: Annotated[int, Path()],
+    start: datetime | None = None,
+    end: datetime | None = None,
+    aggregation: Aggregation = Aggregation.AUTO,
+    points: Annotated[int | None, Query(ge=3)] = None,
+    accept: Annotated[str | None, Header()] = None,
+):
+    """
+    获取指定站点在时间段内的水位数据序列, 支持按时间桶聚合和LTTB降采样
+
+    Accept 为 application/vnd.smarthydra.series 时返回二进制帧, 只包含时间和数值
+    """
+    series = await cached(
+        "water_level_series",
+        (station_id, start, end, aggregation, points),
+        (station_tag(WaterLevelData, station_id),),
+        lambda: query_series(session, WaterLevelData, station_id, start, end, aggregation, points),
+    )
+    return series_response(series, accept, response)
+
+
+async def export_response(
+    model: MeasurementModel,
+    metadata: MetadataCache,
+    station_ids: list[int],
+    city_ids: list[int],
+    start: datetime | None,
+    end: datetime | None,
+    format: ExportFormat,
+    gzip: bool,
+) -> StreamingResponse:
+    if not format_available(format):
+        raise HTTPException(501, "服务器未安装pyarrow, 不支持该导出格式")
+    stations = metadata.select_stations(station_ids, city_ids)
+    if not stations:
+        raise HTTPException(400, "请指定测站或城市")
+    filename = f"{model.__tablename__}.{format.value}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_measurements(model, stations, start, end, format, gzip),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/water-level/export")
+async def export_water_level_data(
+    metadata: Annotated[MetadataCache, Depends(get_metadata)],
+    station_id: Annotated[list[int], Query()] = [],
+    city_id: Annotated[list[int], Query()] = [],
+    start: datetime | None = None,
+    end: datetime | None = None,
+    format: ExportFormat = ExportFormat.CSV,
+    gzip: bool = False,
+):
+    """
+    导出指定站点或城市的全部水位数据, 流式返回
+    """
+    return await export_response(
+        WaterLevelData, metadata, station_id, city_id, start, end, format, gzip
     )
-    water_level_data = (await session.execute(query)).scalars().all()
-    return [item.model_dump() for item in water_level_data]
+
+
+@router.get("/rainfall/export")
+async def export_rainfall_data(
+    metadata: Annotated[MetadataCache, Depends(get_metadata)],
+    station_id: Annotated[list[int], Query()] = [],
+    city_id: Annotated[list[int], Query()] = [],
+    start: datetime | None = None,
+    end: datetime | None = None,
+    format: ExportFormat = ExportFormat.CSV,
+    gzip: bool = False,
+):
+    """
+    导出指定站点或城市的全部雨量数据, 流式返回
+    """
+    return await export_response(
+        RainfallData, metadata, station_id, city_id, start, end, format, gzip
+    )
+
+
+@router.get("/buffer/stats", response_model=BufferStats)
+async def read_buffer_stats():
+    """
+    获取写入队列的统计信息
+    """
+    buffer = get_write_buffer()
+    if buffer is None:
+        raise HTTPException(404, "写入队列未启用")
+    return buffer.stats()
+
+
+@router.get("/hot-tier/stats", response_model=HotTierStats)
+async def read_hot_tier_stats():
+    """
+    获取最新数据热缓存的内存占用和命中情况
+    """
+    hot_tier = get_hot_tier()
+    if hot_tier is None:
+        raise HTTPException(404, "热缓存未启用")
+    return hot_tier.stats()
+
+
+@router.get("/query-cache/stats", response_model=QueryCacheStats)
+async def read_query_cache_stats():
+    """
+    获取查询结果缓存的命中、淘汰情况
+    """
+    cache = get_query_cache()
+    if cache is None:
+        raise HTTPException(404, "查询结果缓存未启用")
+    return cache.stats()
+
+
+@router.get("/retention/stats", response_model=RetentionStats)
+async def read_retention_stats():
+    """
+    获取数据保留任务的执行进度
+    """
+    job = get_retention_job()
+    if job is None:
+        raise HTTPException(404, "数据保留任务未启用")
+    return job.stats()
 
 
 class DataInsert(BaseModel):
@@ -44,27 +471,76 @@ async def create_water_level_data(
     station_id: Annotated[int, Path()],
     form: Annotated[DataInsert, Form()],
     session: Annotated[AsyncSession, Depends(get_session)],
+    metadata: Annotated[MetadataCache, Depends(get_metadata)],
 ):
     """
     创建指定站点的水位数据
     """
-    station = (
-        (await session.execute(select(Station).where(Station.id == station_id))).scalars().first()
-    )
-    if not station:
+    if metadata.station(station_id) is None:
         raise HTTPException(404, "站点不存在")
     if not form.measure_at:
         form.measure_at = datetime.now(timezone.utc)
+    buffer = get_write_buffer()
+    if buffer is not None:
+        point = {"station_id": station_id, "measure_at": form.measure_at, "value": form.value}
+        if not buffer.offer(WaterLevelData, point):
+            raise HTTPException(429, "写入队列已满, 请稍后重试")
+        return JSONResponse(status_code=202, content=jsonable_encoder(point))
     water_level_data = WaterLevelData(
         station_id=station_id,
         measure_at=form.measure_at,
         value=form.value,
     )
     session.add(water_level_data)
-    await session.commit()
+    try:
+        await session.flush()
+        row = MeasurementRow(
+            water_level_data.id,  # type: ignore
+            station_id,
+            water_level_data.measure_at,
+            water_level_data.value,
+        )
+        await after_insert(session, WaterLevelData, [row])
+        await session.commit()
+    except IntegrityError:
+        raise HTTPException(409, "该时刻的数据已存在")
+    after_commit(WaterLevelData, [row])
     return water_level_data.model_dump()
 
 
+@router.post("/water-level/batch", response_model=IngestResult)
+async def create_water_level_batch(
+    points: Annotated[list[Any], Body()],
+    session: Annotated[AsyncSession, Depends(get_session)],
+):
+    """
+    批量创建水位数据, 请求体为JSON数组
+    """
+    return await ingest_json(session, WaterLevelData, points)
+
+
+@router.post("/water-level/batch/ndjson", response_model=IngestResult)
+async def create_water_level_ndjson(
+    request: Request,
+    session: Annotated[AsyncSession, Depends(get_session)],
+):
+    """
+    批量创建水位数据, 请求体为NDJSON流
+    """
+    return await ingest_ndjson(session, WaterLevelData, request.stream())
+
+
+@router.post("/water-level/batch/csv", response_model=IngestResult)
+async def create_water_level_csv(
+    file: UploadFile,
+    session: Annotated[AsyncSession, Depends(get_session)],
+):
+    """
+    批量创建水位数据, 上传CSV文件
+    """
+    return await ingest_csv(session, WaterLevelData, file.file)
+
+
 @router.delete("{station_id}/water-level/{id}")
 async def delete_water_level_data(
     station_id: Annotated[int, Path()],
@@ -90,24 +566,74 @@ async def delete_water_level_data(
     return water_level_data.model_dump()
 
 
-@router.get("/rainfall")
+@router.get(
+    "/rainfall",
+    dependencies=[Depends(station_data_conditional(RainfallData))],
+)
 async def read_rainfall_data(
+    response: Response,
     session: Annotated[AsyncSession, Depends(get_session)],
     station_id: int,
     limit: Annotated[int, Query(ge=1, le=1000)],
+    layout: Layout = Layout.ROWS,
+    accept: Annotated[str | None, Header()] = None,
 ):
     """
     获取指定站点的指定时间段内的雨量数据
+
+    layout=compact 时不返回 created_at 和 updated_at, layout=columnar 时返回列式JSON;
+    Accept 为 application/vnd.smarthydra.series 时返回二进制帧
     """
-    query = (
-        select(RainfallData)
-        .where(RainfallData.station_id == station_id)
-        .order_by(RainfallData.measure_at.desc())
-        .limit(limit)
-    )
+    return await latest_response(session, RainfallData, station_id, limit, layout, accept, response)
+
+
+@router.get(
+    "/{station_id}/rainfall/history",
+    response_model=MeasurementPage,
+    dependencies=[Depends(station_data_conditional(RainfallData))],
+)
+async def read_rainfall_history(
+    session: Annotated[AsyncSession, Depends(get_session)],
+    station_id: Annotated[int, Path()],
+    start: datetime | None = None,
+    end: datetime | None = None,
+    order: SortOrder = SortOrder.DESC,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+    cursor: str | None = None,
+):
+    """
+    分页获取指定站点的历史雨量数据, 使用返回的游标获取下一页或上一页
+    """
+    return await read_page(session, RainfallData, station_id, start, end, order, limit, cursor)
+
+
+@router.get(
+    "/{station_id}/rainfall/series",
+    response_model=Series,
+    dependencies=[Depends(station_data_conditional(RainfallData, require_end=True))],
+)
+async def read_rainfall_series(
+    response: Response,
+    session: Annotated[AsyncSession, Depends(get_session)],
+    station_id: Annotated[int, Path()],
+    start: datetime | None = None,
+    end: datetime | None = None,
+    aggregation: Aggregation = Aggregation.AUTO,
+    points: Annotated[int | None, Query(ge=3)] = None,
+    accept: Annotated[str | None, Header()] = None,
+):
+    """
+    获取指定站点在时间段内的雨量数据序列, 支持按时间桶聚合和LTTB降采样
 
-    rainfall_data = (await session.execute(query)).scalars().all()
-    return [item.model_dump() for item in rainfall_data]
+    Accept 为 application/vnd.smarthydra.series 时返回二进制帧, 只包含时间和数值
+    """
+    series = await cached(
+        "rainfall_series",
+        (station_id, start, end, aggregation, points),
+        (station_tag(RainfallData, station_id),),
+        lambda: query_series(session, RainfallData, station_id, start, end, aggregation, points),
+    )
+    return series_response(series, accept, response)
 
 
 @router.post("/{station_id}/rainfall")
@@ -115,28 +641,77 @@ async def create_rainfall_data(
     station_id: Annotated[int, Path()],
     form: Annotated[DataInsert, Form()],
     session: Annotated[AsyncSession, Depends(get_session)],
+    metadata: Annotated[MetadataCache, Depends(get_metadata)],
 ):
     """
     创建指定站点的雨量数据
     """
-    station = (
-        (await session.execute(select(Station).where(Station.id == station_id))).scalars().first()
-    )
-    if not station:
+    if metadata.station(station_id) is None:
         raise HTTPException(404, "站点不存在")
     if not form.measure_at:
         form.measure_at = datetime.now(timezone.utc)
 
+    buffer = get_write_buffer()
+    if buffer is not None:
+        point = {"station_id": station_id, "measure_at": form.measure_at, "value": form.value}
+        if not buffer.offer(RainfallData, point):
+            raise HTTPException(429, "写入队列已满, 请稍后重试")
+        return JSONResponse(status_code=202, content=jsonable_encoder(point))
     rainfall_data = RainfallData(
         station_id=station_id,
         measure_at=form.measure_at,
         value=form.value,
     )
     session.add(rainfall_data)
-    await session.commit()
+    try:
+        await session.flush()
+        row = MeasurementRow(
+            rainfall_data.id,  # type: ignore
+            station_id,
+            rainfall_data.measure_at,
+            rainfall_data.value,
+        )
+        await after_insert(session, RainfallData, [row])
+        await session.commit()
+    except IntegrityError:
+        raise HTTPException(409, "该时刻的数据已存在")
+    after_commit(RainfallData, [row])
     return rainfall_data.model_dump()
 
 
+@router.post("/rainfall/batch", response_model=IngestResult)
+async def create_rainfall_batch(
+    points: Annotated[list[Any], Body()],
+    session: Annotated[AsyncSession, Depends(get_session)],
+):
+    """
+    批量创建雨量数据, 请求体为JSON数组
+    """
+    return await ingest_json(session, RainfallData, points)
+
+
+@router.post("/rainfall/batch/ndjson", response_model=IngestResult)
+async def create_rainfall_ndjson(
+    request: Request,
+    session: Annotated[AsyncSession, Depends(get_session)],
+):
+    """
+    批量创建雨量数据, 请求体为NDJSON流
+    """
+    return await ingest_ndjson(session, RainfallData, request.stream())
+
+
+@router.post("/rainfall/batch/csv", response_model=IngestResult)
+async def create_rainfall_csv(
+    file: UploadFile,
+    session: Annotated[AsyncSession, Depends(get_session)],
+):
+    """
+    批量创建雨量数据, 上传CSV文件
+    """
+    return await ingest_csv(session, RainfallData, file.file)
+
+
 @router.delete("{station_id}/rainfall/{id}")
 async def delete_rainfall_data(
     station_id: Annotated[int, Path()],
@@ -0,0 +1,114 @@
+import asyncio
+from typing import Annotated
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    WebSocket,
+    WebSocketException,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from app.deps.user import authenticate, get_current_user, get_stream_user
+from app.services.broadcast import BroadcastStats, Subscriber, get_broadcaster
+from app.settings import load_settings
+
+router = APIRouter(prefix="/live", tags=["live"])
+
+
+def subscribe(station_id: list[int], city_id: list[int]) -> Subscriber:
+    subscriber = get_broadcaster().subscribe(station_id, city_id)
+    if subscriber is None:
+        raise HTTPException(503, "实时推送连接数已满")
+    return subscriber
+
+
+@router.websocket("/ws")
+async def live_websocket(
+    websocket: WebSocket,
+    station_id: Annotated[list[int], Query()] = [],
+    city_id: Annotated[list[int], Query()] = [],
+    token: str | None = None,
+):
+    """
+    通过WebSocket订阅测站或城市的新数据和报警, 不指定时订阅全部
+    """
+    authorization = websocket.headers.get("Authorization")
+    token = authorization[7:] if authorization else token
+    try:
+        if token is None:
+            raise HTTPException(401, "请提供有效的请求头")
+        await authenticate(token)
+        subscriber = subscribe(station_id, city_id)
+    except HTTPException as e:
+        raise WebSocketException(status.WS_1008_POLICY_VIOLATION, e.detail)
+
+    await websocket.accept()
+    heartbeat = load_settings().live.heartbeat
+
+    async def send() -> None:
+        while True:
+            messages = await subscriber.get(timeout=heartbeat)
+            if not messages:
+                await websocket.send_text('{"event":"ping"}')
+            for event, data in messages:
+                await websocket.send_text(f'{{"event":"{event}","data":{data}}}')
+
+    async def receive() -> None:
+        # 只用于感知连接断开
+        while True:
+            await websocket.receive_text()
+
+    # 任一方向结束（客户端断开或发送失败）即关闭连接
+    tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        get_broadcaster().unsubscribe(subscriber)
+
+
+@router.get("/sse", dependencies=[Depends(get_stream_user)])
+async def live_sse(
+    station_id: Annotated[list[int], Query()] = [],
+    city_id: Annotated[list[int], Query()] = [],
+):
+    """
+    通过Server-Sent Events订阅测站或城市的新数据和报警, 不指定时订阅全部
+    """
+    if get_broadcaster().full:
+        raise HTTPException(503, "实时推送连接数已满")
+    heartbeat = load_settings().live.heartbeat
+
+    async def stream():
+        # 在生成器中订阅, 生成器未开始执行（如发送响应头前客户端已断开）时不会遗留订阅
+        subscriber = get_broadcaster().subscribe(station_id, city_id)
+        if subscriber is None:
+            # 检查之后连接数已满
+            return
+        try:
+            while True:
+                messages = await subscriber.get(timeout=heartbeat)
+                if not messages:
+                    yield ": ping\n\n"
+                for event, data in messages:
+                    yield f"event: {event}\ndata: {data}\n\n"
+        finally:
+            get_broadcaster().unsubscribe(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stats", response_model=BroadcastStats, dependencies=[Depends(get_current_user)])
+async def read_live_stats():
+    """
+    获取实时推送的连接数和消息统计
+    """
+    return get_broadcaster().stats()
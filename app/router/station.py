@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, Form, HTTPException, Path
+from fastapi import APIRouter, Depends, Form, HTTPException, Path, Query
+from app.deps.conditional import metadata_conditional
 from app.deps.user import get_current_user
 from app.database.engine import get_session
-from app.database.schema import Station, City
+from app.database.schema import Station
+from app.services.metadata import MetadataCache, get_metadata, invalidate_metadata
+from app.services.station_list import DEFAULT_FIELDS, StationField, StationPage, list_stations
 from sqlmodel import select
 from typing import Annotated
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.exc import NoResultFound, SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError
 
 router = APIRouter(
     prefix="/station",
@@ -15,19 +18,108 @@ router = APIRouter(
 )
 
 
-@router.get("/all")
-async def read_stations(session: Annotated[AsyncSession, Depends(get_session)]):
+@router.get("/all", dependencies=[Depends(metadata_conditional)])
+async def read_stations(metadata: Annotated[MetadataCache, Depends(get_metadata)]):
     """
     获取所有站点信息
     """
+    # 从元数据缓存读取, 与条件请求使用的版本一致
+    return [metadata.stations[station_id] for station_id in sorted(metadata.stations)]
+
+
+@router.get("", response_model=StationPage)
+async def read_station_page(
+    session: Annotated[AsyncSession, Depends(get_session)],
+    city_id: Annotated[int | None, Query()] = None,
+    is_active: Annotated[bool | None, Query()] = None,
+    prefix: Annotated[str | None, Query(max_length=64, description="站点名称前缀")] = None,
+    fields: Annotated[list[StationField] | None, Query(description="返回的字段, 可重复")] = None,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+    cursor: Annotated[str | None, Query()] = None,
+):
+    """
+    分页获取站点信息, 可按城市、启用状态和名称前缀过滤
+    """
     try:
-        statement = select(Station)
-        stations = (await session.execute(statement)).scalars().all()
-    except NoResultFound:
-        raise HTTPException(404, "没有找到站点信息")
+        return await list_stations(
+            session, fields or DEFAULT_FIELDS, limit, city_id, is_active, prefix, cursor
+        )
     except SQLAlchemyError:
         raise HTTPException(500, "服务器内部错误")
-    return stations
+
+
+class StationLocation(BaseModel):
+    id: int
+    name: str
+    code: str
+    city_id: int
+    longitude: float
+    latitude: float
+    is_active: bool
+
+    @classmethod
+    def of(cls, station: Station) -> "StationLocation":
+        return cls(
+            id=station.id,  # type: ignore
+            name=station.name,
+            code=station.code,
+            city_id=station.city_id,
+            longitude=station.longitude,
+            latitude=station.latitude,
+            is_active=station.is_active,
+        )
+
+
+class NearbyStation(StationLocation):
+    # 与查询点的距离（千米）
+    distance: float
+
+
+@router.get(
+    "/within",
+    response_model=list[StationLocation],
+    dependencies=[Depends(metadata_conditional)],
+)
+async def read_stations_within(
+    metadata: Annotated[MetadataCache, Depends(get_metadata)],
+    south: Annotated[float, Query(ge=-90, le=90)],
+    west: Annotated[float, Query(ge=-180, le=180)],
+    north: Annotated[float, Query(ge=-90, le=90)],
+    east: Annotated[float, Query(ge=-180, le=180)],
+):
+    """
+    获取地图视口范围内的站点
+    """
+    if south > north or west > east:
+        raise HTTPException(400, "无效的范围")
+    return [
+        StationLocation.of(metadata.stations[station_id])
+        for station_id in metadata.spatial.within(south, west, north, east)
+    ]
+
+
+@router.get(
+    "/nearest",
+    response_model=list[NearbyStation],
+    dependencies=[Depends(metadata_conditional)],
+)
+async def read_nearest_stations(
+    metadata: Annotated[MetadataCache, Depends(get_metadata)],
+    latitude: Annotated[float, Query(ge=-90, le=90)],
+    longitude: Annotated[float, Query(ge=-180, le=180)],
+    k: Annotated[int, Query(ge=1, le=100)] = 10,
+    max_distance: Annotated[float | None, Query(gt=0, description="最大距离（千米）")] = None,
+):
+    """
+    获取距离指定位置最近的站点
+    """
+    return [
+        NearbyStation(
+            **StationLocation.of(metadata.stations[station_id]).model_dump(),
+            distance=round(distance, 3),
+        )
+        for station_id, distance in metadata.spatial.nearest(latitude, longitude, k, max_distance)
+    ]
 
 
 class StationRead(BaseModel):
@@ -39,19 +131,22 @@ class StationRead(BaseModel):
     latitude: float
 
 
-@router.get("/{station_id}", response_model=StationRead)
+@router.get(
+    "/{station_id}",
+    response_model=StationRead,
+    dependencies=[Depends(metadata_conditional)],
+)
 async def read_station(
-    station_id: Annotated[int, Path()], session: Annotated[AsyncSession, Depends(get_session)]
+    station_id: Annotated[int, Path()],
+    metadata: Annotated[MetadataCache, Depends(get_metadata)],
 ):
     """
     获取指定站点信息
     """
-    statement = select(Station).where(Station.id == station_id)
-    station = (await session.execute(statement)).scalars().first()
+    station = metadata.station(station_id)
     if not station:
         raise HTTPException(404, "没有找到站点信息")
-    statement = select(City).where(Station.id == station_id)
-    city = (await session.execute(statement)).scalars().first()
+    city = metadata.city(station.city_id)
     if not city:
         raise HTTPException(404, "没有找到城市信息")
     return StationRead(
@@ -78,17 +173,17 @@ class StationCreate(BaseModel):
 async def create_station(
     station: Annotated[StationCreate, Form()],
     session: Annotated[AsyncSession, Depends(get_session)],
+    metadata: Annotated[MetadataCache, Depends(get_metadata)],
 ):
     """
     创建站点信息
     """
-    statement = select(City).where(City.name == station.city)
-    city = (await session.execute(statement)).scalars().first()
+    city = metadata.city_by_name(station.city)
     if not city:
         raise HTTPException(404, "没有找到城市信息")
-    statement = select(Station).where(Station.code == station.code)
-    station_exist = (await session.execute(statement)).scalars().first()
-    if station_exist:
+    # 缓存中可能还没有其他进程刚创建的测站, 编码是否重复以数据库为准
+    statement = select(Station.id).where(Station.code == station.code)
+    if (await session.execute(statement)).first() is not None:
         raise HTTPException(409, "站点已存在")
     new_station = Station(
         name=station.name,
@@ -102,6 +197,7 @@ async def create_station(
     session.add(new_station)
     await session.commit()
     await session.refresh(new_station)
+    invalidate_metadata()
     assert new_station.id
     return StationRead(
         id=new_station.id,
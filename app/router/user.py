@@ -3,12 +3,13 @@ from fastapi import APIRouter, Form, Depends, status
 from fastapi.exceptions import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import NoResultFound
-from app.deps.user import get_current_user
+from app.deps.user import get_current_user, principal_cache_stats
 from app.database.engine import get_session
 from app.deps.jwt import make_jwt
 from sqlmodel import select
 from pydantic import BaseModel
 from app.database.schema import User, UserRole
+from app.services.ttl_cache import CacheStats
 from .auth import TokenResponse
 
 router = APIRouter(prefix="/user", tags=["用户"])
@@ -67,6 +68,15 @@ async def delete(
     """
     删除当前用户
     """
-    await session.delete(current_user)
+    # current_user 可能来自认证缓存, 需先合并到当前会话
+    await session.delete(await session.merge(current_user))
     await session.commit()
     return Delete(code=200, username=current_user.username)
+
+
+@router.get("/cache/stats", response_model=CacheStats)
+async def cache_stats(current_user: Annotated[User, Depends(get_current_user)]):
+    """
+    获取已认证用户缓存的命中统计
+    """
+    return principal_cache_stats()
@@ -0,0 +1,299 @@
+"""
+累计雨量
+
+每个测站保存最近72小时的雨量数据: 测量时间（epoch微秒）按升序存放在 array 中, 同时保存前缀和,
+任意窗口 (t-w, t] 的累计值是两次二分查找加一次相减; 按时间顺序到达的数据追加到末尾,
+迟到或乱序的数据插入到对应位置并更新其后的前缀和, 早于保存范围的数据忽略
+
+启动时从数据库预热, 之后由入库流程在事务提交后同步; rebuild 从数据库重新加载,
+database_totals 直接用SQL计算, 用于核对内存中的结果
+
+只在当前进程内同步, 多进程部署时其他进程写入的数据不可见, 此时应关闭
+"""
+
+import logging
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Iterable, Sequence
+from pydantic import BaseModel
+from sqlalchemy import Select, case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.engine import get_sessionmaker
+from app.database.schema import MeasurementRow, RainfallData
+from app.services.hot_tier import to_micros
+from app.services.rollup import as_utc
+from app.settings import load_settings
+
+logger = logging.getLogger(__name__)
+
+_accumulator: "RainfallAccumulator | None" = None
+
+HOUR_MICROS = 3600 * 1_000_000
+
+
+class AccumulationWindow(str, Enum):
+    H1 = "1h"
+    H3 = "3h"
+    H6 = "6h"
+    H24 = "24h"
+    H72 = "72h"
+
+    @property
+    def hours(self) -> int:
+        return int(self.value[:-1])
+
+    @property
+    def micros(self) -> int:
+        return self.hours * HOUR_MICROS
+
+
+class AccumulationSource(str, Enum):
+    MEMORY = "memory"
+    DATABASE = "database"
+
+
+# 保存范围, 等于最长的窗口
+HORIZON_MICROS = max(window.micros for window in AccumulationWindow)
+
+# 前缀和相减会带来浮点误差（如 16.200000000000045）, 结果保留的小数位数
+ROUND_DIGITS = 6
+
+
+class StationAccumulation(BaseModel):
+    station_id: int
+    at: datetime
+    # 按窗口的累计雨量
+    totals: dict[AccumulationWindow, float]
+
+
+class AccumulatorStats(BaseModel):
+    stations: int
+    points: int
+    late_points: int
+    dropped_points: int
+    bytes: int
+
+
+class StationSeries:
+    """
+    单个测站的雨量序列
+
+    _sums[i] 为前 i+1 个数据的数值之和（包括已过期的）; 过期数据只前移 _offset,
+    超过一半时才整体压缩并重新计算基数, 追加和过期都是均摊O(1)
+    """
+
+    __slots__ = ("_times", "_sums", "_offset")
+
+    def __init__(self):
+        self._times = array("q")
+        self._sums = array("d")
+        self._offset = 0
+
+    def __len__(self) -> int:
+        return len(self._times) - self._offset
+
+    def _sum_before(self, index: int) -> float:
+        return self._sums[index - 1] if index else 0.0
+
+    def insert(self, time: int, value: float) -> bool | None:
+        """
+        插入一条数据, 返回是否为迟到的数据; 早于保存范围或与已有数据同一时刻时返回None
+        """
+        times, sums = self._times, self._sums
+        size = len(times)
+        if size and time <= times[-1]:
+            if time <= times[-1] - HORIZON_MICROS:
+                return None
+            position = bisect_right(times, time, self._offset)
+            if position > self._offset and times[position - 1] == time:
+                return None
+            times.insert(position, time)
+            sums.insert(position, self._sum_before(position) + value)
+            for i in range(position + 1, size + 1):
+                sums[i] += value
+            return True
+        times.append(time)
+        sums.append(self._sum_before(size) + value)
+        self._expire(time - HORIZON_MICROS)
+        return False
+
+    def _expire(self, before: int) -> None:
+        offset = bisect_right(self._times, before, self._offset)
+        if offset == self._offset:
+            return
+        self._offset = offset
+        if offset * 2 > len(self._times):
+            base = self._sums[offset - 1]
+            self._sums = array("d", (total - base for total in self._sums[offset:]))
+            del self._times[:offset]
+            self._offset = 0
+
+    def total(self, window: AccumulationWindow, at: int) -> float:
+        """(at - 窗口, at] 内的累计雨量"""
+        start = bisect_right(self._times, at - window.micros, self._offset)
+        end = bisect_right(self._times, at, start)
+        return round(self._sum_before(end) - self._sum_before(start), ROUND_DIGITS)
+
+    def totals(self, at: int) -> dict[AccumulationWindow, float]:
+        end = bisect_right(self._times, at, self._offset)
+        upper = self._sum_before(end)
+        result = {}
+        for window in AccumulationWindow:
+            start = bisect_right(self._times, at - window.micros, self._offset, end)
+            result[window] = round(upper - self._sum_before(start), ROUND_DIGITS)
+        return result
+
+    @property
+    def nbytes(self) -> int:
+        return sum(data.buffer_info()[1] * data.itemsize for data in (self._times, self._sums))
+
+
+class RainfallAccumulator:
+    def __init__(self):
+        self._series: dict[int, StationSeries] = {}
+        # rebuild 期间写入的数据, 加载完成后补到新序列中
+        self._replay: list[MeasurementRow] | None = None
+        self.late_points = 0
+        self.dropped_points = 0
+
+    def add(self, rows: Iterable[MeasurementRow]) -> None:
+        series = self._series
+        for row in rows:
+            if self._replay is not None:
+                self._replay.append(row)
+            station = series.get(row.station_id)
+            if station is None:
+                station = series[row.station_id] = StationSeries()
+            late = station.insert(to_micros(row.measure_at), row.value)
+            if late is None:
+                self.dropped_points += 1
+            elif late:
+                self.late_points += 1
+
+    def total(self, station_id: int, window: AccumulationWindow, at: datetime) -> float:
+        station = self._series.get(station_id)
+        return station.total(window, to_micros(at)) if station is not None else 0.0
+
+    def accumulations(
+        self, station_ids: Iterable[int], at: datetime | None = None
+    ) -> list[StationAccumulation]:
+        at = as_utc(at) if at is not None else datetime.now(timezone.utc)
+        micros = to_micros(at)
+        empty = StationSeries()
+        return [
+            StationAccumulation(
+                station_id=station_id,
+                at=at,
+                totals=self._series.get(station_id, empty).totals(micros),
+            )
+            for station_id in station_ids
+        ]
+
+    async def rebuild(self, station_ids: Sequence[int] | None = None) -> int:
+        """从数据库重新加载指定测站（默认全部）, 返回加载的数据条数"""
+        self._replay = []
+        try:
+            series: dict[int, StationSeries] = {}
+            count = 0
+            async with get_sessionmaker()() as session:
+                result = await session.stream(recent_statement(station_ids))
+                async for rows in result.partitions(10000):
+                    for station_id, measure_at, value in rows:
+                        station = series.get(station_id)
+                        if station is None:
+                            station = series[station_id] = StationSeries()
+                        station.insert(to_micros(measure_at), value)
+                    count += len(rows)
+            replay = self._replay
+        finally:
+            self._replay = None
+        if station_ids is None:
+            self._series = series
+        else:
+            for station_id in station_ids:
+                self._series.pop(station_id, None)
+            self._series.update(series)
+        # 同一时刻的数据只保存一次, 已加载过的数据重复加入时被忽略
+        selected = None if station_ids is None else set(station_ids)
+        for row in replay:
+            if selected is None or row.station_id in selected:
+                station = self._series.setdefault(row.station_id, StationSeries())
+                station.insert(to_micros(row.measure_at), row.value)
+        return count
+
+    def stats(self) -> AccumulatorStats:
+        series = self._series.values()
+        return AccumulatorStats(
+            stations=len(self._series),
+            points=sum(len(station) for station in series),
+            late_points=self.late_points,
+            dropped_points=self.dropped_points,
+            bytes=sum(station.nbytes for station in series),
+        )
+
+
+def recent_statement(station_ids: Sequence[int] | None) -> Select:
+    since = datetime.now(timezone.utc) - timedelta(microseconds=HORIZON_MICROS)
+    statement = (
+        select(RainfallData.station_id, RainfallData.measure_at, RainfallData.value)
+        .where(RainfallData.measure_at > since)  # type: ignore
+        .order_by(RainfallData.station_id, RainfallData.measure_at)  # type: ignore
+    )
+    if station_ids is not None:
+        statement = statement.where(RainfallData.station_id.in_(station_ids))  # type: ignore
+    return statement
+
+
+async def database_totals(
+    session: AsyncSession, station_ids: Sequence[int], at: datetime | None = None
+) -> list[StationAccumulation]:
+    """用一条SQL按测站分组计算各窗口的累计雨量, 不使用内存中的数据"""
+    at = as_utc(at) if at is not None else datetime.now(timezone.utc)
+    windows = list(AccumulationWindow)
+    measure_at = RainfallData.measure_at
+    statement = (
+        select(
+            RainfallData.station_id,
+            *(
+                func.sum(
+                    case((measure_at > at - timedelta(hours=window.hours), RainfallData.value))
+                )
+                for window in windows
+            ),
+        )
+        .where(
+            RainfallData.station_id.in_(station_ids),  # type: ignore
+            measure_at > at - timedelta(microseconds=HORIZON_MICROS),  # type: ignore
+            measure_at <= at,  # type: ignore
+        )
+        .group_by(RainfallData.station_id)
+    )
+    rows = {row[0]: row[1:] for row in (await session.execute(statement)).all()}
+    return [
+        StationAccumulation(
+            station_id=station_id,
+            at=at,
+            totals={
+                window: round(total or 0.0, ROUND_DIGITS)
+                for window, total in zip(windows, rows.get(station_id, [None] * len(windows)))
+            },
+        )
+        for station_id in station_ids
+    ]
+
+
+def get_accumulator() -> RainfallAccumulator | None:
+    """获取累计雨量, 未启用时返回None"""
+    return _accumulator
+
+
+async def load_accumulator() -> None:
+    global _accumulator
+    if not load_settings().cache.rainfall_accumulation_enabled:
+        return
+    accumulator = RainfallAccumulator()
+    count = await accumulator.rebuild()
+    logger.info("累计雨量预热完成, 加载 %d 条数据", count)
+    _accumulator = accumulator
@@ -0,0 +1,418 @@
+"""
+阈值报警
+
+每条写入的数据在事务提交后与测站阈值（元数据缓存）比较, 采用边缘检测:
+同一测站同一类型的数据首次超过阈值时创建一条活动报警, 持续超过不再重复报警,
+回落到阈值及以下时自动解除; 报警只在内存中变更, 由后台任务批量落库后再推送,
+不占用写入请求的时间. 设置 rainfall_window 时雨量按该窗口的累计雨量（截至数据的测量时间）比较
+
+报警状态只在当前进程内维护, 多进程部署时应只在一个进程中开启
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Sequence
+from pydantic import BaseModel
+from sqlalchemy import ColumnElement, Select, func, insert, literal, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from app.database.engine import get_sessionmaker
+from app.database.schema import (
+    Alert,
+    AlertStatus,
+    AlertType,
+    MeasurementModel,
+    MeasurementRow,
+    WaterLevelData,
+)
+from app.services.accumulation import AccumulationWindow, RainfallAccumulator, get_accumulator
+from app.services.broadcast import get_broadcaster
+from app.services.metadata import peek_metadata
+from app.services.rollup import as_utc
+from app.settings import load_settings
+
+logger = logging.getLogger(__name__)
+
+_alert_engine: "AlertEngine | None" = None
+
+ALERT_LABELS = {
+    AlertType.WATER_LEVEL: "水位",
+    AlertType.RAINFALL: "雨量",
+}
+
+
+def alert_type_of(model: MeasurementModel) -> AlertType:
+    return AlertType.WATER_LEVEL if model is WaterLevelData else AlertType.RAINFALL
+
+
+class AlertRecord(BaseModel):
+    """
+    内存中的报警, 字段与 Alert 表一致
+
+    构造表模型的开销约为普通pydantic模型的数十倍, 写入路径上只使用这个轻量模型
+    """
+
+    id: int | None = None
+    station_id: int
+    alert_type: AlertType
+    alert_message: str
+    status: AlertStatus
+    trigger_value: float
+    threshold: float
+    trigger_data_id: int
+    trigger_at: datetime
+    revolved_at: datetime | None = None
+
+
+class AlertEngineStats(BaseModel):
+    open_alerts: int
+    evaluated: int
+    triggered: int
+    resolved: int
+    pending_writes: int
+    flushes: int
+    failed_flushes: int
+    last_flush_ms: float
+
+
+class AlertEngine:
+    """
+    报警引擎
+
+    open 中保存每个 (测站, 类型) 当前未解除的报警, 是边缘检测的状态
+    """
+
+    def __init__(
+        self,
+        flush_interval: float,
+        batch_size: int,
+        rainfall_window: AccumulationWindow | None = None,
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.rainfall_window = rainfall_window
+        self.open: dict[tuple[int, AlertType], AlertRecord] = {}
+        # 每个 (测站, 类型) 已评估的最新测量时间, 迟到的数据不改变报警状态
+        self._last_at: dict[tuple[int, AlertType], datetime] = {}
+        # 待落库的报警, 以对象id为键保持顺序并去重
+        self._dirty: dict[int, AlertRecord] = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+        self._evaluated = 0
+        self._triggered = 0
+        self._resolved = 0
+        self._flushes = 0
+        self._failed_flushes = 0
+        self._last_flush_ms = 0.0
+
+    async def load(self) -> None:
+        """从数据库加载未解除的报警"""
+        async with get_sessionmaker()() as session:
+            statement = select(Alert).where(Alert.status != AlertStatus.RESOLVED)
+            alerts = (await session.execute(statement)).scalars().all()
+        self.open = {
+            (alert.station_id, alert.alert_type): AlertRecord.model_validate(
+                alert, from_attributes=True
+            )
+            for alert in alerts
+        }
+
+    def _mark(self, alert: AlertRecord) -> None:
+        self._dirty[id(alert)] = alert
+        if len(self._dirty) >= self.batch_size:
+            self._wakeup.set()
+
+    def _accumulation(
+        self, alert_type: AlertType
+    ) -> tuple[RainfallAccumulator, AccumulationWindow] | None:
+        if alert_type != AlertType.RAINFALL or self.rainfall_window is None:
+            return None
+        accumulator = get_accumulator()
+        if accumulator is None:
+            return None
+        return accumulator, self.rainfall_window
+
+    def _label(self, alert_type: AlertType) -> str:
+        if self._accumulation(alert_type) is not None:
+            return f"{self.rainfall_window.value}累计{ALERT_LABELS[alert_type]}"  # type: ignore
+        return ALERT_LABELS[alert_type]
+
+    def evaluate(self, model: MeasurementModel, rows: Sequence[MeasurementRow]) -> None:
+        """按测量时间顺序评估新写入的数据, 只修改内存状态"""
+        metadata = peek_metadata()
+        if metadata is None or not rows:
+            return
+        alert_type = alert_type_of(model)
+        accumulation = self._accumulation(alert_type)
+        self._evaluated += len(rows)
+        by_station: dict[int, list[MeasurementRow]] = {}
+        for row in rows:
+            by_station.setdefault(row.station_id, []).append(row)
+
+        for station_id, station_rows in by_station.items():
+            station = metadata.station(station_id)
+            if station is None:
+                continue
+            threshold = (
+                station.water_level_threshold
+                if alert_type == AlertType.WATER_LEVEL
+                else station.rainfall_threshold
+            )
+            if threshold is None:
+                continue
+            key = (station_id, alert_type)
+            last_at = self._last_at.get(key)
+            if accumulation is None:
+                values = [row.value for row in station_rows]
+            else:
+                accumulator, window = accumulation
+                values = [
+                    accumulator.total(station_id, window, row.measure_at) for row in station_rows
+                ]
+            if key not in self.open and max(values) <= threshold:
+                # 没有未解除的报警且全部未超过阈值, 不会产生状态变化
+                latest = as_utc(max(row.measure_at for row in station_rows))
+                if last_at is None or latest > last_at:
+                    self._last_at[key] = latest
+                continue
+
+            for measure_at, value, row in sorted(
+                ((as_utc(row.measure_at), value, row) for row, value in zip(station_rows, values)),
+                key=lambda item: item[0],
+            ):
+                if last_at is not None and measure_at < last_at:
+                    continue
+                last_at = measure_at
+                alert = self.open.get(key)
+                if value > threshold and alert is None:
+                    self._trigger(key, station.name, threshold, row, value, measure_at)
+                elif value <= threshold and alert is not None:
+                    self.resolve(alert, measure_at)
+            if last_at is not None:
+                self._last_at[key] = last_at
+
+    def _trigger(
+        self,
+        key: tuple[int, AlertType],
+        station_name: str,
+        threshold: float,
+        row: MeasurementRow,
+        value: float,
+        measure_at: datetime,
+    ) -> None:
+        alert_type = key[1]
+        alert = AlertRecord(
+            station_id=row.station_id,
+            alert_type=alert_type,
+            alert_message=f"{station_name}{self._label(alert_type)} {value} 超过阈值 {threshold}",
+            status=AlertStatus.ACTIVE,
+            trigger_value=value,
+            threshold=threshold,
+            trigger_data_id=row.id,
+            trigger_at=measure_at,
+        )
+        self.open[key] = alert
+        self._triggered += 1
+        self._mark(alert)
+
+    def find(self, alert_id: int) -> AlertRecord | None:
+        for alert in self.open.values():
+            if alert.id == alert_id:
+                return alert
+        return None
+
+    def open_alerts(self, station_ids: Iterable[int] | None = None) -> list[AlertRecord]:
+        """未解除的报警, 按触发时间倒序; 只遍历内存中的未解除报警"""
+        alerts = self.open.values()
+        if station_ids is not None:
+            stations = set(station_ids)
+            alerts = [alert for alert in alerts if alert.station_id in stations]
+        return sorted(alerts, key=lambda alert: as_utc(alert.trigger_at), reverse=True)
+
+    @property
+    def has_unsaved(self) -> bool:
+        """是否有尚未落库（没有id）的报警"""
+        return any(alert.id is None for alert in self._dirty.values())
+
+    def acknowledge(self, alert: AlertRecord) -> None:
+        alert.status = AlertStatus.ACKNOWLEDGED
+        self._mark(alert)
+
+    def resolve(self, alert: AlertRecord, at: datetime | None = None) -> None:
+        """解除报警并从边缘检测状态中移除"""
+        alert.status = AlertStatus.RESOLVED
+        alert.revolved_at = at or datetime.now(timezone.utc)
+        key = (alert.station_id, alert.alert_type)
+        if self.open.get(key) is alert:
+            del self.open[key]
+        self._resolved += 1
+        self._mark(alert)
+
+    async def flush(self) -> int:
+        """将变更的报警批量落库并推送, 返回落库条数"""
+        async with self._lock:
+            if not self._dirty:
+                return 0
+            dirty, self._dirty = self._dirty, {}
+            alerts = list(dirty.values())
+            started = time.perf_counter()
+            new = [alert for alert in alerts if alert.id is None]
+            changed = [alert for alert in alerts if alert.id is not None]
+            ids: Sequence[int] = []
+            try:
+                async with get_sessionmaker()() as session:
+                    if new:
+                        statement = insert(Alert).returning(
+                            Alert.id,  # type: ignore
+                            sort_by_parameter_order=True,
+                        )
+                        values = [alert.model_dump(exclude={"id"}) for alert in new]
+                        ids = (await session.execute(statement, values)).scalars().all()
+                    if changed:
+                        # 按主键批量更新
+                        await session.execute(
+                            update(Alert),
+                            [
+                                {
+                                    "id": alert.id,
+                                    "status": alert.status,
+                                    "revolved_at": alert.revolved_at,
+                                }
+                                for alert in changed
+                            ],
+                        )
+                    await session.commit()
+            except SQLAlchemyError:
+                logger.exception("报警落库失败, %d 条报警将在下次重试", len(alerts))
+                self._failed_flushes += 1
+                self._dirty = dirty | self._dirty
+                return 0
+            except asyncio.CancelledError:
+                self._dirty = dirty | self._dirty
+                raise
+            for alert, alert_id in zip(new, ids):
+                alert.id = alert_id
+
+            self._flushes += 1
+            self._last_flush_ms = (time.perf_counter() - started) * 1000
+            broadcaster = get_broadcaster()
+            for alert in alerts:
+                broadcaster.publish_alert(alert)
+            return len(alerts)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台任务并落库剩余的报警; 不取消后台任务, 正在进行的落库完成后再退出"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        if self._dirty:
+            logger.error("关闭时报警落库失败, 丢弃 %d 条报警", len(self._dirty))
+
+    def stats(self) -> AlertEngineStats:
+        return AlertEngineStats(
+            open_alerts=len(self.open),
+            evaluated=self._evaluated,
+            triggered=self._triggered,
+            resolved=self._resolved,
+            pending_writes=len(self._dirty),
+            flushes=self._flushes,
+            failed_flushes=self._failed_flushes,
+            last_flush_ms=self._last_flush_ms,
+        )
+
+
+def open_alert_conditions(station_ids: list[int] | None) -> list[ColumnElement[bool]]:
+    """
+    未解除报警的查询条件
+
+    状态以字面量写入SQL而不是绑定参数, 使条件与部分索引 ix_alert_open 的条件一致
+    """
+    resolved = literal(
+        AlertStatus.RESOLVED,
+        type_=Alert.__table__.c.status.type,  # type: ignore
+        literal_execute=True,
+    )
+    conditions = [Alert.status != resolved]
+    if station_ids is not None:
+        conditions.append(Alert.station_id.in_(station_ids))  # type: ignore
+    return conditions
+
+
+def open_alerts_statement(station_ids: list[int] | None, limit: int) -> Select:
+    return (
+        select(Alert)
+        .where(*open_alert_conditions(station_ids))
+        .order_by(Alert.trigger_at.desc())  # type: ignore
+        .limit(limit)
+    )
+
+
+async def list_open_alerts(
+    station_ids: list[int] | None = None, limit: int = 100
+) -> tuple[int, list[AlertRecord]]:
+    """返回未解除报警的总数和按触发时间倒序的前 limit 条, 报警引擎开启时直接读内存"""
+    engine = get_alert_engine()
+    if engine is not None:
+        if engine.has_unsaved:
+            # 先落库, 保证返回的报警都有id且与数据表一致
+            await engine.flush()
+        alerts = engine.open_alerts(station_ids)
+        return len(alerts), alerts[:limit]
+
+    async with get_sessionmaker()() as session:
+        count = select(func.count()).select_from(Alert).where(*open_alert_conditions(station_ids))
+        total = (await session.execute(count)).scalar_one()
+        alerts = (await session.execute(open_alerts_statement(station_ids, limit))).scalars().all()
+    return total, [AlertRecord.model_validate(alert, from_attributes=True) for alert in alerts]
+
+
+def get_alert_engine() -> AlertEngine | None:
+    """获取报警引擎, 未启用时返回None"""
+    return _alert_engine
+
+
+async def start_alert_engine() -> None:
+    global _alert_engine
+    settings = load_settings().alert
+    if not settings.enabled or _alert_engine is not None:
+        return
+    if settings.rainfall_window is not None and get_accumulator() is None:
+        logger.warning("累计雨量未开启, 雨量报警按单条数据评估")
+    engine = AlertEngine(
+        flush_interval=settings.flush_interval,
+        batch_size=settings.batch_size,
+        rainfall_window=AccumulationWindow(settings.rainfall_window)
+        if settings.rainfall_window is not None
+        else None,
+    )
+    await engine.load()
+    engine.start()
+    _alert_engine = engine
+
+
+async def stop_alert_engine() -> None:
+    global _alert_engine
+    if _alert_engine is not None:
+        await _alert_engine.stop()
+        _alert_engine = None
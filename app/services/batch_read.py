@@ -0,0 +1,117 @@
+"""
+多测站批量读取
+
+一次请求返回多个测站各自最新的N条数据（可限定时间段）: 不限时间段且N不超过热缓存容量时
+直接从内存读取, 否则一条SQL查询全部测站
+
+没有使用 ROW_NUMBER() OVER (PARTITION BY station_id ...): 窗口函数需要为所请求测站的
+全部历史数据计算排名, 数据量大时很慢; 这里对每个测站沿 (station_id, measure_at) 索引
+只读取N条, PostgreSQL 使用 LATERAL 子查询, 其他数据库使用关联的 IN 子查询
+"""
+
+from datetime import datetime
+from typing import Any
+from sqlalchemy import Select, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from app.database.schema import MeasurementModel, Station
+from app.services.encoding import Columns
+from app.services.hot_tier import from_micros, get_hot_tier, to_micros
+from app.services.rollup import as_utc
+
+# 每个测站的数据, 按时间倒序的 (id, epoch微秒, 数值)
+StationPoints = dict[int, list[tuple[int, int, float]]]
+
+
+def latest_many_statement(
+    dialect: str,
+    model: MeasurementModel,
+    station_ids: list[int],
+    limit: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> Select:
+    """以测站表驱动, 每个测站取最新 limit 条; 测站表中不存在的id不返回数据"""
+    point = aliased(model)
+    conditions = [point.station_id == Station.id]
+    if start is not None:
+        conditions.append(point.measure_at >= as_utc(start))  # type: ignore
+    if end is not None:
+        conditions.append(point.measure_at < as_utc(end))  # type: ignore
+    if dialect == "postgresql":
+        top = (
+            select(point.station_id, point.id, point.measure_at, point.value)
+            .where(*conditions)
+            .order_by(point.measure_at.desc())  # type: ignore
+            .limit(limit)
+            .lateral("top")
+        )
+        return (
+            select(top.c.station_id, top.c.id, top.c.measure_at, top.c.value)
+            .select_from(Station)
+            .join(top, true())
+            .where(Station.id.in_(station_ids))  # type: ignore
+            .order_by(top.c.station_id, top.c.measure_at.desc())
+        )
+    top_ids = (
+        select(point.id)
+        .where(*conditions)
+        .order_by(point.measure_at.desc())  # type: ignore
+        .limit(limit)
+        .correlate(Station)
+    )
+    return (
+        select(model.station_id, model.id, model.measure_at, model.value)
+        .select_from(Station)
+        .join(model, model.id.in_(top_ids))  # type: ignore
+        .where(Station.id.in_(station_ids))  # type: ignore
+        .order_by(model.station_id, model.measure_at.desc())  # type: ignore
+    )
+
+
+async def read_latest_many(
+    session: AsyncSession,
+    model: MeasurementModel,
+    station_ids: list[int],
+    limit: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> StationPoints:
+    """返回每个请求测站的数据, 没有数据的测站对应空列表"""
+    if start is None and end is None:
+        hot_tier = get_hot_tier()
+        if hot_tier is not None:
+            points = hot_tier.latest_many(model, station_ids, limit)
+            if points is not None:
+                return points
+    points: StationPoints = {station_id: [] for station_id in station_ids}
+    dialect = session.bind.dialect.name
+    statement = latest_many_statement(dialect, model, station_ids, limit, start, end)
+    for station_id, id, measure_at, value in (await session.execute(statement)).all():
+        points[station_id].append((id, to_micros(measure_at), value))
+    return points
+
+
+def as_rows(points: StationPoints) -> list[dict[str, Any]]:
+    return [
+        {
+            "station_id": station_id,
+            "data": [
+                {"id": id, "value": value, "measure_at": from_micros(time)}
+                for id, time, value in station_points
+            ],
+        }
+        for station_id, station_points in points.items()
+    ]
+
+
+def as_columns(points: StationPoints) -> list[tuple[int, Columns]]:
+    return [
+        (
+            station_id,
+            Columns(
+                [time for _, time, _ in station_points], [value for _, _, value in station_points]
+            ),
+        )
+        for station_id, station_points in points.items()
+    ]
@@ -0,0 +1,186 @@
+"""
+实时推送
+
+新写入的数据和报警在事务提交后交给进程内唯一的 Broadcaster, 每条消息只编码一次,
+再按订阅的测站/城市分发到各连接的有界队列; 队列满时同一测站的数据只保留最新一条,
+仍然放不下时丢弃最旧的消息, 慢连接不会拖慢写入
+"""
+
+import asyncio
+import json
+from collections import OrderedDict
+from itertools import count
+from typing import Any, Hashable, Iterable, Sequence
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from app.database.schema import MeasurementModel, MeasurementRow, WaterLevelData
+from app.services.metadata import peek_metadata
+from app.settings import load_settings
+
+_broadcaster: "Broadcaster | None" = None
+
+
+class Subscriber:
+    """单个连接的订阅及待发送队列"""
+
+    def __init__(self, stations: set[int], cities: set[int], queue_size: int):
+        self.stations = stations
+        self.cities = cities
+        self.queue_size = queue_size
+        # 键为 (合并键, 序号), 合并键为 None 的消息不参与合并
+        self._queue: OrderedDict[tuple[Hashable, int], tuple[str, str]] = OrderedDict()
+        self._latest: dict[Hashable, tuple[Hashable, int]] = {}
+        self._ready = asyncio.Event()
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def put(self, key: tuple[Hashable, int], event: str, data: str) -> None:
+        merge = key[0]
+        if len(self._queue) >= self.queue_size:
+            previous = self._latest.get(merge) if merge is not None else None
+            if previous is not None and previous in self._queue:
+                del self._queue[previous]
+                self.coalesced += 1
+            else:
+                oldest, _ = self._queue.popitem(last=False)
+                if self._latest.get(oldest[0]) == oldest:
+                    del self._latest[oldest[0]]
+                self.dropped += 1
+        self._queue[key] = (event, data)
+        if merge is not None:
+            self._latest[merge] = key
+        self._ready.set()
+
+    async def get(self, timeout: float) -> list[tuple[str, str]]:
+        """等待并取出全部待发送消息, 超时返回空列表"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        messages = list(self._queue.values())
+        self._queue.clear()
+        self._latest.clear()
+        self.sent += len(messages)
+        return messages
+
+
+class BroadcastStats(BaseModel):
+    connections: int
+    published: int
+    delivered: int
+    coalesced: int
+    dropped: int
+
+
+class Broadcaster:
+    """进程内的消息分发器, 按测站和城市索引订阅者"""
+
+    def __init__(self, queue_size: int, max_connections: int):
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self._subscribers: set[Subscriber] = set()
+        self._by_station: dict[int, set[Subscriber]] = {}
+        self._by_city: dict[int, set[Subscriber]] = {}
+        # 未指定测站和城市的订阅者接收全部消息
+        self._everything: set[Subscriber] = set()
+        self._sequence = count()
+        self.published = 0
+        self._closed_sent = 0
+        self._closed_coalesced = 0
+        self._closed_dropped = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_connections
+
+    def subscribe(self, stations: Iterable[int], cities: Iterable[int]) -> Subscriber | None:
+        """新增订阅, 连接数已满时返回None"""
+        if self.full:
+            return None
+        subscriber = Subscriber(set(stations), set(cities), self.queue_size)
+        self._subscribers.add(subscriber)
+        for station_id in subscriber.stations:
+            self._by_station.setdefault(station_id, set()).add(subscriber)
+        for city_id in subscriber.cities:
+            self._by_city.setdefault(city_id, set()).add(subscriber)
+        if not subscriber.stations and not subscriber.cities:
+            self._everything.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        if subscriber not in self._subscribers:
+            return
+        self._subscribers.discard(subscriber)
+        self._everything.discard(subscriber)
+        for station_id in subscriber.stations:
+            self._by_station.get(station_id, set()).discard(subscriber)
+        for city_id in subscriber.cities:
+            self._by_city.get(city_id, set()).discard(subscriber)
+        self._closed_sent += subscriber.sent
+        self._closed_coalesced += subscriber.coalesced
+        self._closed_dropped += subscriber.dropped
+
+    def _targets(self, station_id: int) -> set[Subscriber]:
+        targets = self._everything | self._by_station.get(station_id, set())
+        metadata = peek_metadata()
+        station = metadata.station(station_id) if metadata is not None else None
+        if station is not None:
+            targets |= self._by_city.get(station.city_id, set())
+        return targets
+
+    def publish(self, station_id: int, merge: Hashable, event: str, payload: Any) -> None:
+        """将消息编码一次后放入所有相关订阅者的队列"""
+        if not self._subscribers:
+            return
+        targets = self._targets(station_id)
+        if not targets:
+            return
+        data = json.dumps(jsonable_encoder(payload), ensure_ascii=False)
+        key = (merge, next(self._sequence))
+        for subscriber in targets:
+            subscriber.put(key, event, data)
+        self.published += 1
+
+    def publish_readings(self, model: MeasurementModel, rows: Sequence[MeasurementRow]) -> None:
+        if not self._subscribers:
+            return
+        kind = "water_level" if model is WaterLevelData else "rainfall"
+        for row in rows:
+            self.publish(
+                row.station_id,
+                (kind, row.station_id),
+                "reading",
+                {
+                    "type": kind,
+                    "id": row.id,
+                    "station_id": row.station_id,
+                    "value": row.value,
+                    "measure_at": row.measure_at,
+                },
+            )
+
+    def publish_alert(self, alert: BaseModel) -> None:
+        """报警消息不参与合并, alert 为报警引擎中的 AlertRecord"""
+        self.publish(alert.station_id, None, "alert", alert.model_dump())
+
+    def stats(self) -> BroadcastStats:
+        subscribers = self._subscribers
+        return BroadcastStats(
+            connections=len(subscribers),
+            published=self.published,
+            delivered=self._closed_sent + sum(s.sent for s in subscribers),
+            coalesced=self._closed_coalesced + sum(s.coalesced for s in subscribers),
+            dropped=self._closed_dropped + sum(s.dropped for s in subscribers),
+        )
+
+
+def get_broadcaster() -> Broadcaster:
+    global _broadcaster
+    if _broadcaster is None:
+        settings = load_settings().live
+        _broadcaster = Broadcaster(
+            queue_size=settings.queue_size, max_connections=settings.max_connections
+        )
+    return _broadcaster
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import time
+from typing import Any
+from pydantic import BaseModel
+from sqlalchemy.exc import DataError, IntegrityError
+from app.database.engine import get_sessionmaker
+from app.database.schema import MeasurementModel
+from app.services.ingest import MeasurementRow, after_commit, write_points
+from app.settings import load_settings
+
+logger = logging.getLogger(__name__)
+
+_write_buffer: "WriteBehindBuffer | None" = None
+
+
+class BufferStats(BaseModel):
+    queued: int
+    capacity: int
+    flushes: int
+    # 实际写入的行数, 不包括因重复被跳过的行
+    flushed_rows: int
+    failed_flushes: int
+    # 无法写入或超过重试次数后丢弃的行数
+    dropped_rows: int
+    rejected_full: int
+    last_batch_size: int
+    avg_batch_size: float
+    last_flush_ms: float
+    avg_flush_ms: float
+    max_flush_ms: float
+
+
+class WriteBehindBuffer:
+    """
+    写后缓冲队列
+
+    单点写入先进入内存, 由后台任务在达到批量大小或定时间隔时以多行INSERT落库;
+    数据本身无法写入时拆分批次, 只丢弃无法写入的行; 数据库不可用时保留在队列中重试,
+    连续失败超过 max_retries 次后丢弃
+    """
+
+    def __init__(self, capacity: int, batch_size: int, flush_interval: float, max_retries: int = 3):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queues: dict[MeasurementModel, list[dict[str, Any]]] = {}
+        self._size = 0
+        self._retries = 0
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+        self._flushes = 0
+        self._batched_rows = 0
+        self._flushed_rows = 0
+        self._failed_flushes = 0
+        self._dropped_rows = 0
+        self._rejected_full = 0
+        self._last_batch_size = 0
+        self._last_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+
+    def offer(self, model: MeasurementModel, row: dict[str, Any]) -> bool:
+        """放入一行数据, 队列已满时返回False"""
+        if self._size >= self.capacity:
+            self._rejected_full += 1
+            return False
+        self._queues.setdefault(model, []).append(row)
+        self._size += 1
+        if self._size >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _requeue(self, queues: dict[MeasurementModel, list[dict[str, Any]]], size: int) -> None:
+        """放回队列头部, 保持原有顺序"""
+        for model, rows in queues.items():
+            self._queues[model] = rows + self._queues.get(model, [])
+        self._size += size
+
+    async def _write(
+        self, queues: dict[MeasurementModel, list[dict[str, Any]]]
+    ) -> dict[MeasurementModel, list[MeasurementRow]]:
+        async with get_sessionmaker()() as session:
+            inserted = {
+                model: await write_points(session, model, rows) for model, rows in queues.items()
+            }
+            await session.commit()
+        return inserted
+
+    async def _write_valid(
+        self, model: MeasurementModel, rows: list[dict[str, Any]]
+    ) -> list[MeasurementRow]:
+        """二分拆分批次写入, 跳过无法写入的行（如测站已删除、没有对应的分区）"""
+        try:
+            return (await self._write({model: rows}))[model]
+        except (IntegrityError, DataError) as e:
+            if len(rows) == 1:
+                logger.warning("写入队列丢弃无法写入的数据 %s: %s", rows[0], e.orig)
+                self._dropped_rows += 1
+                return []
+        middle = len(rows) // 2
+        return await self._write_valid(model, rows[:middle]) + await self._write_valid(
+            model, rows[middle:]
+        )
+
+    async def flush(self) -> int:
+        """将队列中的全部数据落库, 返回实际写入的行数"""
+        async with self._lock:
+            if self._size == 0:
+                return 0
+            queues, self._queues = self._queues, {}
+            size, self._size = self._size, 0
+
+            started = time.perf_counter()
+            try:
+                try:
+                    inserted = await self._write(queues)
+                except (IntegrityError, DataError):
+                    logger.warning("写入队列中有无法写入的数据, 拆分批次重新写入")
+                    inserted = {
+                        model: await self._write_valid(model, rows)
+                        for model, rows in queues.items()
+                    }
+            except Exception:
+                # 数据库不可用, 或维护派生数据（如汇总表）时出错
+                self._failed_flushes += 1
+                self._retries += 1
+                if self._retries > self.max_retries:
+                    logger.exception(
+                        "写入队列连续 %d 次落库失败, 丢弃 %d 行数据", self._retries, size
+                    )
+                    self._dropped_rows += size
+                    self._retries = 0
+                    return 0
+                # 落库失败时放回队列, 等待下次重试; 已写入的行再次写入时作为重复跳过
+                logger.exception("写入队列落库失败, %d 行数据将在下次重试", size)
+                self._requeue(queues, size)
+                return 0
+            except asyncio.CancelledError:
+                self._requeue(queues, size)
+                raise
+            self._retries = 0
+            for model, rows in inserted.items():
+                try:
+                    after_commit(model, rows)
+                except Exception:
+                    # 数据已提交, 进程内派生数据同步失败不影响后续落库
+                    logger.exception("写入队列落库后同步派生数据失败")
+
+            written = sum(len(rows) for rows in inserted.values())
+            elapsed = (time.perf_counter() - started) * 1000
+            self._flushes += 1
+            self._batched_rows += size
+            self._flushed_rows += written
+            self._last_batch_size = size
+            self._last_flush_ms = elapsed
+            self._total_flush_ms += elapsed
+            self._max_flush_ms = max(self._max_flush_ms, elapsed)
+            return written
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("写入队列后台落库出错")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台任务并落库剩余数据; 不取消后台任务, 正在进行的落库完成后再退出"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        # 剩余数据按重试次数落库, 仍然失败时丢弃
+        while self._size and await self.flush() == 0 and self._size:
+            await asyncio.sleep(min(self.flush_interval, 1.0))
+        if self._size:
+            logger.error("关闭时写入队列落库失败, 丢弃 %d 行数据", self._size)
+
+    def stats(self) -> BufferStats:
+        return BufferStats(
+            queued=self._size,
+            capacity=self.capacity,
+            flushes=self._flushes,
+            flushed_rows=self._flushed_rows,
+            failed_flushes=self._failed_flushes,
+            dropped_rows=self._dropped_rows,
+            rejected_full=self._rejected_full,
+            last_batch_size=self._last_batch_size,
+            avg_batch_size=self._batched_rows / self._flushes if self._flushes else 0.0,
+            last_flush_ms=self._last_flush_ms,
+            avg_flush_ms=self._total_flush_ms / self._flushes if self._flushes else 0.0,
+            max_flush_ms=self._max_flush_ms,
+        )
+
+
+def get_write_buffer() -> WriteBehindBuffer | None:
+    """获取写入队列, 持久化模式不是 buffered 时返回None"""
+    return _write_buffer
+
+
+async def start_write_buffer() -> None:
+    global _write_buffer
+    settings = load_settings()
+    if settings.ingest.durability != "buffered":
+        return
+    _write_buffer = WriteBehindBuffer(
+        capacity=settings.ingest.buffer_capacity,
+        batch_size=settings.ingest.buffer_batch_size,
+        flush_interval=settings.ingest.buffer_flush_interval,
+        max_retries=settings.ingest.buffer_max_retries,
+    )
+    _write_buffer.start()
+
+
+async def stop_write_buffer() -> None:
+    global _write_buffer
+    if _write_buffer is not None:
+        await _write_buffer.stop()
+        _write_buffer = None
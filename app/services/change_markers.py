@@ -0,0 +1,82 @@
+"""
+测站数据的变更标记
+
+每张数据表的每个测站记录已写入的最大数据id和最后写入时间, 由入库流程在事务提交后更新,
+读取接口据此生成 ETag/Last-Modified, 不需要查询数据库; 数据id单调递增,
+迟到的数据同样会改变标记
+
+标记只在当前进程内维护: ETag 中包含进程启动标识, 重启后全部失效;
+保留任务删除数据时整体递增代数. 多进程部署时其他进程写入的数据不可见, 此时应关闭
+"""
+
+import os
+import time
+from datetime import datetime, timezone
+from typing import NamedTuple, Sequence
+from app.database.schema import MeasurementModel, MeasurementRow
+from app.services.metadata import MetadataCache
+from app.settings import load_settings
+
+_change_tracker: "ChangeTracker | None" = None
+
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: datetime
+
+
+def _now() -> datetime:
+    # 保留微秒, 生成 Last-Modified 时再截断到秒
+    return datetime.now(timezone.utc)
+
+
+class ChangeTracker:
+    def __init__(self):
+        self.boot = f"{os.getpid():x}{time.time_ns():x}"
+        self.started_at = _now()
+        self.generation = 0
+        self._generation_at = self.started_at
+        self._markers: dict[tuple[str, int], tuple[int, datetime]] = {}
+
+    def record(self, model: MeasurementModel, rows: Sequence[MeasurementRow]) -> None:
+        table = model.__tablename__
+        now = _now()
+        markers = self._markers
+        for row in rows:
+            key = (table, row.station_id)  # type: ignore
+            marker = markers.get(key)
+            version = marker[0] if marker is not None and marker[0] > row.id else row.id
+            markers[key] = (version, now)
+
+    def touch_all(self) -> None:
+        """数据被批量删除等无法逐个测站记录的变更"""
+        self.generation += 1
+        self._generation_at = _now()
+
+    def validators(
+        self, model: MeasurementModel, station_id: int, representation: str = ""
+    ) -> Validators:
+        """representation 区分同一资源的不同响应格式"""
+        version, modified_at = self._markers.get(
+            (model.__tablename__, station_id),  # type: ignore
+            (0, self.started_at),
+        )
+        return Validators(
+            etag=f'W/"{self.boot}-{self.generation}-{version}-{representation}"',
+            last_modified=max(modified_at, self._generation_at),
+        )
+
+    def metadata_validators(self, metadata: MetadataCache) -> Validators:
+        """测站/城市信息的标记, 元数据缓存重新加载后内容变化时才变化"""
+        return Validators(
+            etag=f'W/"{self.boot}-m{metadata.version}"',
+            last_modified=metadata.changed_at,
+        )
+
+
+def get_change_tracker() -> ChangeTracker | None:
+    """获取变更标记, 未启用时返回None"""
+    global _change_tracker
+    if _change_tracker is None and load_settings().cache.conditional_get:
+        _change_tracker = ChangeTracker()
+    return _change_tracker
@@ -0,0 +1,180 @@
+"""
+按城市汇总的大屏统计
+
+水位按每个测站最新一条数据统计（优先读取热缓存, 否则一次查询全部测站）;
+雨量由一条按城市分组的SQL计算近1小时和近24小时的累计值;
+全国合计由各城市的结果合并, 不再单独查询
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from pydantic import BaseModel
+from sqlalchemy import and_, case, distinct, func, select
+from app.database.engine import get_sessionmaker
+from app.database.schema import RainfallData, Station, WaterLevelData
+from app.services.batch_read import read_latest_many
+from app.services.metadata import MetadataCache, get_metadata
+from app.services.ttl_cache import TTLCache
+from app.settings import load_settings
+
+_overview_cache: TTLCache[str, "CityOverview"] | None = None
+_overview_lock = asyncio.Lock()
+
+
+class RegionStats(BaseModel):
+    stations: int = 0
+    active_stations: int = 0
+    # 有水位数据的测站数, 均值和最大值按各测站最新一条数据计算
+    water_level_stations: int = 0
+    water_level_mean: float | None = None
+    water_level_max: float | None = None
+    water_level_over_threshold: int = 0
+    rainfall_1h: float = 0.0
+    rainfall_24h: float = 0.0
+    # 近1小时内有数据超过雨量阈值的测站数
+    rainfall_over_threshold: int = 0
+
+
+class CityStats(RegionStats):
+    city_id: int
+    city: str
+
+
+class CityOverview(BaseModel):
+    cities: list[CityStats]
+    total: RegionStats
+    generated_at: datetime
+
+
+class _Accumulator:
+    """合并水位统计用的中间值, 均值需要保留总和与数量"""
+
+    __slots__ = ("count", "total", "maximum", "over")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum: float | None = None
+        self.over = 0
+
+    def add(self, value: float, threshold: float | None) -> None:
+        self.count += 1
+        self.total += value
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        if threshold is not None and value > threshold:
+            self.over += 1
+
+    def merge(self, other: "_Accumulator") -> None:
+        self.count += other.count
+        self.total += other.total
+        if other.maximum is not None:
+            self.maximum = (
+                other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+            )
+        self.over += other.over
+
+    def fill(self, stats: RegionStats) -> None:
+        stats.water_level_stations = self.count
+        stats.water_level_mean = self.total / self.count if self.count else None
+        stats.water_level_max = self.maximum
+        stats.water_level_over_threshold = self.over
+
+
+async def water_level_by_city(metadata: MetadataCache) -> dict[int, _Accumulator]:
+    async with get_sessionmaker()() as session:
+        points = await read_latest_many(session, WaterLevelData, list(metadata.stations), 1)
+    result: dict[int, _Accumulator] = {}
+    for station_id, latest in points.items():
+        station = metadata.station(station_id)
+        if not latest or station is None:
+            continue
+        accumulator = result.setdefault(station.city_id, _Accumulator())
+        accumulator.add(latest[0][2], station.water_level_threshold)
+    return result
+
+
+async def rainfall_by_city(now: datetime) -> dict[int, tuple[float, float, int]]:
+    """每个城市近1小时雨量、近24小时雨量和近1小时超过阈值的测站数"""
+    recent = RainfallData.measure_at >= now - timedelta(hours=1)  # type: ignore
+    over = and_(recent, RainfallData.value > Station.rainfall_threshold)
+    statement = (
+        select(
+            Station.city_id,
+            func.sum(case((recent, RainfallData.value), else_=0.0)),
+            func.sum(RainfallData.value),
+            func.count(distinct(case((over, Station.id)))),
+        )
+        .select_from(Station)
+        # 以测站表驱动, 每个测站沿 (station_id, measure_at) 索引读取时间范围内的数据
+        .join(
+            RainfallData,
+            and_(
+                RainfallData.station_id == Station.id,
+                RainfallData.measure_at >= now - timedelta(hours=24),  # type: ignore
+            ),
+        )
+        .group_by(Station.city_id)
+    )
+    async with get_sessionmaker()() as session:
+        rows = (await session.execute(statement)).all()
+    return {city_id: (hour or 0.0, day or 0.0, count) for city_id, hour, day, count in rows}
+
+
+async def build_overview() -> CityOverview:
+    """水位和雨量互不依赖, 分别使用独立会话并发执行"""
+    metadata = await get_metadata()
+    now = datetime.now(timezone.utc)
+    water_level, rainfall = await asyncio.gather(
+        water_level_by_city(metadata), rainfall_by_city(now)
+    )
+
+    total = RegionStats()
+    total_water_level = _Accumulator()
+    cities = []
+    for city_id, city in sorted(metadata.cities.items()):
+        stations = metadata.stations_of_city(city_id)
+        stats = CityStats(
+            city_id=city_id,
+            city=city.name,
+            stations=len(stations),
+            active_stations=sum(1 for station in stations if station.is_active),
+        )
+        accumulator = water_level.get(city_id, _Accumulator())
+        accumulator.fill(stats)
+        total_water_level.merge(accumulator)
+        stats.rainfall_1h, stats.rainfall_24h, stats.rainfall_over_threshold = rainfall.get(
+            city_id, (0.0, 0.0, 0)
+        )
+        total.stations += stats.stations
+        total.active_stations += stats.active_stations
+        total.rainfall_1h += stats.rainfall_1h
+        total.rainfall_24h += stats.rainfall_24h
+        total.rainfall_over_threshold += stats.rainfall_over_threshold
+        cities.append(stats)
+    total_water_level.fill(total)
+    return CityOverview(cities=cities, total=total, generated_at=now)
+
+
+def get_overview_cache() -> TTLCache[str, CityOverview]:
+    global _overview_cache
+    if _overview_cache is None:
+        _overview_cache = TTLCache(max_size=1, ttl=load_settings().cache.dashboard_ttl)
+    return _overview_cache
+
+
+async def get_overview() -> CityOverview:
+    """
+    获取各城市统计
+
+    与大屏汇总相同, 结果缓存 dashboard_ttl 秒, 过期时只有一个请求重新计算
+    """
+    cache = get_overview_cache()
+    overview = cache.get("overview")
+    if overview is not None:
+        return overview
+    async with _overview_lock:
+        overview = cache.get("overview")
+        if overview is None:
+            overview = await build_overview()
+            cache.set("overview", overview)
+    return overview
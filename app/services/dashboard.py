@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime, timezone
+from pydantic import BaseModel
+from app.database.engine import get_sessionmaker
+from app.database.schema import MeasurementModel, WaterLevelData, RainfallData
+from app.services.alerts import AlertRecord, list_open_alerts
+from app.services.batch_read import read_latest_many
+from app.services.hot_tier import from_micros
+from app.services.metadata import get_metadata
+from app.services.ttl_cache import TTLCache
+from app.settings import load_settings
+
+_summary_cache: TTLCache[str, "DashboardSummary"] | None = None
+_summary_lock = asyncio.Lock()
+
+
+class LatestReading(BaseModel):
+    station_id: int
+    value: float
+    measure_at: datetime
+
+
+class DashboardSummary(BaseModel):
+    total_stations: int
+    active_stations: int
+    total_cities: int
+    latest_water_level: list[LatestReading]
+    latest_rainfall: list[LatestReading]
+    active_alert_count: int
+    active_alerts: list[AlertRecord]
+    generated_at: datetime
+
+
+async def latest_readings(model: MeasurementModel, station_ids: list[int]) -> list[LatestReading]:
+    """
+    每个测站最新一条数据
+
+    启用热缓存时直接从内存读取, 否则每个测站沿 (station_id, measure_at) 索引只读取一条,
+    不对全部历史数据排序或计算窗口函数
+    """
+    async with get_sessionmaker()() as session:
+        points = await read_latest_many(session, model, station_ids, 1)
+    return [
+        LatestReading(
+            station_id=station_id, value=latest[0][2], measure_at=from_micros(latest[0][1])
+        )
+        for station_id, latest in points.items()
+        if latest
+    ]
+
+
+async def build_summary() -> DashboardSummary:
+    """各子查询互不依赖, 分别使用连接池中的独立会话并发执行"""
+    settings = load_settings()
+    metadata = await get_metadata()
+    station_ids = sorted(metadata.stations)
+    water_level, rainfall, (alert_count, alerts) = await asyncio.gather(
+        latest_readings(WaterLevelData, station_ids),
+        latest_readings(RainfallData, station_ids),
+        list_open_alerts(limit=settings.cache.dashboard_alert_limit),
+    )
+    return DashboardSummary(
+        total_stations=len(metadata.stations),
+        active_stations=sum(1 for station in metadata.stations.values() if station.is_active),
+        total_cities=len(metadata.cities),
+        latest_water_level=water_level,
+        latest_rainfall=rainfall,
+        active_alert_count=alert_count,
+        active_alerts=alerts,
+        generated_at=datetime.now(timezone.utc),
+    )
+
+
+def get_summary_cache() -> TTLCache[str, DashboardSummary]:
+    global _summary_cache
+    if _summary_cache is None:
+        _summary_cache = TTLCache(max_size=1, ttl=load_settings().cache.dashboard_ttl)
+    return _summary_cache
+
+
+async def get_summary() -> DashboardSummary:
+    """
+    获取大屏汇总数据
+
+    结果缓存 dashboard_ttl 秒; 缓存过期时只有一个请求重新计算, 其余请求等待并复用结果
+    """
+    cache = get_summary_cache()
+    summary = cache.get("summary")
+    if summary is not None:
+        return summary
+    async with _summary_lock:
+        summary = cache.get("summary")
+        if summary is None:
+            summary = await build_summary()
+            cache.set("summary", summary)
+    return summary
@@ -0,0 +1,146 @@
+"""
+数据读取接口的紧凑响应格式
+
+列式JSON只包含时间和数值两列: {"t": [epoch毫秒, ...], "v": [数值, ...]},
+不构造逐行的字典和pydantic对象; 安装 orjson 时用它编码, 否则退回标准库 json
+
+二进制格式（Accept: application/vnd.smarthydra.series）由一个或多个帧组成,
+每帧一条序列, 所有整数和浮点数均为小端序:
+
+    偏移      长度  内容
+    0         4     帧长度 L（uint32, 不含这4个字节）
+    4         2     魔数 b"SH"
+    6         1     版本, 当前为 1
+    7         1     保留, 为 0
+    8         4     测站id（uint32）
+    12        4     点数 n（uint32）
+    16        8n    时间（int64, epoch毫秒）: 第一个为绝对值, 其后为与前一个点的差
+    16+8n     4n    数值（float32）
+
+L = 12 + 12n; 时间顺序与对应的JSON接口相同, 解码见 decode_frames
+"""
+
+import json
+import struct
+import sys
+from array import array
+from enum import Enum
+from itertools import accumulate
+from typing import Any, NamedTuple, Sequence
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class Layout(str, Enum):
+    ROWS = "rows"
+    # 逐行, 只包含 id、station_id、value、measure_at
+    COMPACT = "compact"
+    COLUMNAR = "columnar"
+
+
+class Columns(NamedTuple):
+    """按列存放的序列, 时间为 epoch 微秒"""
+
+    times: list[int]
+    values: list[float]
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def columnar_json(columns: Columns) -> bytes:
+    return dumps({"t": [time // 1000 for time in columns.times], "v": columns.values})
+
+
+def stations_columnar_json(series: Sequence[tuple[int, Columns]]) -> bytes:
+    """多个测站: [{"station_id": 1, "t": [...], "v": [...]}, ...]"""
+    return dumps(
+        [
+            {
+                "station_id": station_id,
+                "t": [time // 1000 for time in columns.times],
+                "v": columns.values,
+            }
+            for station_id, columns in series
+        ]
+    )
+
+
+class ColumnarResponse(Response):
+    """content 为单个序列 Columns 或多个测站的 [(测站id, Columns)]"""
+
+    media_type = "application/json"
+
+    def render(self, content: Columns | Sequence[tuple[int, Columns]]) -> bytes:
+        if isinstance(content, Columns):
+            return columnar_json(content)
+        return stations_columnar_json(content)
+
+
+BINARY_MEDIA_TYPE = "application/vnd.smarthydra.series"
+FRAME_MAGIC = b"SH"
+FRAME_VERSION = 1
+# 帧长度之后的帧头: 魔数、版本、保留、测站id、点数
+FRAME_HEADER = struct.Struct("<2sBBII")
+
+
+def accepts_binary(accept: str | None) -> bool:
+    """Accept 请求头中是否包含二进制序列格式"""
+    if not accept:
+        return False
+    return any(part.split(";")[0].strip() == BINARY_MEDIA_TYPE for part in accept.split(","))
+
+
+def _little_endian(data: array) -> bytes:
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def encode_frame(station_id: int, columns: Columns) -> bytes:
+    millis = [time // 1000 for time in columns.times]
+    deltas = array("q", millis[:1])
+    deltas.extend(current - previous for previous, current in zip(millis, millis[1:]))
+    body = (
+        FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, 0, station_id, len(millis))
+        + _little_endian(deltas)
+        + _little_endian(array("f", columns.values))
+    )
+    return struct.pack("<I", len(body)) + body
+
+
+def decode_frames(data: bytes) -> list[tuple[int, list[int], list[float]]]:
+    """解码二进制响应, 返回每帧的 (测站id, epoch毫秒列表, 数值列表)"""
+    frames = []
+    offset = 0
+    while offset < len(data):
+        (length,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        magic, version, _, station_id, count = FRAME_HEADER.unpack_from(data, offset)
+        if magic != FRAME_MAGIC or version != FRAME_VERSION:
+            raise ValueError("不支持的帧格式")
+        if length != FRAME_HEADER.size + 12 * count:
+            raise ValueError("帧长度与点数不一致")
+        start = offset + FRAME_HEADER.size
+        deltas = array("q", data[start : start + 8 * count])
+        values = array("f", data[start + 8 * count : offset + length])
+        if sys.byteorder != "little":
+            deltas.byteswap()
+            values.byteswap()
+        frames.append((station_id, list(accumulate(deltas)), values.tolist()))
+        offset += length
+    return frames
+
+
+class BinaryResponse(Response):
+    media_type = BINARY_MEDIA_TYPE
+
+    def render(self, content: Sequence[tuple[int, Columns]]) -> bytes:
+        return b"".join(encode_frame(station_id, columns) for station_id, columns in content)
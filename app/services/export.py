@@ -0,0 +1,175 @@
+"""
+测量数据导出
+
+使用服务端游标按 export_chunk_size 分批读取, 每批编码后立即写出, 导出任意长的历史
+内存占用都保持不变; 支持 CSV、NDJSON, 安装 pyarrow 时还支持 Parquet 和 Arrow IPC,
+可选gzip压缩
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, Sequence
+from sqlalchemy import Row, select
+from app.database.engine import get_sessionmaker
+from app.database.schema import MeasurementModel
+from app.services.rollup import as_utc
+from app.settings import load_settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+    ARROW = "arrow"
+
+
+MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+    ExportFormat.ARROW: "application/vnd.apache.arrow.stream",
+}
+
+COLUMNS = ("station_id", "measure_at", "value")
+
+
+def format_available(format: ExportFormat) -> bool:
+    """列式格式依赖可选的 pyarrow"""
+    return format in (ExportFormat.CSV, ExportFormat.NDJSON) or pa is not None
+
+
+class _Sink(io.RawIOBase):
+    """收集 pyarrow 写出的字节, 每批数据编码后取走"""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class Encoder:
+    """将分批读取的数据编码为字节块"""
+
+    def __init__(self, format: ExportFormat):
+        self.format = format
+        self._sink = _Sink()
+        self._writer = None
+        if format in (ExportFormat.PARQUET, ExportFormat.ARROW):
+            schema = pa.schema(
+                [
+                    ("station_id", pa.int64()),
+                    ("measure_at", pa.timestamp("us", tz="UTC")),
+                    ("value", pa.float64()),
+                ]
+            )
+            if format == ExportFormat.PARQUET:
+                self._writer = pq.ParquetWriter(self._sink, schema)
+            else:
+                self._writer = pa.ipc.new_stream(self._sink, schema)
+            self._schema = schema
+
+    def header(self) -> bytes:
+        if self.format == ExportFormat.CSV:
+            return (",".join(COLUMNS) + "\n").encode()
+        return self._sink.take()
+
+    def encode(self, rows: Sequence[Row]) -> bytes:
+        if self.format == ExportFormat.CSV:
+            text = io.StringIO()
+            writer = csv.writer(text, lineterminator="\n")
+            writer.writerows(
+                (station_id, as_utc(measure_at).isoformat(), value)
+                for station_id, measure_at, value in rows
+            )
+            return text.getvalue().encode()
+        if self.format == ExportFormat.NDJSON:
+            return "".join(
+                json.dumps(
+                    {
+                        "station_id": station_id,
+                        "measure_at": as_utc(measure_at).isoformat(),
+                        "value": value,
+                    }
+                )
+                + "\n"
+                for station_id, measure_at, value in rows
+            ).encode()
+        station_ids, times, values = zip(*rows)
+        batch = pa.record_batch(
+            [
+                pa.array(station_ids, pa.int64()),
+                pa.array([as_utc(t) for t in times], pa.timestamp("us", tz="UTC")),
+                pa.array(values, pa.float64()),
+            ],
+            schema=self._schema,
+        )
+        # Parquet 每批写为一个 row group, Arrow IPC 每批一条消息
+        self._writer.write_batch(batch)  # type: ignore
+        return self._sink.take()
+
+    def footer(self) -> bytes:
+        if self._writer is not None:
+            self._writer.close()
+        return self._sink.take()
+
+
+async def export_measurements(
+    model: MeasurementModel,
+    station_ids: list[int],
+    start: datetime | None,
+    end: datetime | None,
+    format: ExportFormat,
+    gzip: bool = False,
+) -> AsyncIterator[bytes]:
+    """
+    按测站、测量时间顺序导出数据, 逐块产出编码后的字节
+
+    使用独立的会话, 连接在整个响应期间占用, 响应结束或客户端断开时释放
+    """
+    statement = (
+        select(model.station_id, model.measure_at, model.value)
+        .where(model.station_id.in_(station_ids))  # type: ignore
+        .order_by(model.station_id, model.measure_at)  # type: ignore
+    )
+    if start is not None:
+        statement = statement.where(model.measure_at >= as_utc(start))  # type: ignore
+    if end is not None:
+        statement = statement.where(model.measure_at < as_utc(end))  # type: ignore
+    chunk_size = load_settings().query.export_chunk_size
+    encoder = Encoder(format)
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if gzip else None
+
+    def emit(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor is not None else data
+
+    yield emit(encoder.header())
+    async with get_sessionmaker()() as session:
+        result = await session.stream(statement.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions():
+            data = emit(encoder.encode(rows))
+            if data:
+                yield data
+    yield emit(encoder.footer())
+    if compressor is not None:
+        yield compressor.flush()
@@ -0,0 +1,260 @@
+"""
+最新数据热缓存
+
+每个测站一个固定容量的环形缓冲区, 时间戳（epoch微秒）、数据id和数值分别存放在
+array 中, 不保存Python对象; 启动时从数据库预热, 之后由入库流程在事务提交后同步,
+"最新N条"查询在 N 不超过容量时直接从内存返回;
+不保存 created_at 和 updated_at, 只用于 layout=compact、列式JSON和二进制格式
+
+缓存只在当前进程内同步, 多进程部署时其他进程写入的数据不可见, 此时应关闭
+"""
+
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable
+from pydantic import BaseModel
+from sqlalchemy import func, select
+from app.database.engine import get_sessionmaker
+from app.database.schema import MeasurementModel, MeasurementRow, WaterLevelData, RainfallData
+from app.services.rollup import as_utc
+from app.settings import load_settings
+
+_hot_tier: "HotTier | None" = None
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_micros(value: datetime) -> int:
+    return (as_utc(value) - EPOCH) // MICROSECOND
+
+
+def from_micros(value: int) -> datetime:
+    return EPOCH + value * MICROSECOND
+
+
+class StationRing:
+    """单个测站的环形缓冲区, 按测量时间升序保存最新的 capacity 条数据"""
+
+    __slots__ = ("capacity", "size", "_start", "_ids", "_times", "_values")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.size = 0
+        self._start = 0
+        self._ids = array("q", bytes(8 * capacity))
+        self._times = array("q", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+
+    def _index(self, i: int) -> int:
+        return (self._start + i) % self.capacity
+
+    def _bisect(self, time: int, right: bool) -> int:
+        """返回逻辑下标: right 时为第一个时间大于 time 的位置, 否则为第一个不小于 time 的位置"""
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = self._times[self._index(mid)]
+            if current < time or (right and current == time):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def insert(self, id: int, time: int, value: float) -> bool:
+        """
+        插入一条数据, 已存在相同时刻或早于缓冲区中全部数据（已满时）则忽略
+
+        按时间顺序到达时为 O(1), 迟到的数据需要移动其后的元素
+        """
+        capacity = self.capacity
+        if self.size and time <= self._times[self._index(self.size - 1)]:
+            position = self._bisect(time, right=True)
+            if position and self._times[self._index(position - 1)] == time:
+                return False
+            if position == 0 and self.size == capacity:
+                return False
+        else:
+            position = self.size
+
+        if self.size == capacity:
+            # 已满时丢弃最旧的一条
+            self._start = (self._start + 1) % capacity
+            self.size -= 1
+            position -= 1
+        for i in range(self.size, position, -1):
+            target, source = self._index(i), self._index(i - 1)
+            self._ids[target] = self._ids[source]
+            self._times[target] = self._times[source]
+            self._values[target] = self._values[source]
+        index = self._index(position)
+        self._ids[index] = id
+        self._times[index] = time
+        self._values[index] = value
+        self.size += 1
+        return True
+
+    def latest(self, limit: int) -> list[tuple[int, int, float]]:
+        """按时间倒序返回最新 limit 条 (id, 时间, 数值)"""
+        result = []
+        for i in range(self.size - 1, max(self.size - limit, 0) - 1, -1):
+            index = self._index(i)
+            result.append((self._ids[index], self._times[index], self._values[index]))
+        return result
+
+    def latest_columns(self, limit: int) -> tuple[list[int], list[float]]:
+        """按时间倒序返回最新 limit 条的时间和数值两列"""
+        times, values = [], []
+        for i in range(self.size - 1, max(self.size - limit, 0) - 1, -1):
+            index = self._index(i)
+            times.append(self._times[index])
+            values.append(self._values[index])
+        return times, values
+
+    def discard_before(self, time: int) -> int:
+        """丢弃早于 time 的数据, 返回丢弃条数"""
+        count = self._bisect(time, right=False)
+        self._start = self._index(count)
+        self.size -= count
+        return count
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            data.buffer_info()[1] * data.itemsize for data in (self._ids, self._times, self._values)
+        )
+
+
+class HotTierStats(BaseModel):
+    capacity: int
+    rings: int
+    points: int
+    bytes: int
+    bytes_per_station: int
+    hits: int
+    misses: int
+
+
+class HotTier:
+    """按数据表和测站组织的环形缓冲区集合"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._rings: dict[MeasurementModel, dict[int, StationRing]] = {
+            WaterLevelData: {},
+            RainfallData: {},
+        }
+        self.hits = 0
+        self.misses = 0
+
+    def _ring(self, model: MeasurementModel, station_id: int) -> StationRing:
+        rings = self._rings[model]
+        ring = rings.get(station_id)
+        if ring is None:
+            ring = rings[station_id] = StationRing(self.capacity)
+        return ring
+
+    def add(self, model: MeasurementModel, rows: Iterable[MeasurementRow]) -> None:
+        for row in rows:
+            self._ring(model, row.station_id).insert(row.id, to_micros(row.measure_at), row.value)
+
+    def latest(
+        self, model: MeasurementModel, station_id: int, limit: int
+    ) -> list[dict[str, Any]] | None:
+        """返回测站最新 limit 条数据, limit 超过容量时返回None, 需查询数据库"""
+        if limit > self.capacity:
+            self.misses += 1
+            return None
+        self.hits += 1
+        ring = self._rings[model].get(station_id)
+        if ring is None:
+            return []
+        return [
+            {"id": id, "station_id": station_id, "value": value, "measure_at": from_micros(time)}
+            for id, time, value in ring.latest(limit)
+        ]
+
+    def latest_columns(
+        self, model: MeasurementModel, station_id: int, limit: int
+    ) -> tuple[list[int], list[float]] | None:
+        """与 latest 相同, 但只返回时间和数值两列, 不构造逐行的字典"""
+        if limit > self.capacity:
+            self.misses += 1
+            return None
+        self.hits += 1
+        ring = self._rings[model].get(station_id)
+        if ring is None:
+            return [], []
+        return ring.latest_columns(limit)
+
+    def latest_many(
+        self, model: MeasurementModel, station_ids: Iterable[int], limit: int
+    ) -> dict[int, list[tuple[int, int, float]]] | None:
+        """多个测站各自最新 limit 条 (id, 时间, 数值), limit 超过容量时返回None"""
+        if limit > self.capacity:
+            self.misses += 1
+            return None
+        self.hits += 1
+        rings = self._rings[model]
+        empty = StationRing(0)
+        return {
+            station_id: rings.get(station_id, empty).latest(limit) for station_id in station_ids
+        }
+
+    def discard_before(self, model: MeasurementModel, before: datetime) -> int:
+        time = to_micros(before)
+        return sum(ring.discard_before(time) for ring in self._rings[model].values())
+
+    async def warm(self) -> None:
+        """从数据库加载每个测站最新的 capacity 条数据"""
+        async with get_sessionmaker()() as session:
+            for model in self._rings:
+                rank = (
+                    func.row_number()
+                    .over(
+                        partition_by=model.station_id,
+                        order_by=model.measure_at.desc(),  # type: ignore
+                    )
+                    .label("rank")
+                )
+                ranked = select(
+                    model.id, model.station_id, model.measure_at, model.value, rank
+                ).subquery()
+                statement = (
+                    select(ranked.c.id, ranked.c.station_id, ranked.c.measure_at, ranked.c.value)
+                    .where(ranked.c.rank <= self.capacity)
+                    .order_by(ranked.c.station_id, ranked.c.measure_at)
+                )
+                result = await session.stream(statement)
+                async for rows in result.partitions(10000):
+                    self.add(model, (MeasurementRow(*row) for row in rows))
+
+    def stats(self) -> HotTierStats:
+        rings = [ring for rings in self._rings.values() for ring in rings.values()]
+        total = sum(ring.nbytes for ring in rings)
+        return HotTierStats(
+            capacity=self.capacity,
+            rings=len(rings),
+            points=sum(ring.size for ring in rings),
+            bytes=total,
+            # 每个测站在每张表中最多一个缓冲区
+            bytes_per_station=StationRing(self.capacity).nbytes * len(self._rings),
+            hits=self.hits,
+            misses=self.misses,
+        )
+
+
+def get_hot_tier() -> HotTier | None:
+    """获取热缓存, 未启用时返回None"""
+    return _hot_tier
+
+
+async def load_hot_tier() -> None:
+    global _hot_tier
+    settings = load_settings()
+    if not settings.cache.hot_tier_enabled:
+        return
+    hot_tier = HotTier(capacity=settings.cache.hot_tier_capacity)
+    await hot_tier.warm()
+    _hot_tier = hot_tier
@@ -0,0 +1,228 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Any, AsyncIterable, BinaryIO, Iterable, Sequence
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import Insert, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.schema import MeasurementModel, MeasurementRow, RainfallData
+from app.services.accumulation import get_accumulator
+from app.services.alerts import get_alert_engine
+from app.services.broadcast import get_broadcaster
+from app.services.change_markers import get_change_tracker
+from app.services.hot_tier import get_hot_tier
+from app.services.metadata import get_metadata
+from app.services.query_cache import get_query_cache
+from app.services.rollup import update_rollups
+from app.settings import load_settings
+
+
+class IngestPoint(BaseModel):
+    """批量入库的单个数据点"""
+
+    station_id: int
+    measure_at: datetime | None = None
+    value: float = Field(allow_inf_nan=False)
+
+
+class IngestError(BaseModel):
+    row: int
+    reason: str
+
+
+class IngestResult(BaseModel):
+    accepted: int = 0
+    rejected: int = 0
+    # 同一测站同一时刻已有数据而被跳过的行数
+    duplicates: int = 0
+    errors: list[IngestError] = Field(default_factory=list)
+
+
+def insert_ignore_duplicates(dialect: str, model: MeasurementModel) -> Insert:
+    """多行插入语句, 与唯一索引 (station_id, measure_at) 冲突的行直接跳过"""
+    if dialect == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing()
+    return insert(model)
+
+
+async def after_insert(
+    session: AsyncSession, model: MeasurementModel, rows: Sequence[MeasurementRow]
+) -> None:
+    """数据写入后、提交前调用, 在同一事务内维护汇总表"""
+    await update_rollups(session, model, rows)
+
+
+def after_commit(model: MeasurementModel, rows: Sequence[MeasurementRow]) -> None:
+    """数据提交后调用, 同步进程内的派生数据"""
+    if not rows:
+        return
+    hot_tier = get_hot_tier()
+    if hot_tier is not None:
+        hot_tier.add(model, rows)
+    accumulator = get_accumulator()
+    if accumulator is not None and model is RainfallData:
+        # 在报警评估之前更新, 报警可以按累计雨量判断
+        accumulator.add(rows)
+    change_tracker = get_change_tracker()
+    if change_tracker is not None:
+        change_tracker.record(model, rows)
+    query_cache = get_query_cache()
+    if query_cache is not None:
+        query_cache.invalidate_stations(model, {row.station_id for row in rows})
+    get_broadcaster().publish_readings(model, rows)
+    alert_engine = get_alert_engine()
+    if alert_engine is not None:
+        alert_engine.evaluate(model, rows)
+
+
+async def write_points(
+    session: AsyncSession, model: MeasurementModel, rows: list[dict[str, Any]]
+) -> list[MeasurementRow]:
+    """多行写入数据点并维护派生数据, 不提交事务; 返回实际写入（未因重复被跳过）的行"""
+    columns = (model.id, model.station_id, model.measure_at, model.value)
+    statement = insert_ignore_duplicates(session.bind.dialect.name, model)
+    statement = statement.returning(*columns)  # type: ignore
+    inserted = [MeasurementRow(*row) for row in (await session.execute(statement, rows)).all()]
+    await after_insert(session, model, inserted)
+    return inserted
+
+
+class BulkWriter:
+    """
+    批量写入器
+
+    数据点先在内存中按块累积, 站点通过元数据缓存校验,
+    然后以一条多行INSERT写入并提交, 一个块对应一个事务
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        model: MeasurementModel,
+        chunk_size: int | None = None,
+        max_errors: int | None = None,
+    ):
+        settings = load_settings()
+        self.session = session
+        self.model = model
+        self.chunk_size = chunk_size or settings.ingest.batch_chunk_size
+        self.max_errors = max_errors if max_errors is not None else settings.ingest.max_batch_errors
+        self.result = IngestResult()
+        self._pending: list[tuple[int, IngestPoint]] = []
+
+    def reject(self, row: int, reason: str) -> None:
+        self.result.rejected += 1
+        if len(self.result.errors) < self.max_errors:
+            self.result.errors.append(IngestError(row=row, reason=reason))
+
+    async def add(self, row: int, raw: Any) -> None:
+        """校验一行原始数据并加入待写入块, 块满时自动写入"""
+        if not isinstance(raw, dict):
+            self.reject(row, "数据格式错误")
+            return
+        try:
+            point = IngestPoint.model_validate(raw)
+        except ValidationError as e:
+            self.reject(row, "; ".join(err["msg"] for err in e.errors()))
+            return
+        self._pending.append((row, point))
+        if len(self._pending) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """写入当前块"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        metadata = await get_metadata()
+
+        now = datetime.now(timezone.utc)
+        rows: list[dict[str, Any]] = []
+        written: list[int] = []
+        for row, point in pending:
+            if metadata.station(point.station_id) is None:
+                self.reject(row, "站点不存在")
+                continue
+            written.append(row)
+            rows.append(
+                {
+                    "station_id": point.station_id,
+                    "measure_at": point.measure_at or now,
+                    "value": point.value,
+                }
+            )
+        if not rows:
+            return
+        try:
+            inserted = await write_points(self.session, self.model, rows)
+            await self.session.commit()
+        except SQLAlchemyError:
+            await self.session.rollback()
+            for row in written:
+                self.reject(row, "写入数据库失败")
+            return
+        after_commit(self.model, inserted)
+        self.result.accepted += len(inserted)
+        self.result.duplicates += len(rows) - len(inserted)
+
+    async def finish(self) -> IngestResult:
+        await self.flush()
+        return self.result
+
+
+async def ingest_json(
+    session: AsyncSession, model: MeasurementModel, items: Iterable[Any]
+) -> IngestResult:
+    """写入JSON数组形式的数据点"""
+    writer = BulkWriter(session, model)
+    for row, item in enumerate(items):
+        await writer.add(row, item)
+    return await writer.finish()
+
+
+async def ingest_ndjson(
+    session: AsyncSession, model: MeasurementModel, stream: AsyncIterable[bytes]
+) -> IngestResult:
+    """
+    写入NDJSON流, 每行一个JSON对象
+
+    请求体按块读取并逐块写入, 内存占用与请求体大小无关
+    """
+    writer = BulkWriter(session, model)
+    row = 0
+    buffer = b""
+
+    async def handle(line: bytes) -> None:
+        nonlocal row
+        if line.strip():
+            try:
+                await writer.add(row, json.loads(line))
+            except ValueError:
+                writer.reject(row, "JSON解析失败")
+        row += 1
+
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            await handle(line)
+    await handle(buffer)
+    return await writer.finish()
+
+
+async def ingest_csv(
+    session: AsyncSession, model: MeasurementModel, file: BinaryIO
+) -> IngestResult:
+    """写入CSV文件, 表头为 station_id,measure_at,value"""
+    writer = BulkWriter(session, model)
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+    for row, record in enumerate(reader):
+        if not record.get("measure_at"):
+            record.pop("measure_at", None)
+        await writer.add(row, record)
+    return await writer.finish()
@@ -0,0 +1,129 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Iterable, Sequence
+from sqlmodel import select
+from app.database.engine import get_sessionmaker
+from app.database.schema import Station, City
+from app.services.spatial import SpatialIndex
+from app.settings import load_settings
+
+_metadata: "MetadataCache | None" = None
+
+
+def _content(rows: Sequence[Station] | Sequence[City]) -> tuple[tuple[Any, ...], ...]:
+    return tuple(tuple(row.model_dump().values()) for row in rows)
+
+
+class MetadataCache:
+    """
+    测站/城市元数据缓存
+
+    两张表数据量小且很少修改, 整表加载到进程内存中;
+    写入测站或城市后调用 invalidate(), 下次访问时重新加载; 只有内容变化时才递增版本号,
+    按有效期重新加载且内容未变时条件请求仍然命中; 空间索引在重新加载时按测站坐标增量同步
+    """
+
+    def __init__(self, ttl: float, cell_size: float = 0.25):
+        self.ttl = ttl
+        self.version = 0
+        # 版本号最近一次变化的时间
+        self.changed_at = datetime.now(timezone.utc)
+        self._content: tuple | None = None
+        self.stations: dict[int, Station] = {}
+        self.stations_by_code: dict[str, Station] = {}
+        self.cities: dict[int, City] = {}
+        self.cities_by_name: dict[str, City] = {}
+        self.city_stations: dict[int, list[Station]] = {}
+        self.spatial = SpatialIndex(cell_size)
+        self._loaded_at = 0.0
+        self._stale = True
+        # 每次 invalidate 递增, 重新加载期间发生的失效不会被覆盖
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    async def reload(self) -> None:
+        generation = self._generation
+        async with get_sessionmaker()() as session:
+            stations = (await session.execute(select(Station).order_by(Station.id))).scalars().all()
+            cities = (await session.execute(select(City).order_by(City.id))).scalars().all()
+
+        city_stations: dict[int, list[Station]] = {}
+        for station in stations:
+            city_stations.setdefault(station.city_id, []).append(station)
+
+        self.stations = {station.id: station for station in stations}  # type: ignore
+        self.stations_by_code = {station.code: station for station in stations}
+        self.cities = {city.id: city for city in cities}  # type: ignore
+        self.cities_by_name = {city.name: city for city in cities}
+        self.city_stations = city_stations
+        self.spatial.sync(stations)
+        content = (_content(stations), _content(cities))
+        if content != self._content:
+            self._content = content
+            self.version += 1
+            self.changed_at = datetime.now(timezone.utc)
+        self._loaded_at = time.monotonic()
+        self._stale = self._generation != generation
+
+    async def ensure_fresh(self) -> None:
+        """缓存失效或超过有效期时重新加载"""
+        if not self._stale and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        async with self._lock:
+            if self._stale or time.monotonic() - self._loaded_at >= self.ttl:
+                await self.reload()
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._stale = True
+
+    def station(self, station_id: int) -> Station | None:
+        return self.stations.get(station_id)
+
+    def station_by_code(self, code: str) -> Station | None:
+        return self.stations_by_code.get(code)
+
+    def city(self, city_id: int) -> City | None:
+        return self.cities.get(city_id)
+
+    def city_by_name(self, name: str) -> City | None:
+        return self.cities_by_name.get(name)
+
+    def stations_of_city(self, city_id: int) -> list[Station]:
+        return self.city_stations.get(city_id, [])
+
+    def select_stations(self, station_ids: Iterable[int], city_ids: Iterable[int]) -> list[int]:
+        """指定的测站与城市下全部测站的并集, 按id排序"""
+        selected = set(station_ids)
+        for city_id in city_ids:
+            selected.update(s.id for s in self.stations_of_city(city_id))  # type: ignore
+        return sorted(selected)
+
+
+async def load_metadata() -> MetadataCache:
+    global _metadata
+    if _metadata is None:
+        settings = load_settings().cache
+        _metadata = MetadataCache(ttl=settings.metadata_ttl, cell_size=settings.spatial_cell_size)
+    await _metadata.reload()
+    return _metadata
+
+
+async def get_metadata() -> MetadataCache:
+    """获取元数据缓存, 可直接作为FastAPI依赖使用"""
+    if _metadata is None:
+        return await load_metadata()
+    await _metadata.ensure_fresh()
+    return _metadata
+
+
+def peek_metadata() -> MetadataCache | None:
+    """不检查有效期直接返回当前缓存, 供不能等待的同步代码使用"""
+    return _metadata
+
+
+def invalidate_metadata() -> None:
+    """测站或城市发生写入后调用"""
+    if _metadata is not None:
+        _metadata.invalidate()
@@ -0,0 +1,177 @@
+"""
+测量数据的游标分页
+
+按 (measure_at, id) 做键集分页: 每页都是从索引中的一个位置开始的范围扫描, 翻到多深
+代价都相同, 不使用 OFFSET; 游标中记录数据表、测站、时间范围、排序和位置, 并用密钥签名,
+不能伪造, 也不能拿到其他测站或其他查询条件下使用
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+from datetime import datetime
+from enum import Enum
+from typing import TypeVar
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import ColumnElement, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.schema import MeasurementModel
+from app.services.hot_tier import from_micros, to_micros
+from app.services.rollup import as_utc
+from app.settings import load_settings
+
+C = TypeVar("C", bound=BaseModel)
+
+
+class SortOrder(str, Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+
+class Cursor(BaseModel):
+    """游标内容"""
+
+    table: str
+    station_id: int
+    start: int | None
+    end: int | None
+    order: SortOrder
+    # 位置: 上一页边界数据的测量时间（epoch微秒）和id
+    time: int
+    id: int
+    # True 表示沿排序方向的反方向翻页（上一页）
+    backward: bool
+
+
+class PageItem(BaseModel):
+    id: int
+    station_id: int
+    value: float
+    measure_at: datetime
+
+
+class MeasurementPage(BaseModel):
+    data: list[PageItem]
+    next_cursor: str | None
+    prev_cursor: str | None
+
+
+def _sign(payload: bytes) -> bytes:
+    key = load_settings().secret_key.encode()
+    return hmac.new(key, payload, hashlib.sha256).digest()[:16]
+
+
+def encode_cursor(cursor: BaseModel) -> str:
+    payload = cursor.model_dump_json().encode()
+    return ".".join(
+        base64.urlsafe_b64encode(part).rstrip(b"=").decode() for part in (payload, _sign(payload))
+    )
+
+
+def decode_cursor(token: str, model: type[C] = Cursor) -> C:
+    """校验签名并按 model 解析游标, 无效时抛出400"""
+    try:
+        payload, signature = (
+            base64.urlsafe_b64decode(part + "=" * (-len(part) % 4)) for part in token.split(".")
+        )
+        if not hmac.compare_digest(signature, _sign(payload)):
+            raise ValueError(token)
+        return model.model_validate(json.loads(payload))
+    except (ValueError, binascii.Error, ValidationError):
+        raise HTTPException(400, "无效的游标")
+
+
+def _after(model: MeasurementModel, time: datetime, id: int, ascending: bool) -> ColumnElement:
+    """
+    位于 (time, id) 之后的条件
+
+    写成 measure_at <= time AND (measure_at < time OR id < 游标id) 的形式,
+    第一个条件可以直接用 (station_id, measure_at) 索引定位
+    """
+    if ascending:
+        return and_(
+            model.measure_at >= time,  # type: ignore
+            or_(model.measure_at > time, model.id > id),  # type: ignore
+        )
+    return and_(
+        model.measure_at <= time,  # type: ignore
+        or_(model.measure_at < time, model.id < id),  # type: ignore
+    )
+
+
+async def read_page(
+    session: AsyncSession,
+    model: MeasurementModel,
+    station_id: int,
+    start: datetime | None,
+    end: datetime | None,
+    order: SortOrder,
+    limit: int,
+    cursor: str | None = None,
+) -> MeasurementPage:
+    """
+    读取一页数据
+
+    首页不带游标; 之后使用上一次返回的 next_cursor/prev_cursor, 查询条件必须与首页一致
+    """
+    start_micros = to_micros(start) if start is not None else None
+    end_micros = to_micros(end) if end is not None else None
+    position = decode_cursor(cursor) if cursor is not None else None
+    if position is not None and (
+        position.table != model.__tablename__
+        or position.station_id != station_id
+        or position.start != start_micros
+        or position.end != end_micros
+        or position.order != order
+    ):
+        raise HTTPException(400, "游标与查询条件不匹配")
+
+    backward = position is not None and position.backward
+    # 实际扫描方向: 翻回上一页时与排序方向相反
+    ascending = (order == SortOrder.ASC) != backward
+    conditions = [model.station_id == station_id]
+    if start is not None:
+        conditions.append(model.measure_at >= as_utc(start))  # type: ignore
+    if end is not None:
+        conditions.append(model.measure_at < as_utc(end))  # type: ignore
+    if position is not None:
+        conditions.append(_after(model, from_micros(position.time), position.id, ascending))
+    columns = (model.measure_at, model.id)
+    statement = (
+        select(model.id, model.station_id, model.value, model.measure_at)
+        .where(*conditions)
+        .order_by(*(c.asc() if ascending else c.desc() for c in columns))  # type: ignore
+        .limit(limit + 1)
+    )
+    rows = (await session.execute(statement)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    data = [PageItem.model_validate(row._asdict()) for row in rows]
+
+    def make_cursor(item: PageItem, backward: bool) -> str:
+        return encode_cursor(
+            Cursor(
+                table=model.__tablename__,  # type: ignore
+                station_id=station_id,
+                start=start_micros,
+                end=end_micros,
+                order=order,
+                time=to_micros(item.measure_at),
+                id=item.id,
+                backward=backward,
+            )
+        )
+
+    # 沿扫描方向还有数据时才有该方向的游标, 有游标的请求一定可以翻回去
+    has_next = more if not backward else position is not None
+    has_prev = more if backward else position is not None
+    return MeasurementPage(
+        data=data,
+        next_cursor=make_cursor(data[-1], False) if data and has_next else None,
+        prev_cursor=make_cursor(data[0], True) if data and has_prev else None,
+    )
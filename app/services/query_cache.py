@@ -0,0 +1,325 @@
+"""
+查询结果缓存
+
+缓存聚合查询等代价较高的结果, 每个条目带有标签（如 "waterleveldata:1" 表示该测站的水位数据）,
+入库流程提交后按写入的测站淘汰对应标签的条目, 其他测站的缓存不受影响;
+保留策略删除数据后按表淘汰 (版本标签 "waterleveldata:*")
+
+后端可选:
+    memory  进程内LRU, 按条目数限制大小（默认）
+    redis   多进程共享, 需安装 redis 包; 值使用pickle序列化, Redis只应对本服务开放
+"""
+
+import asyncio
+import logging
+import pickle
+from typing import Any, Awaitable, Callable, Hashable, Iterable, TypeVar
+from pydantic import BaseModel
+from app.database.schema import MeasurementModel
+from app.services.ttl_cache import TTLCache
+from app.settings import QueryCacheSettings, load_settings
+
+try:
+    from redis import asyncio as redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_query_cache: "QueryCache | None" = None
+
+
+def station_tag(model: MeasurementModel, station_id: int) -> str:
+    return f"{model.__tablename__}:{station_id}"
+
+
+def table_tag(tag: str) -> str:
+    """标签所属表的版本标签, 只记录版本, 不关联条目"""
+    return tag.partition(":")[0] + ":*"
+
+
+class EndpointStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+
+
+class QueryCacheStats(BaseModel):
+    backend: str
+    size: int | None
+    hits: int
+    misses: int
+    evictions: int
+    # 因测站数据写入被淘汰的条目数
+    invalidated: int
+    endpoints: dict[str, EndpointStats]
+
+
+class MemoryBackend:
+    """进程内LRU后端, 另外维护标签到键的索引"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._cache: TTLCache[str, tuple[Any, tuple[str, ...]]] = TTLCache(
+            max_size=max_entries, ttl=ttl, on_evict=self._unindex
+        )
+        self._tags: dict[str, set[str]] = {}
+        self.invalidated = 0
+
+    def _unindex(self, key: str, item: tuple[Any, tuple[str, ...]]) -> None:
+        for tag in item[1]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    async def get(self, key: str) -> tuple[bool, Any]:
+        item = self._cache.get(key)
+        return (False, None) if item is None else (True, item[0])
+
+    async def set(self, key: str, value: Any, ttl: float, tags: tuple[str, ...]) -> None:
+        # 覆盖已有条目时先移除旧条目的标签索引
+        self._cache.pop(key)
+        self._cache.set(key, (value, tags), ttl)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+    async def versions(self, tags: list[str]) -> list[int]:
+        # 只在本进程内使用, 版本由 QueryCache 记录
+        return []
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                if self._cache.pop(key) is not None:
+                    self.invalidated += 1
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        self.invalidate([tag for tag in self._tags if tag.startswith(prefix)])
+
+    @property
+    def size(self) -> int | None:
+        return len(self._cache)
+
+    @property
+    def evictions(self) -> int:
+        return self._cache.evictions
+
+    async def close(self) -> None:
+        self._cache.clear()
+        self._tags.clear()
+
+
+class RedisBackend:
+    """
+    Redis后端
+
+    每个标签对应一个集合, 保存带有该标签的键; 淘汰时删除集合中的键和集合本身.
+    标签的版本用 INCR 保存在Redis中, 其他进程计算期间发生的淘汰也能看到.
+    淘汰在后台任务中执行, 入库流程不等待Redis
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str, tag_ttl: float):
+        if redis is None:
+            raise RuntimeError("使用 redis 缓存后端需要安装 redis 包")
+        self._client = redis.from_url(url)
+        self._prefix = prefix
+        # 标签集合的有效期不短于任何条目, 避免条目仍在而标签已过期, 淘汰时漏掉
+        self._tag_ttl = max(int(tag_ttl), 1)
+        self._tasks: set[asyncio.Task] = set()
+        # 容量淘汰由Redis自身的 maxmemory-policy 负责, 这里不统计
+        self.evictions = 0
+        self.invalidated = 0
+
+    async def get(self, key: str) -> tuple[bool, Any]:
+        data = await self._client.get(self._prefix + key)
+        return (False, None) if data is None else (True, pickle.loads(data))
+
+    async def set(self, key: str, value: Any, ttl: float, tags: tuple[str, ...]) -> None:
+        seconds = max(int(ttl), 1)
+        async with self._client.pipeline(transaction=False) as pipeline:
+            pipeline.set(self._prefix + key, pickle.dumps(value), ex=seconds)
+            for tag in tags:
+                tag_key = f"{self._prefix}tag:{tag}"
+                pipeline.sadd(tag_key, key)
+                pipeline.expire(tag_key, self._tag_ttl)
+            await pipeline.execute()
+
+    def _version_key(self, tag: str) -> str:
+        return f"{self._prefix}version:{tag}"
+
+    async def versions(self, tags: list[str]) -> list[int]:
+        values = await self._client.mget([self._version_key(tag) for tag in tags])
+        return [int(value or 0) for value in values]
+
+    async def _bump(self, tag: str) -> None:
+        async with self._client.pipeline(transaction=False) as pipeline:
+            pipeline.incr(self._version_key(tag))
+            pipeline.expire(self._version_key(tag), self._tag_ttl)
+            await pipeline.execute()
+
+    async def _delete_tag(self, tag_key: str | bytes) -> None:
+        keys = await self._client.smembers(tag_key)
+        if keys:
+            self.invalidated += await self._client.delete(
+                *(self._prefix + key.decode() for key in keys)
+            )
+        await self._client.delete(tag_key)
+
+    async def _invalidate(self, tags: list[str]) -> None:
+        for tag in tags:
+            await self._bump(tag)
+            await self._delete_tag(f"{self._prefix}tag:{tag}")
+
+    async def _invalidate_prefix(self, prefix: str) -> None:
+        await self._bump(prefix + "*")
+        async for tag_key in self._client.scan_iter(match=f"{self._prefix}tag:{prefix}*"):
+            await self._delete_tag(tag_key)
+
+    def _done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Redis缓存淘汰失败", exc_info=task.exception())
+
+    def _spawn(self, coroutine: Awaitable[None]) -> None:
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        self._spawn(self._invalidate(list(tags)))
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        self._spawn(self._invalidate_prefix(prefix))
+
+    @property
+    def size(self) -> int | None:
+        return None
+
+    async def close(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._client.aclose()
+
+
+class QueryCache:
+    def __init__(self, settings: QueryCacheSettings):
+        self.settings = settings
+        max_ttl = max([settings.ttl, *settings.endpoint_ttl.values()])
+        if settings.backend == "redis":
+            self.backend: MemoryBackend | RedisBackend = RedisBackend(
+                settings.redis_url, settings.key_prefix, max_ttl
+            )
+        else:
+            self.backend = MemoryBackend(settings.max_entries, max_ttl)
+        self.hits = 0
+        self.misses = 0
+        self._endpoints: dict[str, EndpointStats] = {}
+        # 本进程内每个标签被淘汰的次数, 计算期间标签被淘汰时不写入缓存, 避免缓存旧结果
+        self._tag_versions: dict[str, int] = {}
+
+    def ttl(self, endpoint: str) -> float:
+        return self.settings.endpoint_ttl.get(endpoint, self.settings.ttl)
+
+    async def _versions(self, tags: tuple[str, ...]) -> list[int]:
+        """条目标签及其所属表的版本, 包括本进程和缓存后端（Redis后端包括其他进程）记录的"""
+        tags = (*tags, *sorted({table_tag(tag) for tag in tags}))
+        local = [self._tag_versions.get(tag, 0) for tag in tags]
+        return local + await self.backend.versions(list(tags))
+
+    async def get_or_compute(
+        self,
+        endpoint: str,
+        params: tuple[Hashable, ...],
+        tags: tuple[str, ...],
+        compute: Callable[[], Awaitable[T]],
+    ) -> T:
+        """
+        按接口名和参数读取缓存, 未命中时计算并写入
+
+        缓存后端出错时直接计算, 不影响请求
+        """
+        ttl = self.ttl(endpoint)
+        if ttl <= 0:
+            return await compute()
+        stats = self._endpoints.setdefault(endpoint, EndpointStats())
+        key = f"{endpoint}:{params!r}"
+        try:
+            found, value = await self.backend.get(key)
+            versions = None if found else await self._versions(tags)
+        except Exception:
+            logger.exception("读取查询缓存失败")
+            return await compute()
+        if found:
+            self.hits += 1
+            stats.hits += 1
+            return value
+        self.misses += 1
+        stats.misses += 1
+        value = await compute()
+        try:
+            if versions == await self._versions(tags):
+                await self.backend.set(key, value, ttl, tags)
+        except Exception:
+            logger.exception("写入查询缓存失败")
+        return value
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        tags = list(tags)
+        for tag in tags:
+            self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+        self.backend.invalidate(tags)
+
+    def invalidate_stations(self, model: MeasurementModel, station_ids: Iterable[int]) -> None:
+        self.invalidate({station_tag(model, station_id) for station_id in station_ids})
+
+    def invalidate_table(self, model: MeasurementModel) -> None:
+        """淘汰一张表所有测站的条目"""
+        tag = table_tag(model.__tablename__)
+        self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+        self.backend.invalidate_prefix(tag[:-1])
+
+    def stats(self) -> QueryCacheStats:
+        return QueryCacheStats(
+            backend=self.backend.name,
+            size=self.backend.size,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.backend.evictions,
+            invalidated=self.backend.invalidated,
+            endpoints=self._endpoints,
+        )
+
+
+def get_query_cache() -> QueryCache | None:
+    """获取查询结果缓存, 未启用时返回None"""
+    global _query_cache
+    settings = load_settings().query_cache
+    if _query_cache is None and settings.enabled:
+        _query_cache = QueryCache(settings)
+    return _query_cache
+
+
+async def close_query_cache() -> None:
+    global _query_cache
+    if _query_cache is not None:
+        await _query_cache.backend.close()
+        _query_cache = None
+
+
+async def cached(
+    endpoint: str,
+    params: tuple[Hashable, ...],
+    tags: tuple[str, ...],
+    compute: Callable[[], Awaitable[T]],
+) -> T:
+    """缓存未启用时直接计算"""
+    cache = get_query_cache()
+    if cache is None:
+        return await compute()
+    return await cache.get_or_compute(endpoint, params, tags, compute)
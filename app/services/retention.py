@@ -0,0 +1,350 @@
+"""
+原始数据保留与压缩
+
+按 retention.policies 中每张表的策略:
+    1. 早于 raw_days 的原始数据按天核对汇总表, 汇总缺失时先用原始数据重建
+    2. 再分批删除这些原始数据（启用分区时整月的数据直接删除分区）
+    3. 早于 hourly_days 的小时汇总分批删除, 天汇总永久保留
+每批一个事务, 批次之间按 chunk_pause 暂停, 避免长时间锁表
+
+用法:
+    python -m app.services.retention run [--dry-run] [--table waterleveldata]
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from pydantic import BaseModel
+from sqlalchemy import ColumnElement, delete, func, select
+from app.database.engine import init_db, get_engine, get_sessionmaker
+from app.database.partition import drop_partitions_before, partitioning_enabled
+from app.database.schema import (
+    ROLLUP_MODELS,
+    MeasurementModel,
+    RollupGranularity,
+    WaterLevelData,
+    RainfallData,
+)
+from app.services.change_markers import get_change_tracker
+from app.services.hot_tier import get_hot_tier
+from app.services.query_cache import get_query_cache
+from app.services.rollup import bucket_start, rebuild_rollups
+from app.settings import RetentionPolicy, load_settings
+
+logger = logging.getLogger(__name__)
+
+MEASUREMENT_MODELS: dict[str, MeasurementModel] = {
+    WaterLevelData.__tablename__: WaterLevelData,  # type: ignore
+    RainfallData.__tablename__: RainfallData,  # type: ignore
+}
+
+_retention_job: "RetentionJob | None" = None
+
+
+class RetentionReport(BaseModel):
+    """单张表一次保留任务的进度"""
+
+    table: str
+    dry_run: bool
+    cutoff: datetime | None = None
+    hourly_cutoff: datetime | None = None
+    current_day: datetime | None = None
+    days_processed: int = 0
+    rollups_rebuilt: int = 0
+    raw_deleted: int = 0
+    hourly_deleted: int = 0
+    partitions_dropped: list[str] = []
+    started_at: datetime
+    finished_at: datetime | None = None
+
+
+class RetentionStats(BaseModel):
+    running: bool
+    runs: int
+    last_started_at: datetime | None
+    last_finished_at: datetime | None
+    last_error: str | None
+    reports: list[RetentionReport]
+
+
+class RetentionJob:
+    """
+    数据保留任务
+
+    可由后台定时执行, 也可通过命令行手动执行; 进度记录在 reports 中
+    """
+
+    def __init__(self, interval: float, chunk_size: int, chunk_pause: float, dry_run: bool):
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.chunk_pause = chunk_pause
+        self.dry_run = dry_run
+        self.reports: list[RetentionReport] = []
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+        self._runs = 0
+        self._last_started_at: datetime | None = None
+        self._last_finished_at: datetime | None = None
+        self._last_error: str | None = None
+
+    async def _delete_chunked(self, model, conditions: list[ColumnElement[bool]]) -> int:
+        """按 chunk_size 分批删除满足条件的行, 每批一个事务"""
+        ids = select(model.id).where(*conditions).limit(self.chunk_size)
+        statement = (
+            delete(model)
+            .where(*conditions, model.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        total = 0
+        while True:
+            async with get_sessionmaker()() as session:
+                deleted = (await session.execute(statement)).rowcount
+                await session.commit()
+            total += deleted
+            if deleted < self.chunk_size:
+                return total
+            await asyncio.sleep(self.chunk_pause)
+
+    async def _count(self, model, conditions: list[ColumnElement[bool]]) -> int:
+        async with get_sessionmaker()() as session:
+            statement = select(func.count()).select_from(model).where(*conditions)
+            return (await session.execute(statement)).scalar_one()
+
+    async def _ensure_rollups(self, model: MeasurementModel, day: datetime) -> int:
+        """
+        核对 day 当天各测站的天汇总条数与原始数据条数, 汇总缺失时用原始数据重建
+
+        汇总条数多于原始数据说明该天已被部分压缩过, 不能再重建; 返回重建的测站数
+        """
+        rollup = ROLLUP_MODELS[model]
+        end = day + timedelta(days=1)
+        async with get_sessionmaker()() as session:
+            raw_counts = dict(
+                (
+                    await session.execute(
+                        select(model.station_id, func.count())
+                        .where(model.measure_at >= day, model.measure_at < end)  # type: ignore
+                        .group_by(model.station_id)
+                    )
+                ).all()
+            )
+            rollup_counts = dict(
+                (
+                    await session.execute(
+                        select(rollup.station_id, rollup.count).where(
+                            rollup.granularity == RollupGranularity.DAY,
+                            rollup.bucket_at == day,
+                        )
+                    )
+                ).all()
+            )
+            stale = [
+                station_id
+                for station_id, count in raw_counts.items()
+                if rollup_counts.get(station_id, 0) < count
+            ]
+            if self.dry_run or not stale:
+                return len(stale)
+            for station_id in stale:
+                await rebuild_rollups(session, model, day, end, station_id)
+            await session.commit()
+        return len(stale)
+
+    async def _compact_raw(
+        self, model: MeasurementModel, cutoff: datetime, report: RetentionReport
+    ) -> None:
+        async with get_sessionmaker()() as session:
+            first = (
+                await session.execute(
+                    select(func.min(model.measure_at)).where(
+                        model.measure_at < cutoff  # type: ignore
+                    )
+                )
+            ).scalar()
+        if first is None:
+            return
+
+        # 启用分区时, 截止月份之前的数据在核对汇总后整月删除分区
+        engine = get_engine()
+        droppable = partitioning_enabled(engine)
+        month_cutoff = cutoff.replace(day=1)
+        day = bucket_start(first, RollupGranularity.DAY)
+        while day < cutoff:
+            report.current_day = day
+            report.rollups_rebuilt += await self._ensure_rollups(model, day)
+            conditions = [
+                model.measure_at >= day,  # type: ignore
+                model.measure_at < day + timedelta(days=1),  # type: ignore
+            ]
+            if self.dry_run:
+                report.raw_deleted += await self._count(model, conditions)
+            elif not (droppable and day < month_cutoff):
+                report.raw_deleted += await self._delete_chunked(model, conditions)
+            report.days_processed += 1
+            logger.info(
+                "%s: %s 完成, 已删除原始数据 %d 行",
+                report.table,
+                f"{day:%Y-%m-%d}",
+                report.raw_deleted,
+            )
+            day += timedelta(days=1)
+            await asyncio.sleep(self.chunk_pause)
+
+        hot_tier = get_hot_tier()
+        if hot_tier is not None and not self.dry_run:
+            hot_tier.discard_before(model, cutoff)
+        change_tracker = get_change_tracker()
+        if change_tracker is not None and not self.dry_run:
+            change_tracker.touch_all()
+        if droppable and not self.dry_run:
+            report.partitions_dropped = await drop_partitions_before(
+                engine, cutoff.date(), tables=[report.table]
+            )
+        query_cache = get_query_cache()
+        if query_cache is not None and not self.dry_run:
+            query_cache.invalidate_table(model)
+
+    async def _compact_hourly(
+        self, model: MeasurementModel, cutoff: datetime, report: RetentionReport
+    ) -> None:
+        rollup = ROLLUP_MODELS[model]
+        conditions = [
+            rollup.granularity == RollupGranularity.HOUR,
+            rollup.bucket_at < cutoff,
+        ]
+        if self.dry_run:
+            report.hourly_deleted = await self._count(rollup, conditions)
+        else:
+            report.hourly_deleted = await self._delete_chunked(rollup, conditions)
+            # 长时间范围的序列查询读取小时汇总
+            query_cache = get_query_cache()
+            if query_cache is not None:
+                query_cache.invalidate_table(model)
+        logger.info("%s: 已删除小时汇总 %d 行", report.table, report.hourly_deleted)
+
+    async def run_table(self, table: str, policy: RetentionPolicy) -> RetentionReport:
+        model = MEASUREMENT_MODELS[table]
+        today = bucket_start(datetime.now(timezone.utc), RollupGranularity.DAY)
+        report = RetentionReport(
+            table=table, dry_run=self.dry_run, started_at=datetime.now(timezone.utc)
+        )
+        self.reports.append(report)
+        if policy.raw_days > 0:
+            report.cutoff = today - timedelta(days=policy.raw_days)
+            await self._compact_raw(model, report.cutoff, report)
+        if policy.hourly_days > 0:
+            report.hourly_cutoff = today - timedelta(days=policy.hourly_days)
+            await self._compact_hourly(model, report.hourly_cutoff, report)
+        report.current_day = None
+        report.finished_at = datetime.now(timezone.utc)
+        return report
+
+    async def run_once(self, tables: list[str] | None = None) -> list[RetentionReport]:
+        """按配置的策略执行一次, tables 为空时处理所有配置了策略的表"""
+        async with self._lock:
+            self.reports = []
+            self._runs += 1
+            self._last_started_at = datetime.now(timezone.utc)
+            self._last_error = None
+            try:
+                for table, policy in load_settings().retention.policies.items():
+                    if table not in MEASUREMENT_MODELS:
+                        logger.warning("保留策略中的表 %s 不存在, 已忽略", table)
+                        continue
+                    if tables is None or table in tables:
+                        await self.run_table(table, policy)
+            except Exception as e:
+                self._last_error = repr(e)
+                raise
+            finally:
+                self._last_finished_at = datetime.now(timezone.utc)
+            return self.reports
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("数据保留任务执行失败")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> RetentionStats:
+        return RetentionStats(
+            running=self._lock.locked(),
+            runs=self._runs,
+            last_started_at=self._last_started_at,
+            last_finished_at=self._last_finished_at,
+            last_error=self._last_error,
+            reports=self.reports,
+        )
+
+
+def new_retention_job(dry_run: bool | None = None) -> RetentionJob:
+    settings = load_settings().retention
+    return RetentionJob(
+        interval=settings.interval,
+        chunk_size=settings.chunk_size,
+        chunk_pause=settings.chunk_pause,
+        dry_run=settings.dry_run if dry_run is None else dry_run,
+    )
+
+
+def get_retention_job() -> RetentionJob | None:
+    """获取后台保留任务, 未启用时返回None"""
+    return _retention_job
+
+
+def start_retention_job() -> None:
+    global _retention_job
+    if load_settings().retention.enabled and _retention_job is None:
+        _retention_job = new_retention_job()
+        _retention_job.start()
+
+
+async def stop_retention_job() -> None:
+    global _retention_job
+    if _retention_job is not None:
+        await _retention_job.stop()
+        _retention_job = None
+
+
+async def _main(args: argparse.Namespace) -> None:
+    await init_db()
+    job = new_retention_job(dry_run=args.dry_run or None)
+    for report in await job.run_once(args.table):
+        prefix = "[dry-run] " if report.dry_run else ""
+        print(
+            f"{prefix}{report.table}: 处理 {report.days_processed} 天, "
+            f"重建汇总 {report.rollups_rebuilt} 个测站日, "
+            f"删除原始数据 {report.raw_deleted} 行, 小时汇总 {report.hourly_deleted} 行"
+        )
+        for partition in report.partitions_dropped:
+            print(f"  已删除分区 {partition}")
+    await get_engine().dispose()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=load_settings().logging.level, format=load_settings().logging.format)
+    parser = argparse.ArgumentParser(description="数据保留工具")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="按保留策略压缩并删除过期数据")
+    run.add_argument("--dry-run", action="store_true", help="只统计, 不修改数据")
+    run.add_argument("--table", action="append", default=None, help="只处理指定的表, 可重复")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,257 @@
+"""
+汇总表维护
+
+写入数据时按小时/天增量更新汇总表; 历史数据通过 rebuild 按时间块重建:
+    python -m app.services.rollup rebuild [--station-id ID] [--since 2024-01-01] [--chunk-days 7]
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Sequence
+from dotenv import load_dotenv
+from sqlalchemy import ColumnElement, case, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.engine import init_db, get_engine, get_sessionmaker
+from app.database.schema import (
+    ROLLUP_MODELS,
+    MeasurementModel,
+    MeasurementRow,
+    RollupGranularity,
+    WaterLevelData,
+    RainfallData,
+)
+from app.services.series import Aggregation, bucket_expression
+from app.settings import load_settings
+
+logger = logging.getLogger(__name__)
+
+GRANULARITY_SECONDS = {
+    RollupGranularity.HOUR: 3600,
+    RollupGranularity.DAY: 86400,
+}
+
+
+def as_utc(value: datetime) -> datetime:
+    """不带时区的时间按UTC处理"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def bucket_start(value: datetime, granularity: RollupGranularity) -> datetime:
+    width = GRANULARITY_SECONDS[granularity]
+    epoch = int(as_utc(value).timestamp())
+    return datetime.fromtimestamp(epoch - epoch % width, timezone.utc)
+
+
+def summarize(rows: Sequence[MeasurementRow]) -> list[dict[str, Any]]:
+    """将数据点按测站和时间桶汇总为汇总表的行"""
+    buckets: dict[tuple[int, RollupGranularity, datetime], dict[str, Any]] = {}
+    for row in rows:
+        measure_at = as_utc(row.measure_at)
+        for granularity in RollupGranularity:
+            key = (row.station_id, granularity, bucket_start(measure_at, granularity))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = {
+                    "station_id": row.station_id,
+                    "granularity": granularity,
+                    "bucket_at": key[2],
+                    "min_value": row.value,
+                    "max_value": row.value,
+                    "sum_value": row.value,
+                    "count": 1,
+                    "first_at": measure_at,
+                    "last_at": measure_at,
+                }
+                continue
+            bucket["min_value"] = min(bucket["min_value"], row.value)
+            bucket["max_value"] = max(bucket["max_value"], row.value)
+            bucket["sum_value"] += row.value
+            bucket["count"] += 1
+            bucket["first_at"] = min(bucket["first_at"], measure_at)
+            bucket["last_at"] = max(bucket["last_at"], measure_at)
+    return list(buckets.values())
+
+
+async def update_rollups(
+    session: AsyncSession, model: MeasurementModel, rows: Sequence[MeasurementRow]
+) -> None:
+    """按新写入的数据增量更新汇总表, 不提交事务"""
+    if not rows:
+        return
+    rollup = ROLLUP_MODELS[model]
+    dialect = session.bind.dialect.name
+    if dialect == "postgresql":
+        statement = postgresql.insert(rollup)
+        least, greatest = func.least, func.greatest
+    elif dialect == "sqlite":
+        statement = sqlite.insert(rollup)
+        # SQLite 的多参数 min/max 是标量函数
+        least, greatest = func.min, func.max
+    else:
+        await merge_rollups(session, model, summarize(rows))
+        return
+
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=["station_id", "granularity", "bucket_at"],
+        set_={
+            "min_value": least(rollup.min_value, excluded.min_value),
+            "max_value": greatest(rollup.max_value, excluded.max_value),
+            "sum_value": rollup.sum_value + excluded.sum_value,
+            "count": rollup.count + excluded.count,
+            "first_at": least(rollup.first_at, excluded.first_at),
+            "last_at": greatest(rollup.last_at, excluded.last_at),
+        },
+    )
+    await session.execute(statement, summarize(rows))
+
+
+def _least(column: Any, value: Any) -> ColumnElement:
+    return case((column <= value, column), else_=value)
+
+
+def _greatest(column: Any, value: Any) -> ColumnElement:
+    return case((column >= value, column), else_=value)
+
+
+async def merge_rollups(
+    session: AsyncSession, model: MeasurementModel, buckets: list[dict[str, Any]]
+) -> None:
+    """不支持 upsert 的数据库逐个时间桶先 UPDATE, 没有对应的汇总行时再 INSERT"""
+    rollup = ROLLUP_MODELS[model]
+    for bucket in buckets:
+        statement = (
+            update(rollup)
+            .where(
+                rollup.station_id == bucket["station_id"],
+                rollup.granularity == bucket["granularity"],
+                rollup.bucket_at == bucket["bucket_at"],
+            )
+            .values(
+                min_value=_least(rollup.min_value, bucket["min_value"]),
+                max_value=_greatest(rollup.max_value, bucket["max_value"]),
+                sum_value=rollup.sum_value + bucket["sum_value"],
+                count=rollup.count + bucket["count"],
+                first_at=_least(rollup.first_at, bucket["first_at"]),
+                last_at=_greatest(rollup.last_at, bucket["last_at"]),
+            )
+        )
+        if (await session.execute(statement)).rowcount == 0:
+            await session.execute(insert(rollup).values(**bucket))
+
+
+async def rebuild_rollups(
+    session: AsyncSession,
+    model: MeasurementModel,
+    start: datetime,
+    end: datetime,
+    station_id: int | None = None,
+) -> int:
+    """用原始数据重建 [start, end) 内的汇总数据, start/end 需按天对齐, 返回汇总行数"""
+    rollup = ROLLUP_MODELS[model]
+    dialect = session.bind.dialect.name
+    conditions = [model.measure_at >= start, model.measure_at < end]  # type: ignore
+    rollup_conditions = [rollup.bucket_at >= start, rollup.bucket_at < end]
+    if station_id is not None:
+        conditions.append(model.station_id == station_id)
+        rollup_conditions.append(rollup.station_id == station_id)
+
+    await session.execute(delete(rollup).where(*rollup_conditions))
+    total = 0
+    for granularity, aggregation in (
+        (RollupGranularity.HOUR, Aggregation.HOUR),
+        (RollupGranularity.DAY, Aggregation.DAY),
+    ):
+        bucket = bucket_expression(
+            dialect,
+            model.measure_at,  # type: ignore
+            aggregation,
+        ).label("bucket")
+        statement = (
+            select(
+                model.station_id,
+                bucket,
+                func.min(model.value),
+                func.max(model.value),
+                func.sum(model.value),
+                func.count(),
+                func.min(model.measure_at),
+                func.max(model.measure_at),
+            )
+            .where(*conditions)
+            .group_by(model.station_id, bucket)
+        )
+        values = [
+            {
+                "station_id": row[0],
+                "granularity": granularity,
+                "bucket_at": datetime.fromtimestamp(row[1], timezone.utc),
+                "min_value": row[2],
+                "max_value": row[3],
+                "sum_value": row[4],
+                "count": row[5],
+                "first_at": row[6],
+                "last_at": row[7],
+            }
+            for row in (await session.execute(statement)).all()
+        ]
+        if values:
+            await session.execute(insert(rollup), values)
+        total += len(values)
+    return total
+
+
+async def rebuild_history(
+    model: MeasurementModel,
+    since: datetime | None = None,
+    station_id: int | None = None,
+    chunk_days: int = 7,
+) -> int:
+    """按时间块重建全部历史汇总数据, 每块一个事务"""
+    session_maker = get_sessionmaker()
+    async with session_maker() as session:
+        statement = select(func.min(model.measure_at), func.max(model.measure_at))
+        if station_id is not None:
+            statement = statement.where(model.station_id == station_id)
+        first, last = (await session.execute(statement)).one()
+    if first is None:
+        return 0
+
+    if since is not None:
+        first = max(as_utc(first), as_utc(since))
+    start = bucket_start(first, RollupGranularity.DAY)
+    end = bucket_start(last, RollupGranularity.DAY) + timedelta(days=1)
+    total = 0
+    while start < end:
+        chunk_end = min(start + timedelta(days=chunk_days), end)
+        async with session_maker() as session:
+            total += await rebuild_rollups(session, model, start, chunk_end, station_id)
+            await session.commit()
+        logger.info("%s: %s ~ %s 完成", model.__tablename__, start.date(), chunk_end.date())
+        start = chunk_end
+    return total
+
+
+async def _main(args: argparse.Namespace) -> None:
+    await init_db()
+    for model in (WaterLevelData, RainfallData):
+        total = await rebuild_history(model, args.since, args.station_id, args.chunk_days)
+        print(f"{model.__tablename__}: 共生成 {total} 条汇总数据")
+    await get_engine().dispose()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=load_settings().logging.level, format=load_settings().logging.format)
+    parser = argparse.ArgumentParser(description="汇总表维护工具")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser("rebuild", help="用原始数据重建汇总表")
+    rebuild.add_argument("--station-id", type=int, default=None)
+    rebuild.add_argument("--since", type=datetime.fromisoformat, default=None)
+    rebuild.add_argument("--chunk-days", type=int, default=7)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,272 @@
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Sequence
+from pydantic import BaseModel
+from sqlalchemy import BigInteger, ColumnElement, Select, cast, extract, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.schema import ROLLUP_MODELS, MeasurementModel, RollupGranularity
+from app.settings import load_settings
+
+
+class Aggregation(str, Enum):
+    RAW = "raw"
+    MINUTE = "minute"
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+    AUTO = "auto"
+
+
+BUCKET_SECONDS = {
+    Aggregation.MINUTE: 60,
+    Aggregation.HOUR: 3600,
+    Aggregation.DAY: 86400,
+    Aggregation.WEEK: 7 * 86400,
+}
+# 1970-01-01 是周四, 偏移4天使周聚合从周一开始
+WEEK_OFFSET = 4 * 86400
+
+
+class SeriesPoint(BaseModel):
+    t: datetime
+    value: float
+    min: float | None = None
+    max: float | None = None
+    sum: float | None = None
+    count: int | None = None
+
+
+class Series(BaseModel):
+    station_id: int
+    aggregation: Aggregation
+    start: datetime
+    end: datetime
+    truncated: bool = False
+    points: list[SeriesPoint]
+
+
+def choose_aggregation(start: datetime, end: datetime) -> Aggregation:
+    """根据时间范围选择聚合粒度, 使返回点数保持在百级"""
+    span = end - start
+    if span <= timedelta(hours=2):
+        return Aggregation.MINUTE
+    if span <= timedelta(days=2):
+        return Aggregation.HOUR
+    if span <= timedelta(days=62):
+        return Aggregation.DAY
+    if span <= timedelta(days=730):
+        return Aggregation.WEEK
+    return Aggregation.MONTH
+
+
+def coarsen(aggregation: Aggregation, start: datetime, end: datetime, limit: int) -> Aggregation:
+    """指定粒度在时间范围内的时间桶数超过 limit 时改用更粗的粒度"""
+    span = (end - start).total_seconds()
+    coarser = [Aggregation.MINUTE, Aggregation.HOUR, Aggregation.DAY, Aggregation.WEEK]
+    while aggregation in BUCKET_SECONDS and span / BUCKET_SECONDS[aggregation] > limit:
+        position = coarser.index(aggregation) + 1
+        aggregation = coarser[position] if position < len(coarser) else Aggregation.MONTH
+    return aggregation
+
+
+def bucket_expression(
+    dialect: str, column: ColumnElement[datetime], aggregation: Aggregation
+) -> ColumnElement[int]:
+    """计算数据点所属时间桶的起始时间（epoch秒）"""
+    if aggregation == Aggregation.MONTH:
+        if dialect == "sqlite":
+            return cast(func.strftime("%s", column, "start of month"), BigInteger)
+        # 按UTC取月初, 不受连接的 TimeZone 设置影响
+        month = func.date_trunc("month", func.timezone("UTC", column))
+        return cast(extract("epoch", month), BigInteger)
+    width = BUCKET_SECONDS[aggregation]
+    offset = WEEK_OFFSET if aggregation == Aggregation.WEEK else 0
+    seconds = extract("epoch", column)
+    if dialect != "sqlite":
+        # PostgreSQL 的 epoch 带小数, 转换为整数时会四舍五入, 先向下取整
+        seconds = func.floor(seconds)
+    epoch = cast(seconds, BigInteger)
+    return (epoch - offset) // width * width + offset
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> list[int]:
+    """
+    Largest-Triangle-Three-Buckets 降采样
+
+    返回被选中点的下标, 保留首尾点以及每个桶中与相邻桶构成最大三角形面积的点
+    """
+    n = len(xs)
+    if threshold >= n:
+        return list(range(n))
+    if threshold <= 2:
+        return [0, n - 1][:threshold]
+
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(xs[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(ys[avg_start:avg_end]) / (avg_end - avg_start)
+
+        best, best_area = -1, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def bucket_statement(
+    session: AsyncSession,
+    model: MeasurementModel,
+    station_id: int,
+    start: datetime,
+    end: datetime,
+    aggregation: Aggregation,
+) -> Select:
+    """从原始数据表按时间桶聚合"""
+    bucket = bucket_expression(
+        session.bind.dialect.name,
+        model.measure_at,  # type: ignore
+        aggregation,
+    ).label("bucket")
+    return (
+        select(
+            bucket,
+            func.avg(model.value),
+            func.min(model.value),
+            func.max(model.value),
+            func.sum(model.value),
+            func.count(),
+        )
+        .where(
+            model.station_id == station_id,
+            model.measure_at >= start,  # type: ignore
+            model.measure_at < end,  # type: ignore
+        )
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+
+
+def rollup_statement(
+    session: AsyncSession,
+    model: MeasurementModel,
+    station_id: int,
+    start: datetime,
+    end: datetime,
+    aggregation: Aggregation,
+) -> Select:
+    """
+    从汇总表按时间桶聚合
+
+    小时聚合读取小时汇总, 天及以上读取天汇总; 汇总以整桶为单位, 首尾桶包含范围外的数据
+    """
+    rollup = ROLLUP_MODELS[model]
+    if aggregation == Aggregation.HOUR:
+        granularity, width = RollupGranularity.HOUR, BUCKET_SECONDS[Aggregation.HOUR]
+    else:
+        granularity, width = RollupGranularity.DAY, BUCKET_SECONDS[Aggregation.DAY]
+    epoch = int(start.timestamp())
+    bucket = bucket_expression(
+        session.bind.dialect.name,
+        rollup.bucket_at,  # type: ignore
+        aggregation,
+    ).label("bucket")
+    return (
+        select(
+            bucket,
+            func.sum(rollup.sum_value) / func.sum(rollup.count),
+            func.min(rollup.min_value),
+            func.max(rollup.max_value),
+            func.sum(rollup.sum_value),
+            func.sum(rollup.count),
+        )
+        .where(
+            rollup.station_id == station_id,
+            rollup.granularity == granularity,
+            rollup.bucket_at >= datetime.fromtimestamp(epoch - epoch % width, timezone.utc),
+            rollup.bucket_at < end,
+        )
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+
+
+async def query_series(
+    session: AsyncSession,
+    model: MeasurementModel,
+    station_id: int,
+    start: datetime | None,
+    end: datetime | None,
+    aggregation: Aggregation,
+    points: int | None = None,
+) -> Series:
+    """
+    查询指定测站在时间段内的数据序列
+
+    聚合在数据库中按时间桶完成, 小时及以上粒度读取汇总表; 时间桶数超过 max_points 时
+    改用更粗的粒度, 返回的 aggregation 为实际使用的粒度;
+    指定 points 时再用LTTB将结果降到不超过 points 个点
+    """
+    settings = load_settings()
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=1)
+    if aggregation == Aggregation.AUTO:
+        aggregation = choose_aggregation(start, end)
+    aggregation = coarsen(aggregation, start, end, settings.query.max_points)
+    if points is not None:
+        points = min(points, settings.query.max_points)
+
+    truncated = False
+    if aggregation == Aggregation.RAW:
+        limit = settings.query.max_raw_points
+        statement = (
+            select(model.measure_at, model.value)
+            .where(
+                model.station_id == station_id,
+                model.measure_at >= start,  # type: ignore
+                model.measure_at < end,  # type: ignore
+            )
+            .order_by(model.measure_at)  # type: ignore
+            .limit(limit + 1)
+        )
+        rows = (await session.execute(statement)).all()
+        truncated = len(rows) > limit
+        series = [SeriesPoint(t=row[0], value=row[1]) for row in rows[:limit]]
+    else:
+        if aggregation != Aggregation.MINUTE and settings.query.use_rollups:
+            statement = rollup_statement(session, model, station_id, start, end, aggregation)
+        else:
+            statement = bucket_statement(session, model, station_id, start, end, aggregation)
+        series = [
+            SeriesPoint(
+                t=datetime.fromtimestamp(row[0], timezone.utc),
+                value=row[1],
+                min=row[2],
+                max=row[3],
+                sum=row[4],
+                count=row[5],
+            )
+            for row in (await session.execute(statement)).all()
+        ]
+
+    if points is not None and len(series) > points:
+        xs = [point.t.timestamp() for point in series]
+        ys = [point.value for point in series]
+        series = [series[i] for i in lttb(xs, ys, points)]
+
+    return Series(
+        station_id=station_id,
+        aggregation=aggregation,
+        start=start,
+        end=end,
+        truncated=truncated,
+        points=series,
+    )
@@ -0,0 +1,175 @@
+"""
+测站空间索引
+
+按经纬度把测站划入固定大小的网格, 每个网格保存其中测站的坐标; 视口查询只检查与范围相交的网格,
+最近邻查询从所在网格按环向外扩展, 已找到的第k近距离不超过未检查区域的距离下界时停止
+
+随元数据缓存重新加载时逐个测站同步, 只移动坐标变化的测站; 不处理跨越180°经线的范围
+"""
+
+import heapq
+import math
+from typing import Iterable
+from app.database.schema import Station
+
+EARTH_RADIUS = 6371.0088
+
+Cell = tuple[int, int]
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """两点间的大圆距离（千米）"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    h = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(h)))
+
+
+class SpatialIndex:
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self._cells: dict[Cell, dict[int, tuple[float, float]]] = {}
+        self._positions: dict[int, tuple[float, float]] = {}
+        # 非空网格的行列范围, 变更后惰性重新计算
+        self._extent: tuple[int, int, int, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _cell(self, latitude: float, longitude: float) -> Cell:
+        return math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size)
+
+    def upsert(self, station_id: int, latitude: float, longitude: float) -> bool:
+        """加入或移动测站, 坐标未变化时返回False"""
+        position = (latitude, longitude)
+        old = self._positions.get(station_id)
+        if old == position:
+            return False
+        if old is not None:
+            self.remove(station_id)
+        self._positions[station_id] = position
+        self._cells.setdefault(self._cell(*position), {})[station_id] = position
+        self._extent = None
+        return True
+
+    def remove(self, station_id: int) -> bool:
+        position = self._positions.pop(station_id, None)
+        if position is None:
+            return False
+        cell = self._cell(*position)
+        members = self._cells[cell]
+        del members[station_id]
+        if not members:
+            del self._cells[cell]
+        self._extent = None
+        return True
+
+    def sync(self, stations: Iterable[Station]) -> int:
+        """与测站全集同步, 返回变化的测站数"""
+        changed = 0
+        seen = set()
+        for station in stations:
+            seen.add(station.id)
+            changed += self.upsert(station.id, station.latitude, station.longitude)  # type: ignore
+        for station_id in self._positions.keys() - seen:
+            changed += self.remove(station_id)
+        return changed
+
+    def _extents(self) -> tuple[int, int, int, int]:
+        if self._extent is None:
+            rows = [row for row, _ in self._cells]
+            cols = [col for _, col in self._cells]
+            self._extent = (min(rows), max(rows), min(cols), max(cols))
+        return self._extent
+
+    def within(self, south: float, west: float, north: float, east: float) -> list[int]:
+        """范围内的测站id, 按id排序"""
+        min_row, min_col = self._cell(south, west)
+        max_row, max_col = self._cell(north, east)
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self._cells):
+            # 范围覆盖的网格多于非空网格时直接遍历非空网格
+            cells = [
+                members
+                for (row, col), members in self._cells.items()
+                if min_row <= row <= max_row and min_col <= col <= max_col
+            ]
+        else:
+            cells = [
+                self._cells[(row, col)]
+                for row in range(min_row, max_row + 1)
+                for col in range(min_col, max_col + 1)
+                if (row, col) in self._cells
+            ]
+        return sorted(
+            station_id
+            for members in cells
+            for station_id, (latitude, longitude) in members.items()
+            if south <= latitude <= north and west <= longitude <= east
+        )
+
+    def _ring(self, row: int, col: int, ring: int) -> Iterable[Cell]:
+        if ring == 0:
+            yield row, col
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield row - ring, c
+            yield row + ring, c
+        for r in range(row - ring + 1, row + ring):
+            yield r, col - ring
+            yield r, col + ring
+
+    def nearest(
+        self, latitude: float, longitude: float, k: int, max_distance: float | None = None
+    ) -> list[tuple[int, float]]:
+        """距离最近的k个测站 (id, 距离千米), 按距离升序; max_distance 限定最大距离"""
+        if k <= 0 or not self._cells:
+            return []
+        row, col = self._cell(latitude, longitude)
+        min_row, max_row, min_col, max_col = self._extents()
+        last_ring = max(row - min_row, max_row - row, col - min_col, max_col - col, 0)
+        # 经度差对应的距离随纬度减小, 按索引覆盖的最高纬度估计下界
+        highest = max(
+            abs(latitude), abs(min_row * self.cell_size), abs((max_row + 1) * self.cell_size)
+        )
+        cos_highest = math.cos(math.radians(min(highest, 90.0)))
+
+        # 大顶堆, 保存当前最近的k个 (-距离, id)
+        best: list[tuple[float, int]] = []
+
+        def visit(members: dict[int, tuple[float, float]]) -> None:
+            for station_id, (lat, lon) in members.items():
+                distance = haversine(latitude, longitude, lat, lon)
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, station_id))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, station_id))
+
+        for ring in range(last_ring + 1):
+            if 8 * ring > len(self._cells):
+                # 环上的网格多于非空网格时直接遍历剩余的非空网格
+                for (r, c), members in self._cells.items():
+                    if max(abs(r - row), abs(c - col)) >= ring:
+                        visit(members)
+                break
+            for cell in self._ring(row, col, ring):
+                members = self._cells.get(cell)
+                if members:
+                    visit(members)
+            # 环外的测站与查询点的纬度差或经度差超过 ring 个网格
+            span = math.radians(ring * self.cell_size)
+            bound = EARTH_RADIUS * min(
+                span, 2 * math.asin(cos_highest * math.sin(min(span, math.pi) / 2))
+            )
+            if len(best) == k and -best[0][0] <= bound:
+                break
+            if max_distance is not None and bound > max_distance:
+                break
+
+        result = sorted((-distance, station_id) for distance, station_id in best)
+        return [
+            (station_id, distance)
+            for distance, station_id in result
+            if max_distance is None or distance <= max_distance
+        ]
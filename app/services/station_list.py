@@ -0,0 +1,134 @@
+"""
+测站列表的过滤、分页和字段选择
+
+按城市、启用状态和名称前缀过滤, 按id做键集分页, 只查询请求的字段; 城市名称通过一次连接查询得到.
+城市和启用状态过滤使用 (city_id, is_active, id) 索引, 名称前缀在 PostgreSQL 上写成 LIKE 'abc%'
+使用 text_pattern_ops 索引, 其他数据库写成范围条件使用名称索引
+"""
+
+from enum import Enum
+from typing import Any, Literal
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import ColumnElement, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.schema import City, Station
+from app.services.pagination import decode_cursor, encode_cursor
+
+
+class StationField(str, Enum):
+    ID = "id"
+    NAME = "name"
+    CODE = "code"
+    CITY_ID = "city_id"
+    CITY = "city"
+    LATITUDE = "latitude"
+    LONGITUDE = "longitude"
+    WATER_LEVEL_THRESHOLD = "water_level_threshold"
+    RAINFALL_THRESHOLD = "rainfall_threshold"
+    IS_ACTIVE = "is_active"
+    CREATED_AT = "created_at"
+    UPDATED_AT = "updated_at"
+
+
+# 未指定字段时返回的字段, 不包括阈值和时间戳
+DEFAULT_FIELDS = [
+    StationField.ID,
+    StationField.NAME,
+    StationField.CODE,
+    StationField.CITY_ID,
+    StationField.CITY,
+    StationField.LATITUDE,
+    StationField.LONGITUDE,
+    StationField.IS_ACTIVE,
+]
+
+
+class StationCursor(BaseModel):
+    """游标内容, 与测量数据的游标共用签名"""
+
+    kind: Literal["station"]
+    city_id: int | None
+    is_active: bool | None
+    prefix: str | None
+    # 上一页最后一个测站的id
+    id: int
+
+
+class StationPage(BaseModel):
+    data: list[dict[str, Any]]
+    next_cursor: str | None
+
+
+def _column(field: StationField) -> ColumnElement:
+    if field == StationField.CITY:
+        return City.name.label("city")  # type: ignore
+    return getattr(Station, field.value)
+
+
+def name_prefix(dialect: str, prefix: str) -> ColumnElement:
+    if dialect == "postgresql" or not prefix:
+        return Station.name.startswith(prefix, autoescape=True)  # type: ignore
+    # 按二进制排序时前缀为 prefix 的名称都在 [prefix, prefix最后一个字符加一) 之间
+    last = ord(prefix[-1])
+    if last == 0x10FFFF:
+        return Station.name.startswith(prefix, autoescape=True)  # type: ignore
+    upper = prefix[:-1] + chr(last + 1)
+    return and_(Station.name >= prefix, Station.name < upper)  # type: ignore
+
+
+async def list_stations(
+    session: AsyncSession,
+    fields: list[StationField],
+    limit: int,
+    city_id: int | None = None,
+    is_active: bool | None = None,
+    prefix: str | None = None,
+    cursor: str | None = None,
+) -> StationPage:
+    """读取一页测站; 之后使用返回的 next_cursor, 过滤条件必须与首页一致"""
+    position = decode_cursor(cursor, StationCursor) if cursor is not None else None
+    if position is not None and (
+        position.city_id != city_id or position.is_active != is_active or position.prefix != prefix
+    ):
+        raise HTTPException(400, "游标与查询条件不匹配")
+
+    # 总是查询id用于生成游标, 未请求时从结果中去掉
+    fields = list(dict.fromkeys(fields))
+    columns = [_column(field) for field in fields if field != StationField.ID]
+    statement = select(Station.id, *columns)
+    if StationField.CITY in fields:
+        statement = statement.outerjoin(City, City.id == Station.city_id)  # type: ignore
+    conditions = []
+    if city_id is not None:
+        conditions.append(Station.city_id == city_id)
+    if is_active is not None:
+        conditions.append(Station.is_active == is_active)
+    if prefix is not None:
+        conditions.append(name_prefix(session.bind.dialect.name, prefix))
+    if position is not None:
+        conditions.append(Station.id > position.id)  # type: ignore
+    statement = statement.where(*conditions).order_by(Station.id).limit(limit + 1)  # type: ignore
+
+    rows = (await session.execute(statement)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    keep_id = StationField.ID in fields
+    data = []
+    for row in rows:
+        item = row._asdict()
+        if not keep_id:
+            del item["id"]
+        data.append(item)
+    next_cursor = None
+    if more and rows:
+        next_cursor = encode_cursor(
+            StationCursor(
+                kind="station",
+                city_id=city_id,
+                is_active=is_active,
+                prefix=prefix,
+                id=rows[-1].id,
+            )
+        )
+    return StationPage(data=data, next_cursor=next_cursor)
@@ -0,0 +1,93 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, TypeVar
+from pydantic import BaseModel
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class CacheStats(BaseModel):
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class TTLCache(Generic[K, V]):
+    """
+    带过期时间的LRU缓存, 超出容量时淘汰最久未使用的条目
+
+    on_evict 在条目因过期、超出容量或 evict_where/pop 被移除时调用
+    """
+
+    def __init__(self, max_size: int, ttl: float, on_evict: Callable[[K, V], None] | None = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._items: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: K) -> V | None:
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            self._evicted(key, value)
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._items[key] = (time.monotonic() + ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            evicted, (_, old) = self._items.popitem(last=False)
+            self._evicted(evicted, old)
+            self.evictions += 1
+
+    def _evicted(self, key: K, value: V) -> None:
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def pop(self, key: K) -> V | None:
+        item = self._items.pop(key, None)
+        if item is None:
+            return None
+        self._evicted(key, item[1])
+        return item[1]
+
+    def evict_where(self, predicate: Callable[[K, V], bool]) -> int:
+        """淘汰满足条件的条目, 返回淘汰数量"""
+        keys = [key for key, (_, value) in self._items.items() if predicate(key, value)]
+        for key in keys:
+            _, value = self._items.pop(key)
+            self._evicted(key, value)
+        self.evictions += len(keys)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            size=len(self._items),
+            max_size=self.max_size,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+        )
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from typing import Literal
 from os import environ
 import toml
 from pathlib import Path
@@ -24,6 +25,11 @@ class DatabaseSettings(BaseModel):
     max_overflow: int = Field(default=30, description="最大溢出连接数")
     pool_recycle: int = Field(default=3600, description="连接回收时间（秒）")
     echo: bool = Field(default=False, description="是否打印SQL语句")
+    partition_by_month: bool = Field(
+        default=False, description="是否按月对测量数据表分区（仅PostgreSQL）"
+    )
+    partition_months_ahead: int = Field(default=3, description="预先创建未来几个月的分区")
+    partition_months_behind: int = Field(default=12, description="新建分区表时创建过去几个月的分区")
 
 
 class SecuritySettings(BaseModel):
@@ -43,12 +49,146 @@ class LoggingSettings(BaseModel):
     )
 
 
+class IngestSettings(BaseModel):
+    """数据入库配置"""
+
+    batch_chunk_size: int = Field(default=1000, description="批量入库时每个事务写入的行数")
+    max_batch_errors: int = Field(default=100, description="批量入库响应中最多返回的错误明细条数")
+    durability: Literal["sync", "buffered"] = Field(
+        default="sync",
+        description="单点写入的持久化模式: sync 请求内提交事务, buffered 先写入内存队列再批量落库",
+    )
+    buffer_capacity: int = Field(default=100000, description="写入队列容量, 队列满时返回429")
+    buffer_batch_size: int = Field(default=5000, description="写入队列达到该行数时立即落库")
+    buffer_flush_interval: float = Field(default=1.0, description="写入队列定时落库间隔（秒）")
+    buffer_max_retries: int = Field(
+        default=3, description="写入队列落库连续失败的最大重试次数, 超过后丢弃该批数据"
+    )
+
+
+class QuerySettings(BaseModel):
+    """查询配置"""
+
+    max_raw_points: int = Field(default=10000, description="时间段查询返回原始数据的最大条数")
+    max_points: int = Field(default=5000, description="LTTB降采样允许的最大点数")
+    use_rollups: bool = Field(default=True, description="按小时及以上粒度聚合时是否读取汇总表")
+    export_chunk_size: int = Field(default=5000, description="导出数据时每批从数据库读取的行数")
+
+
+class CacheSettings(BaseModel):
+    """缓存配置"""
+
+    metadata_ttl: float = Field(default=60.0, description="测站/城市元数据缓存的最长有效期（秒）")
+    spatial_cell_size: float = Field(
+        default=0.25, description="测站空间索引的网格大小（度）, 应接近测站的典型间距"
+    )
+    principal_ttl: float = Field(
+        default=60.0,
+        description="已认证用户缓存的有效期（秒）, 也是其他进程中用户停用或改密生效的最长延迟",
+    )
+    principal_max_size: int = Field(default=10000, description="已认证用户缓存的最大条目数")
+    hot_tier_enabled: bool = Field(
+        default=False,
+        description="是否在内存中缓存每个测站的最新数据（仅用于单进程部署）",
+    )
+    hot_tier_capacity: int = Field(default=1000, description="每个测站每张表缓存的最新数据条数")
+    dashboard_ttl: float = Field(default=5.0, description="大屏汇总数据缓存的有效期（秒）")
+    dashboard_alert_limit: int = Field(default=50, description="大屏汇总中返回的活动报警条数")
+    conditional_get: bool = Field(
+        default=False,
+        description="读取接口是否返回 ETag/Last-Modified 并响应条件请求（仅用于单进程部署）",
+    )
+    rainfall_accumulation_enabled: bool = Field(
+        default=False,
+        description="是否在内存中维护各测站最近72小时的累计雨量（仅用于单进程部署）",
+    )
+
+
+class AlertSettings(BaseModel):
+    """报警配置"""
+
+    enabled: bool = Field(
+        default=False,
+        description="是否按测站阈值评估写入的数据并生成报警（报警状态在进程内, 仅用于单进程部署）",
+    )
+    flush_interval: float = Field(default=0.5, description="报警批量落库的间隔（秒）")
+    batch_size: int = Field(default=500, description="待落库报警达到该数量时立即落库")
+    rainfall_window: Literal["1h", "3h", "6h", "24h", "72h"] | None = Field(
+        default=None,
+        description="按该窗口的累计雨量与雨量阈值比较, 不设置时按单条数据比较（需开启累计雨量）",
+    )
+
+
+class QueryCacheSettings(BaseModel):
+    """查询结果缓存配置"""
+
+    enabled: bool = Field(
+        default=False,
+        description="是否缓存聚合查询的结果（memory 后端仅用于单进程部署, 多进程部署时使用 redis）",
+    )
+    backend: Literal["memory", "redis"] = Field(
+        default="memory", description="缓存后端: memory 为进程内LRU, redis 需安装 redis 包"
+    )
+    redis_url: str = Field(default="redis://localhost:6379/0", description="Redis连接地址")
+    key_prefix: str = Field(default="smarthydra:qc:", description="Redis中缓存键的前缀")
+    max_entries: int = Field(default=10000, description="进程内缓存的最大条目数")
+    ttl: float = Field(default=60.0, description="缓存条目的默认有效期（秒）")
+    endpoint_ttl: dict[str, float] = Field(
+        default_factory=dict, description="按接口名覆盖有效期, 0表示该接口不使用缓存"
+    )
+
+
+class LiveSettings(BaseModel):
+    """实时推送配置"""
+
+    queue_size: int = Field(
+        default=1000, description="每个连接的待发送消息上限, 超出时合并同一测站的数据或丢弃最旧消息"
+    )
+    heartbeat: float = Field(default=15.0, description="没有消息时发送心跳的间隔（秒）")
+    max_connections: int = Field(default=1000, description="最大同时连接数")
+
+
+class RetentionPolicy(BaseModel):
+    """单张测量数据表的保留策略"""
+
+    raw_days: int = Field(
+        default=365, description="原始数据保留天数, 更早的数据只保留汇总, 0表示永久保留"
+    )
+    hourly_days: int = Field(
+        default=730, description="小时汇总保留天数, 天汇总永久保留, 0表示永久保留"
+    )
+
+
+class RetentionSettings(BaseModel):
+    """数据保留配置"""
+
+    enabled: bool = Field(default=False, description="是否在后台定期执行数据保留任务")
+    interval: float = Field(default=86400.0, description="后台执行间隔（秒）")
+    dry_run: bool = Field(default=False, description="只统计将要删除的数据, 不实际修改")
+    chunk_size: int = Field(default=5000, description="每个事务最多删除的行数")
+    chunk_pause: float = Field(default=0.2, description="每删除一批后暂停的时间（秒）, 用于限流")
+    policies: dict[str, RetentionPolicy] = Field(
+        default_factory=lambda: {
+            "waterleveldata": RetentionPolicy(),
+            "rainfalldata": RetentionPolicy(),
+        },
+        description="按表名配置的保留策略, 未配置的表不做处理",
+    )
+
+
 class Settings(BaseModel):
     """应用配置"""
 
     database: DatabaseSettings = Field(default_factory=DatabaseSettings)
     security: SecuritySettings = Field(default_factory=SecuritySettings)
     logging: LoggingSettings = Field(default_factory=LoggingSettings)
+    ingest: IngestSettings = Field(default_factory=IngestSettings)
+    query: QuerySettings = Field(default_factory=QuerySettings)
+    cache: CacheSettings = Field(default_factory=CacheSettings)
+    retention: RetentionSettings = Field(default_factory=RetentionSettings)
+    live: LiveSettings = Field(default_factory=LiveSettings)
+    query_cache: QueryCacheSettings = Field(default_factory=QueryCacheSettings)
+    alert: AlertSettings = Field(default_factory=AlertSettings)
     config_file: str = Field(default="config.toml", description="配置文件路径")
 
     @property
@@ -84,6 +224,7 @@ class Settings(BaseModel):
         db_max_overflow = environ.get("DB_MAX_OVERFLOW")
         db_pool_recycle = environ.get("DB_POOL_RECYCLE")
         db_echo = environ.get("DB_ECHO")
+        db_partition = environ.get("DB_PARTITION_BY_MONTH")
 
         secret_key = environ.get("SECRET_KEY")
         jwt_algorithm = environ.get("JWT_ALGORITHM")
@@ -91,6 +232,11 @@ class Settings(BaseModel):
 
         log_level = environ.get("LOG_LEVEL")
 
+        ingest_chunk_size = environ.get("INGEST_BATCH_CHUNK_SIZE")
+        ingest_durability = environ.get("INGEST_DURABILITY")
+
+        redis_url = environ.get("REDIS_URL")
+
         database_config = {}
         if db_url is not None:
             database_config["url"] = db_url
@@ -102,6 +248,8 @@ class Settings(BaseModel):
             database_config["pool_recycle"] = int(db_pool_recycle)
         if db_echo is not None:
             database_config["echo"] = db_echo.lower() == "true"
+        if db_partition is not None:
+            database_config["partition_by_month"] = db_partition.lower() == "true"
 
         security_config = {}
         if secret_key is not None:
@@ -115,6 +263,16 @@ class Settings(BaseModel):
         if log_level is not None:
             logging_config["level"] = log_level
 
+        ingest_config = {}
+        if ingest_chunk_size is not None:
+            ingest_config["batch_chunk_size"] = int(ingest_chunk_size)
+        if ingest_durability is not None:
+            ingest_config["durability"] = ingest_durability
+
+        query_cache_config = {}
+        if redis_url is not None:
+            query_cache_config["redis_url"] = redis_url
+
         config_path = environ.get("CONFIG_PATH", None)
         default_config = Path("config.toml") if config_path is None else Path(config_path)
 
@@ -126,6 +284,10 @@ class Settings(BaseModel):
                 file_config["security"] = {}
             if "logging" not in file_config:
                 file_config["logging"] = {}
+            if "ingest" not in file_config:
+                file_config["ingest"] = {}
+            if "query_cache" not in file_config:
+                file_config["query_cache"] = {}
 
             for key, value in database_config.items():
                 file_config["database"][key] = value
@@ -136,11 +298,19 @@ class Settings(BaseModel):
             for key, value in logging_config.items():
                 file_config["logging"][key] = value
 
+            for key, value in ingest_config.items():
+                file_config["ingest"][key] = value
+
+            for key, value in query_cache_config.items():
+                file_config["query_cache"][key] = value
+
             return Settings(**file_config)
         else:
             return Settings(
                 database=DatabaseSettings(**database_config),
                 security=SecuritySettings(**security_config),
                 logging=LoggingSettings(**logging_config),
+                ingest=IngestSettings(**ingest_config),
+                query_cache=QueryCacheSettings(**query_cache_config),
                 config_file=environ.get("CONFIG_FILE", "config.toml"),
             )
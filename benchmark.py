@@ -0,0 +1,547 @@
+import argparse
+import asyncio
+import gzip
+import json
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlmodel import func, select
+
+from app.database.engine import init_db, get_sessionmaker
+from app.database.schema import City, MeasurementRow, RainfallData, Station, WaterLevelData
+from app.router.data import read_latest, read_latest_columns, read_latest_compact
+from app.services.accumulation import RainfallAccumulator, StationSeries, database_totals
+from app.services.batch_read import read_latest_many
+from app.services.alerts import get_alert_engine, start_alert_engine, stop_alert_engine
+from app.services.encoding import (
+    Columns,
+    ColumnarResponse,
+    columnar_json,
+    decode_frames,
+    dumps,
+    encode_frame,
+)
+from app.services.hot_tier import get_hot_tier, load_hot_tier
+from app.services.ingest import BulkWriter
+from app.services.metadata import load_metadata
+from app.services.spatial import SpatialIndex, haversine
+from app.settings import load_settings
+
+# 加载环境变量
+load_dotenv()
+
+
+async def prepare_station(index: int = 1) -> int:
+    """准备一个用于压测的测站"""
+    code = f"BENCH_ST{index:02d}"
+    async with get_sessionmaker()() as session:
+        station = (
+            (await session.execute(select(Station).where(Station.code == code))).scalars().first()
+        )
+        if station is None:
+            city = (
+                (await session.execute(select(City).where(City.code == "BENCH"))).scalars().first()
+            )
+            if city is None:
+                city = City(name="压测", code="BENCH")
+                session.add(city)
+                await session.commit()
+                await session.refresh(city)
+            station = Station(
+                name=f"压测监测站{index}",
+                code=code,
+                city_id=city.id,  # type: ignore
+                latitude=30.0,
+                longitude=120.0,
+                water_level_threshold=4.0,
+                rainfall_threshold=50.0,
+            )
+            session.add(station)
+            await session.commit()
+            await session.refresh(station)
+        assert station.id
+        return station.id
+
+
+def make_points(station_id: int, count: int, start: datetime | None = None) -> list[dict]:
+    start = start or datetime.now(timezone.utc) - timedelta(seconds=count)
+    return [
+        {
+            "station_id": station_id,
+            "measure_at": start + timedelta(seconds=i),
+            "value": round(random.uniform(1.0, 5.0), 2),
+        }
+        for i in range(count)
+    ]
+
+
+async def bench_single(points: list[dict]) -> float:
+    """逐条写入, 与 POST /data/{station_id}/water-level 的执行路径一致"""
+    session_maker = get_sessionmaker()
+    started = time.perf_counter()
+    async with session_maker() as session:
+        for point in points:
+            station = (
+                (await session.execute(select(Station).where(Station.id == point["station_id"])))
+                .scalars()
+                .first()
+            )
+            assert station
+            session.add(WaterLevelData(**point))
+            await session.commit()
+    return time.perf_counter() - started
+
+
+async def bench_bulk(points: list[dict]) -> float:
+    """批量写入, 与 POST /data/water-level/batch 的执行路径一致"""
+    session_maker = get_sessionmaker()
+    started = time.perf_counter()
+    async with session_maker() as session:
+        writer = BulkWriter(session, WaterLevelData)
+        for row, point in enumerate(points):
+            await writer.add(row, point)
+        result = await writer.finish()
+    assert result.rejected == 0
+    return time.perf_counter() - started
+
+
+async def bench_ingest(args: argparse.Namespace) -> None:
+    await init_db()
+    station_id = await prepare_station()
+
+    single = await bench_single(make_points(station_id, args.single_rows))
+    bulk = await bench_bulk(make_points(station_id, args.bulk_rows))
+
+    single_rate = args.single_rows / single
+    bulk_rate = args.bulk_rows / bulk
+    print(f"逐条写入: {args.single_rows} 行, {single:.3f}s, {single_rate:.0f} 行/秒")
+    print(f"批量写入: {args.bulk_rows} 行, {bulk:.3f}s, {bulk_rate:.0f} 行/秒")
+    print(f"加速比: {bulk_rate / single_rate:.1f}x")
+
+
+def make_alert_points(
+    station_id: int, args: argparse.Namespace, start: datetime | None = None
+) -> list[dict]:
+    points = make_points(station_id, args.rows, start)
+    if args.pattern == "wave":
+        for i, point in enumerate(points):
+            wave = math.sin(2 * math.pi * i / args.period)
+            point["value"] = round(3.0 + 1.5 * wave + random.uniform(-0.05, 0.05), 2)
+    return points
+
+
+async def bench_alerts(args: argparse.Namespace) -> None:
+    """
+    对比开启/关闭报警引擎时的批量写入耗时
+
+    测站水位阈值为4.0; wave 模式下数据按周期缓慢起伏, 每个周期越过阈值一次（接近实际情况）,
+    random 模式下数据在1.0~5.0之间随机, 约四分之一超过阈值, 是频繁触发和解除报警的最坏情况
+    """
+    await init_db()
+    station_id = await prepare_station()
+    await load_metadata()
+    # 报警引擎默认关闭, 基准测试为单进程, 直接开启
+    load_settings().alert.enabled = True
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+
+    timings: dict[bool, list[float]] = {False: [], True: []}
+    for index in range(args.rounds):
+        for enabled in (False, True):
+            if enabled:
+                await start_alert_engine()
+            points = make_alert_points(station_id, args, start)
+            start += timedelta(seconds=args.rows)
+            timings[enabled].append(await bench_bulk(points))
+            if enabled:
+                engine = get_alert_engine()
+                assert engine is not None, "需要开启 alert.enabled"
+                stats = engine.stats()
+                flush_started = time.perf_counter()
+                await stop_alert_engine()
+                flush = time.perf_counter() - flush_started
+                print(
+                    f"第{index + 1}轮: 触发 {stats.triggered} 条, 解除 {stats.resolved} 条, "
+                    f"后台落库剩余报警 {flush * 1000:.1f}ms"
+                )
+
+    off, on = sorted(timings[False]), sorted(timings[True])
+    off_median, on_median = off[len(off) // 2], on[len(on) // 2]
+    print(f"关闭报警: {args.rows} 行, 中位数 {off_median:.3f}s")
+    print(f"开启报警: {args.rows} 行, 中位数 {on_median:.3f}s")
+    print(f"写入耗时增加: {(on_median / off_median - 1) * 100:.1f}%")
+
+    # 单独测量内存中评估的开销, 即写入请求中增加的部分
+    await start_alert_engine()
+    engine = get_alert_engine()
+    assert engine is not None
+    rows = [
+        MeasurementRow(i, station_id, point["measure_at"], point["value"])
+        for i, point in enumerate(make_alert_points(station_id, args))
+    ]
+    # 与批量写入一样按块评估
+    chunk = load_settings().ingest.batch_chunk_size
+    started = time.perf_counter()
+    for i in range(0, len(rows), chunk):
+        engine.evaluate(WaterLevelData, rows[i : i + chunk])
+    elapsed = time.perf_counter() - started
+    print(f"报警评估: {elapsed / len(rows) * 1e6:.2f}us/行")
+    await stop_alert_engine()
+
+
+async def bench_reads(args: argparse.Namespace) -> None:
+    """
+    对比"最新N条"接口各响应格式的单次请求CPU时间和响应大小
+
+    CPU时间包含查询、构造结果和编码响应体, 使用 process_time 排除等待数据库的时间;
+    以默认行格式为基准, 热缓存只用于 compact 和列式格式
+    """
+    await init_db()
+    station_id = await prepare_station()
+    async with get_sessionmaker()() as session:
+        count = (
+            await session.execute(
+                select(func.count())
+                .select_from(WaterLevelData)
+                .where(WaterLevelData.station_id == station_id)
+            )
+        ).scalar_one()
+    if count < args.limit:
+        await bench_bulk(make_points(station_id, args.limit - count))
+
+    async def full_rows(session):
+        rows = await read_latest(session, WaterLevelData, station_id, args.limit)
+        return JSONResponse(jsonable_encoder(rows)).body
+
+    async def compact_rows(session):
+        rows = await read_latest_compact(session, WaterLevelData, station_id, args.limit)
+        return JSONResponse(jsonable_encoder(rows)).body
+
+    async def columnar(session):
+        columns = await read_latest_columns(session, WaterLevelData, station_id, args.limit)
+        return ColumnarResponse(columns).body
+
+    cases = [
+        ("默认行格式（完整字段）", full_rows),
+        ("layout=compact", compact_rows),
+        ("layout=columnar", columnar),
+    ]
+    results = []
+    for hot in (False, True):
+        if hot:
+            load_settings().cache.hot_tier_enabled = True
+            await load_hot_tier()
+            if get_hot_tier() is None:
+                break
+        for name, handler in cases[1:] if hot else cases:
+            async with get_sessionmaker()() as session:
+                await handler(session)
+                started = time.process_time()
+                for _ in range(args.requests):
+                    body = await handler(session)
+                elapsed = time.process_time() - started
+            results.append(
+                (name + (" (热缓存)" if hot else ""), elapsed / args.requests, len(body))
+            )
+
+    baseline_cpu, baseline_size = results[0][1], results[0][2]
+    print(f"每次请求 {args.limit} 条, 重复 {args.requests} 次")
+    for name, cpu, size in results:
+        print(
+            f"{name}: CPU {cpu * 1000:.2f}ms/次 ({baseline_cpu / cpu:.1f}x), "
+            f"响应 {size / 1024:.1f}KB ({size / baseline_size * 100:.0f}%)"
+        )
+
+
+async def bench_multi(args: argparse.Namespace) -> None:
+    """
+    对比逐个测站查询与一次批量查询获取多个测站最新数据的耗时
+
+    不使用热缓存, 两种方式都查询数据库
+    """
+    await init_db()
+    station_ids = [await prepare_station(index) for index in range(1, args.stations + 1)]
+    async with get_sessionmaker()() as session:
+        counts = dict(
+            (
+                await session.execute(
+                    select(WaterLevelData.station_id, func.count())
+                    .where(WaterLevelData.station_id.in_(station_ids))  # type: ignore
+                    .group_by(WaterLevelData.station_id)
+                )
+            ).all()
+        )
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    for station_id in station_ids:
+        if counts.get(station_id, 0) < args.points:
+            await bench_bulk(make_points(station_id, args.points, start))
+
+    async def per_station(session) -> None:
+        for station_id in station_ids:
+            await read_latest_compact(session, WaterLevelData, station_id, args.limit)
+
+    async def batched(session) -> None:
+        await read_latest_many(session, WaterLevelData, station_ids, args.limit)
+
+    print(f"{args.stations} 个测站, 每个测站最新 {args.limit} 条, 重复 {args.repeat} 次")
+    results = {}
+    for name, handler in (("逐个测站查询", per_station), ("一次批量查询", batched)):
+        async with get_sessionmaker()() as session:
+            await handler(session)
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                await handler(session)
+            results[name] = (time.perf_counter() - started) / args.repeat
+    base = results["逐个测站查询"]
+    for name, elapsed in results.items():
+        print(f"{name}: {elapsed * 1000:.1f}ms/次 ({base / elapsed:.1f}x)")
+
+
+async def bench_wire(args: argparse.Namespace) -> None:
+    """
+    对比多测站序列在行格式JSON、列式JSON和二进制帧下的大小与编解码耗时
+
+    不访问数据库; 数据为每分钟一个点的水位序列, 模拟大屏同时展示多个测站
+    """
+    start = int(datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp() * 1_000_000)
+    series = {
+        station_id: Columns(
+            [start + i * 60_000_000 for i in range(args.points)],
+            [round(3.0 + math.sin(i / 50 + station_id), 3) for i in range(args.points)],
+        )
+        for station_id in range(1, args.stations + 1)
+    }
+
+    def rows_json() -> bytes:
+        return dumps(
+            [
+                {
+                    "station_id": station_id,
+                    "value": value,
+                    "measure_at": datetime.fromtimestamp(time / 1e6, timezone.utc).isoformat(),
+                }
+                for station_id, columns in series.items()
+                for time, value in zip(*columns)
+            ]
+        )
+
+    def columnar() -> bytes:
+        return b"[" + b",".join(columnar_json(columns) for columns in series.values()) + b"]"
+
+    def binary() -> bytes:
+        return b"".join(encode_frame(station_id, columns) for station_id, columns in series.items())
+
+    def parse_rows(data: bytes) -> None:
+        for row in json.loads(data):
+            datetime.fromisoformat(row["measure_at"])
+
+    cases = [
+        ("行格式JSON", rows_json, parse_rows),
+        ("列式JSON", columnar, json.loads),
+        ("二进制帧", binary, decode_frames),
+    ]
+    print(f"{args.stations} 个测站, 每个 {args.points} 个点")
+    results = []
+    for name, encode, decode in cases:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            data = encode()
+        encoded = (time.perf_counter() - started) / args.repeat
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            decode(data)
+        decoded = (time.perf_counter() - started) / args.repeat
+        results.append((name, len(data), len(gzip.compress(data)), encoded, decoded))
+
+    base = results[0]
+    for name, size, compressed, encoded, decoded in results:
+        print(
+            f"{name}: {size / 1024:.0f}KB (gzip {compressed / 1024:.0f}KB), "
+            f"编码 {encoded * 1000:.1f}ms, 解析 {decoded * 1000:.1f}ms "
+            f"({base[4] / decoded:.1f}x)"
+        )
+
+
+async def bench_spatial(args: argparse.Namespace) -> None:
+    """
+    对比遍历全部测站与网格索引的视口查询和最近邻查询耗时
+
+    不访问数据库; 测站在中国范围内随机分布, 视口约为一个地级市大小
+    """
+    rng = random.Random(0)
+    stations = {
+        station_id: (rng.uniform(18, 53), rng.uniform(73, 135))
+        for station_id in range(1, args.stations + 1)
+    }
+    index = SpatialIndex(args.cell_size)
+    started = time.perf_counter()
+    for station_id, (latitude, longitude) in stations.items():
+        index.upsert(station_id, latitude, longitude)
+    print(f"{args.stations} 个测站, 建立索引 {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    queries = [(rng.uniform(20, 50), rng.uniform(75, 133)) for _ in range(args.queries)]
+
+    def scan_within(latitude: float, longitude: float) -> list[int]:
+        return sorted(
+            station_id
+            for station_id, (lat, lon) in stations.items()
+            if latitude <= lat <= latitude + 1 and longitude <= lon <= longitude + 1.5
+        )
+
+    def scan_nearest(latitude: float, longitude: float) -> list[int]:
+        distances = ((haversine(latitude, longitude, *p), i) for i, p in stations.items())
+        return [station_id for _, station_id in sorted(distances)[: args.k]]
+
+    cases = [
+        ("视口查询", scan_within, lambda a, b: index.within(a, b, a + 1, b + 1.5)),
+        ("最近邻查询", scan_nearest, lambda a, b: [i for i, _ in index.nearest(a, b, args.k)]),
+    ]
+    for name, scan, indexed in cases:
+        timings, results = [], []
+        for handler in (scan, indexed):
+            started = time.perf_counter()
+            results.append([handler(latitude, longitude) for latitude, longitude in queries])
+            timings.append((time.perf_counter() - started) / args.queries)
+        assert results[0] == results[1]
+        print(
+            f"{name}: 遍历 {timings[0] * 1000:.2f}ms/次, 索引 {timings[1] * 1000:.3f}ms/次 "
+            f"({timings[0] / timings[1]:.0f}x)"
+        )
+
+
+async def bench_accumulation(args: argparse.Namespace) -> None:
+    """
+    对比SQL按窗口求和与内存中增量维护的累计雨量, 以及增量维护的写入开销
+
+    测站最近72小时内每 72h/points 一条雨量数据
+    """
+    await init_db()
+    await load_metadata()
+    station_ids = [await prepare_station(index) for index in range(1, args.stations + 1)]
+    now = datetime.now(timezone.utc)
+    step = timedelta(hours=72) / args.points
+    async with get_sessionmaker()() as session:
+        counts = dict(
+            (
+                await session.execute(
+                    select(RainfallData.station_id, func.count())
+                    .where(
+                        RainfallData.station_id.in_(station_ids),  # type: ignore
+                        RainfallData.measure_at > now - timedelta(hours=72),  # type: ignore
+                    )
+                    .group_by(RainfallData.station_id)
+                )
+            ).all()
+        )
+        writer = BulkWriter(session, RainfallData)
+        row = 0
+        for station_id in station_ids:
+            if counts.get(station_id, 0) >= args.points:
+                continue
+            for i in range(args.points):
+                point = {
+                    "station_id": station_id,
+                    "measure_at": now - (i + 1) * step,
+                    "value": round(random.uniform(0.0, 2.0), 1),
+                }
+                await writer.add(row, point)
+                row += 1
+        await writer.finish()
+
+    accumulator = RainfallAccumulator()
+    started = time.perf_counter()
+    loaded = await accumulator.rebuild(station_ids)
+    print(f"{args.stations} 个测站, 预热 {loaded} 条, {(time.perf_counter() - started):.2f}s")
+
+    at = datetime.now(timezone.utc)
+    async with get_sessionmaker()() as session:
+        expected = await database_totals(session, station_ids, at)
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            await database_totals(session, station_ids, at)
+        database = (time.perf_counter() - started) / args.repeat
+    assert accumulator.accumulations(station_ids, at) == expected
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        accumulator.accumulations(station_ids, at)
+    memory = (time.perf_counter() - started) / args.repeat
+    print(f"SQL按窗口求和: {database * 1000:.2f}ms/次")
+    print(f"内存累计雨量: {memory * 1000:.3f}ms/次 ({database / memory:.0f}x)")
+
+    # 写入开销: 按时间顺序到达, 以及 late 比例的数据迟到最多 1 小时
+    times = [int(i * step.total_seconds() * 1_000_000) for i in range(args.points * 10)]
+    delayed = list(times)
+    lag = max(int(timedelta(hours=1) / step), 1)
+    for i in range(len(delayed) - lag):
+        if random.random() < args.late:
+            j = i + random.randint(1, lag)
+            delayed[i], delayed[j] = delayed[j], delayed[i]
+    for name, order in (("顺序到达", times), (f"{args.late:.0%} 迟到", delayed)):
+        series = StationSeries()
+        started = time.perf_counter()
+        for time_micros in order:
+            series.insert(time_micros, 1.0)
+        elapsed = time.perf_counter() - started
+        print(f"写入 {name}: {elapsed / len(order) * 1e6:.2f}us/条")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="性能基准测试, 使用 DATABASE_URL 指定的数据库")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="对比逐条写入与批量写入的吞吐量")
+    ingest.add_argument("--single-rows", type=int, default=500)
+    ingest.add_argument("--bulk-rows", type=int, default=50000)
+    ingest.set_defaults(handler=bench_ingest)
+
+    alerts = commands.add_parser("alerts", help="对比开启/关闭报警引擎时的写入耗时")
+    alerts.add_argument("--rows", type=int, default=20000)
+    alerts.add_argument("--rounds", type=int, default=3)
+    alerts.add_argument("--pattern", choices=["wave", "random"], default="wave")
+    alerts.add_argument("--period", type=int, default=1000, help="wave 模式下的周期（行）")
+    alerts.set_defaults(handler=bench_alerts)
+
+    reads = commands.add_parser("reads", help="对比最新数据接口各响应格式的CPU时间和响应大小")
+    reads.add_argument("--limit", type=int, default=1000)
+    reads.add_argument("--requests", type=int, default=200)
+    reads.set_defaults(handler=bench_reads)
+
+    multi = commands.add_parser("multi", help="对比逐个测站查询与一次批量查询多个测站的耗时")
+    multi.add_argument("--stations", type=int, default=60)
+    multi.add_argument("--points", type=int, default=2000)
+    multi.add_argument("--limit", type=int, default=1)
+    multi.add_argument("--repeat", type=int, default=20)
+    multi.set_defaults(handler=bench_multi)
+
+    wire = commands.add_parser("wire", help="对比多测站序列在各响应格式下的大小和编解码耗时")
+    wire.add_argument("--stations", type=int, default=30)
+    wire.add_argument("--points", type=int, default=1440)
+    wire.add_argument("--repeat", type=int, default=5)
+    wire.set_defaults(handler=bench_wire)
+
+    spatial = commands.add_parser("spatial", help="对比遍历与网格索引的视口和最近邻查询耗时")
+    spatial.add_argument("--stations", type=int, default=20000)
+    spatial.add_argument("--cell-size", type=float, default=0.25)
+    spatial.add_argument("--queries", type=int, default=200)
+    spatial.add_argument("-k", type=int, default=10)
+    spatial.set_defaults(handler=bench_spatial)
+
+    accumulation = commands.add_parser(
+        "accumulation", help="对比SQL求和与内存增量维护的累计雨量查询耗时和写入开销"
+    )
+    accumulation.add_argument("--stations", type=int, default=50)
+    accumulation.add_argument("--points", type=int, default=4320)
+    accumulation.add_argument("--repeat", type=int, default=20)
+    accumulation.add_argument("--late", type=float, default=0.05, help="迟到数据的比例")
+    accumulation.set_defaults(handler=bench_accumulation)
+
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+测试使用每个测试独立的 SQLite 数据库和默认配置, 不读取 config.toml 和环境变量
+
+异步测试使用 anyio 的 pytest 插件, 在模块中标记 pytestmark = pytest.mark.anyio
+"""
+
+import pytest
+import app.settings
+from app.database.engine import get_engine, get_sessionmaker, init_db
+from app.database.schema import City, Station
+from app.settings import DatabaseSettings, Settings
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def settings(tmp_path, monkeypatch) -> Settings:
+    """每个测试使用新的配置, 测试中可以直接修改"""
+    settings = Settings(database=DatabaseSettings(url=f"sqlite+aiosqlite:///{tmp_path}/test.db"))
+    monkeypatch.setattr(app.settings, "_settings", settings)
+    return settings
+
+
+@pytest.fixture
+async def database(settings):
+    await init_db()
+    yield
+    await get_engine().dispose()
+
+
+@pytest.fixture
+async def stations(database) -> list[Station]:
+    """两个城市共 4 个测站, 水位阈值 4.0, 雨量阈值 50.0"""
+    async with get_sessionmaker()() as session:
+        session.add_all([City(id=1, name="北京", code="BJ"), City(id=2, name="上海", code="SH")])
+        stations = [
+            Station(
+                id=i,
+                name=f"测站{i}",
+                code=f"S{i}",
+                city_id=1 if i <= 2 else 2,
+                latitude=30.0 + i,
+                longitude=110.0 + i,
+                water_level_threshold=4.0,
+                rainfall_threshold=50.0,
+            )
+            for i in range(1, 5)
+        ]
+        session.add_all(stations)
+        await session.commit()
+    return stations
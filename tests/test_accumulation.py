@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from app.database.engine import get_sessionmaker
+from app.database.schema import RainfallData
+from app.services.accumulation import (
+    HORIZON_MICROS,
+    HOUR_MICROS,
+    AccumulationWindow,
+    RainfallAccumulator,
+    StationSeries,
+    database_totals,
+)
+from app.services.ingest import write_points
+
+BASE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def hours(value: float) -> int:
+    return int(value * HOUR_MICROS)
+
+
+def series(points: list[tuple[float, float]]) -> StationSeries:
+    station = StationSeries()
+    for hour, value in points:
+        station.insert(hours(hour), value)
+    return station
+
+
+def test_window_totals():
+    station = series([(0, 1.0), (1, 2.0), (2, 4.0), (3, 8.0)])
+    assert station.total(AccumulationWindow.H1, hours(3)) == 8.0
+    # 窗口左开右闭: (0, 3]
+    assert station.total(AccumulationWindow.H3, hours(3)) == 14.0
+    assert station.total(AccumulationWindow.H1, hours(2.5)) == 4.0
+    assert station.total(AccumulationWindow.H24, hours(1)) == 3.0
+    totals = station.totals(hours(3))
+    assert totals[AccumulationWindow.H1] == 8.0
+    assert totals[AccumulationWindow.H3] == 14.0
+    assert totals[AccumulationWindow.H72] == 15.0
+
+
+def test_late_points_update_prefix_sums():
+    station = series([(0, 1.0), (2, 2.0), (4, 4.0)])
+    assert station.insert(hours(1), 10.0) is True
+    assert station.insert(hours(3), 0.1) is True
+    assert len(station) == 5
+    assert station.total(AccumulationWindow.H1, hours(1)) == 10.0
+    # (1, 4]
+    assert station.total(AccumulationWindow.H3, hours(4)) == 6.1
+    assert station.total(AccumulationWindow.H6, hours(4)) == 17.1
+    assert station.total(AccumulationWindow.H72, hours(4)) == 17.1
+
+
+def test_duplicates_and_points_older_than_horizon_are_ignored():
+    station = series([(0, 1.0), (100, 2.0)])
+    assert station.insert(hours(100), 5.0) is None
+    # 第一个点已过期, 早于 100 - 72 小时的迟到数据被忽略
+    assert station.insert(hours(20), 5.0) is None
+    assert station.insert(hours(50), 5.0) is True
+    assert station.totals(hours(100))[AccumulationWindow.H72] == 7.0
+
+
+def test_expired_points_are_compacted():
+    station = StationSeries()
+    for hour in range(200):
+        assert station.insert(hours(hour), 1.0) is False
+    # 保存范围 (127, 199]
+    assert len(station) == HORIZON_MICROS // HOUR_MICROS
+    assert len(station._times) < 2 * len(station)
+    assert station.total(AccumulationWindow.H72, hours(199)) == 72.0
+    assert station.total(AccumulationWindow.H6, hours(199)) == 6.0
+    # 压缩后插入迟到数据, 前缀和仍然正确
+    assert station.insert(hours(198.5), 0.5) is True
+    assert station.total(AccumulationWindow.H1, hours(199)) == 1.5
+    assert station.total(AccumulationWindow.H72, hours(199)) == 72.5
+
+
+def test_totals_are_rounded():
+    station = series([(hour / 10, 0.1) for hour in range(1, 11)])
+    assert station.total(AccumulationWindow.H1, hours(1)) == 1.0
+
+
+def test_accumulator_counts_late_and_dropped_points():
+    accumulator = RainfallAccumulator()
+    rows = [
+        SimpleNamespace(station_id=1, measure_at=BASE + timedelta(hours=2), value=2.0),
+        SimpleNamespace(station_id=1, measure_at=BASE + timedelta(hours=1), value=1.0),
+        SimpleNamespace(station_id=1, measure_at=BASE + timedelta(hours=1), value=1.0),
+        SimpleNamespace(station_id=2, measure_at=BASE, value=5.0),
+    ]
+    accumulator.add(rows)
+    stats = accumulator.stats()
+    assert (stats.stations, stats.points, stats.late_points, stats.dropped_points) == (2, 3, 1, 1)
+
+    at = BASE + timedelta(hours=2)
+    assert accumulator.total(1, AccumulationWindow.H3, at) == 3.0
+    assert accumulator.total(3, AccumulationWindow.H3, at) == 0.0
+    result = accumulator.accumulations([1, 2, 3], at)
+    assert [item.station_id for item in result] == [1, 2, 3]
+    assert result[0].totals[AccumulationWindow.H1] == 2.0
+    assert result[1].totals[AccumulationWindow.H1] == 0.0
+    assert result[1].totals[AccumulationWindow.H3] == 5.0
+    assert set(result[2].totals.values()) == {0.0}
+
+
+@pytest.mark.anyio
+async def test_rebuild_matches_database_totals(stations):
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    rows = [
+        {"station_id": station_id, "measure_at": now - timedelta(minutes=37 * i), "value": i / 10}
+        for station_id in (1, 2)
+        for i in range(1, 150)
+    ]
+    async with get_sessionmaker()() as session:
+        await write_points(session, RainfallData, rows)
+        await session.commit()
+
+    accumulator = RainfallAccumulator()
+    count = await accumulator.rebuild()
+    assert 0 < count < len(rows)
+    async with get_sessionmaker()() as session:
+        expected = await database_totals(session, [1, 2, 3], now)
+    assert accumulator.accumulations([1, 2, 3], now) == expected
+
+    # 只重新加载一个测站时保留其他测站
+    assert await accumulator.rebuild([1]) == count // 2
+    assert accumulator.stats().stations == 2
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from sqlmodel import select
+import app.services.alerts
+from app.database.engine import get_sessionmaker
+from app.database.schema import (
+    Alert,
+    AlertStatus,
+    AlertType,
+    MeasurementRow,
+    RainfallData,
+    WaterLevelData,
+)
+from app.services.alerts import AlertEngine
+
+BASE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+KEY = (1, AlertType.WATER_LEVEL)
+
+
+@pytest.fixture(autouse=True)
+def metadata(monkeypatch):
+    """测站 1 水位阈值 4.0, 没有雨量阈值"""
+    station = SimpleNamespace(name="测站1", water_level_threshold=4.0, rainfall_threshold=None)
+    fake = SimpleNamespace(station=lambda station_id: station if station_id == 1 else None)
+    monkeypatch.setattr(app.services.alerts, "peek_metadata", lambda: fake)
+
+
+@pytest.fixture
+def engine() -> AlertEngine:
+    return AlertEngine(flush_interval=10, batch_size=100)
+
+
+def rows(*points: tuple[int, float], station_id: int = 1) -> list[MeasurementRow]:
+    """(分钟, 数值) 转换为写入的数据, id 与分钟相同"""
+    return [
+        MeasurementRow(minute, station_id, BASE + timedelta(minutes=minute), value)
+        for minute, value in points
+    ]
+
+
+def test_triggers_once_and_resolves(engine):
+    engine.evaluate(WaterLevelData, rows((1, 3.0), (2, 5.0), (3, 6.0)))
+    alert = engine.open[KEY]
+    assert (alert.trigger_data_id, alert.trigger_value, alert.threshold) == (2, 5.0, 4.0)
+    assert alert.status == AlertStatus.ACTIVE
+
+    engine.evaluate(WaterLevelData, rows((4, 7.0)))
+    assert engine.open[KEY] is alert
+    assert engine.stats().triggered == 1
+
+    engine.evaluate(WaterLevelData, rows((5, 4.0)))
+    assert KEY not in engine.open
+    assert alert.status == AlertStatus.RESOLVED
+    assert alert.revolved_at == BASE + timedelta(minutes=5)
+
+    engine.evaluate(WaterLevelData, rows((6, 4.5)))
+    assert engine.open[KEY] is not alert
+    assert engine.stats().triggered == 2
+
+
+def test_batch_is_evaluated_in_measure_order(engine):
+    # 同一批中后到的高值先测量, 随后回落: 触发后立即解除
+    engine.evaluate(WaterLevelData, rows((3, 1.0), (1, 5.0)))
+    assert KEY not in engine.open
+    stats = engine.stats()
+    assert (stats.triggered, stats.resolved) == (1, 1)
+
+
+def test_late_data_does_not_change_state(engine):
+    engine.evaluate(WaterLevelData, rows((10, 5.0)))
+    alert = engine.open[KEY]
+    engine.evaluate(WaterLevelData, rows((5, 1.0)))
+    assert engine.open[KEY] is alert
+
+    engine.evaluate(WaterLevelData, rows((11, 1.0)))
+    assert KEY not in engine.open
+    engine.evaluate(WaterLevelData, rows((8, 9.0)))
+    assert KEY not in engine.open
+    assert engine.stats().triggered == 1
+
+
+def test_late_data_after_quiet_period_is_ignored(engine):
+    # 全部未超过阈值的批次也会推进已评估的时间
+    engine.evaluate(WaterLevelData, rows((10, 1.0)))
+    engine.evaluate(WaterLevelData, rows((5, 9.0)))
+    assert KEY not in engine.open
+
+
+def test_skips_unknown_stations_and_missing_thresholds(engine):
+    engine.evaluate(WaterLevelData, rows((1, 9.0), station_id=2))
+    engine.evaluate(RainfallData, rows((1, 999.0)))
+    assert engine.open == {}
+    assert engine.stats().evaluated == 2
+
+
+@pytest.mark.anyio
+async def test_flush_inserts_then_updates(database, engine):
+    engine.evaluate(WaterLevelData, rows((1, 5.0)))
+    assert engine.has_unsaved
+    assert await engine.flush() == 1
+    alert = engine.open[KEY]
+    assert alert.id is not None
+    assert not engine.has_unsaved
+
+    engine.evaluate(WaterLevelData, rows((2, 1.0)))
+    assert await engine.flush() == 1
+    async with get_sessionmaker()() as session:
+        stored = (await session.execute(select(Alert))).scalars().all()
+    assert [(a.id, a.status, a.trigger_value) for a in stored] == [
+        (alert.id, AlertStatus.RESOLVED, 5.0)
+    ]
+
+    # 重新加载时只恢复未解除的报警
+    engine.evaluate(WaterLevelData, rows((3, 6.0)))
+    await engine.flush()
+    restored = AlertEngine(flush_interval=10, batch_size=100)
+    await restored.load()
+    assert restored.open[KEY].trigger_value == 6.0
@@ -0,0 +1,105 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+import app.services.broadcast
+from app.database.schema import MeasurementRow, WaterLevelData
+from app.router.live import live_sse
+from app.services.broadcast import Broadcaster, Subscriber
+
+BASE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def metadata(monkeypatch):
+    """测站 1、2 属于城市 1, 测站 3 属于城市 2"""
+    cities = {1: 1, 2: 1, 3: 2}
+    fake = SimpleNamespace(
+        station=lambda station_id: (
+            SimpleNamespace(city_id=cities[station_id]) if station_id in cities else None
+        )
+    )
+    monkeypatch.setattr(app.services.broadcast, "peek_metadata", lambda: fake)
+
+
+def drain(subscriber: Subscriber) -> list[tuple[str, dict]]:
+    messages = asyncio.run(subscriber.get(timeout=1))
+    return [(event, json.loads(data)) for event, data in messages]
+
+
+def reading(id: int, station_id: int) -> MeasurementRow:
+    return MeasurementRow(id, station_id, BASE, float(id))
+
+
+def test_routes_by_station_city_and_everything():
+    broadcaster = Broadcaster(queue_size=10, max_connections=10)
+    by_station = broadcaster.subscribe([1], [])
+    by_city = broadcaster.subscribe([], [1])
+    everything = broadcaster.subscribe([], [])
+    broadcaster.publish_readings(WaterLevelData, [reading(1, 1), reading(2, 2), reading(3, 3)])
+
+    assert [data["id"] for _, data in drain(by_station)] == [1]
+    assert [data["id"] for _, data in drain(by_city)] == [1, 2]
+    assert [data["id"] for _, data in drain(everything)] == [1, 2, 3]
+    assert broadcaster.stats().published == 3
+
+
+def test_full_queue_coalesces_readings_of_same_station():
+    broadcaster = Broadcaster(queue_size=2, max_connections=10)
+    subscriber = broadcaster.subscribe([], [])
+    broadcaster.publish_readings(
+        WaterLevelData, [reading(1, 1), reading(2, 2), reading(3, 1), reading(4, 1)]
+    )
+    assert [data["id"] for _, data in drain(subscriber)] == [2, 4]
+    assert subscriber.coalesced == 2
+    assert subscriber.dropped == 0
+
+
+def test_full_queue_drops_oldest_without_merge_key():
+    broadcaster = Broadcaster(queue_size=2, max_connections=10)
+    subscriber = broadcaster.subscribe([], [])
+    for i in range(3):
+        broadcaster.publish(1, None, "alert", {"n": i})
+    assert [data["n"] for _, data in drain(subscriber)] == [1, 2]
+    assert subscriber.dropped == 1
+
+
+def test_connection_limit_and_unsubscribe_keeps_stats():
+    broadcaster = Broadcaster(queue_size=10, max_connections=1)
+    subscriber = broadcaster.subscribe([1], [])
+    assert broadcaster.full
+    assert broadcaster.subscribe([], []) is None
+    broadcaster.publish_readings(WaterLevelData, [reading(1, 1)])
+    drain(subscriber)
+    broadcaster.unsubscribe(subscriber)
+    assert not broadcaster.full
+    stats = broadcaster.stats()
+    assert (stats.connections, stats.delivered) == (0, 1)
+    broadcaster.publish_readings(WaterLevelData, [reading(2, 1)])
+    assert broadcaster.stats().published == 1
+
+
+@pytest.mark.anyio
+async def test_sse_subscribes_only_while_streaming(monkeypatch):
+    broadcaster = Broadcaster(queue_size=10, max_connections=1)
+    monkeypatch.setattr(app.services.broadcast, "_broadcaster", broadcaster)
+
+    # 生成器未开始执行时不订阅
+    response = await live_sse([1], [])
+    assert broadcaster.stats().connections == 0
+
+    stream = response.body_iterator
+    first = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0)
+    assert broadcaster.stats().connections == 1
+    broadcaster.publish_readings(WaterLevelData, [reading(1, 1)])
+    assert (await first).startswith("event: reading\n")
+    await stream.aclose()
+    assert broadcaster.stats().connections == 0
+
+    broadcaster.subscribe([], [])
+    with pytest.raises(HTTPException) as error:
+        await live_sse([1], [])
+    assert error.value.status_code == 503
@@ -0,0 +1,116 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import func, select
+import app.services.buffer
+from app.database.engine import get_sessionmaker
+from app.database.schema import WaterLevelData
+from app.services.buffer import WriteBehindBuffer
+
+pytestmark = pytest.mark.anyio
+
+BASE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def point(minute: int, value: float | None = 1.0, station_id: int = 1) -> dict:
+    return {
+        "station_id": station_id,
+        "measure_at": BASE + timedelta(minutes=minute),
+        "value": value,
+    }
+
+
+async def count_rows() -> int:
+    async with get_sessionmaker()() as session:
+        statement = select(func.count()).select_from(WaterLevelData)
+        return (await session.execute(statement)).scalar_one()
+
+
+async def test_flush_writes_batch_and_skips_duplicates(database):
+    buffer = WriteBehindBuffer(capacity=100, batch_size=50, flush_interval=10)
+    for minute in range(5):
+        buffer.offer(WaterLevelData, point(minute))
+    assert await buffer.flush() == 5
+
+    buffer.offer(WaterLevelData, point(0))
+    buffer.offer(WaterLevelData, point(5))
+    assert await buffer.flush() == 1
+
+    stats = buffer.stats()
+    assert stats.flushes == 2
+    assert stats.flushed_rows == 6
+    assert stats.queued == 0
+    assert await count_rows() == 6
+
+
+async def test_offer_rejects_when_full(database):
+    buffer = WriteBehindBuffer(capacity=2, batch_size=50, flush_interval=10)
+    assert buffer.offer(WaterLevelData, point(0))
+    assert buffer.offer(WaterLevelData, point(1))
+    assert not buffer.offer(WaterLevelData, point(2))
+    assert buffer.stats().rejected_full == 1
+
+
+async def test_flush_drops_only_invalid_rows(database):
+    buffer = WriteBehindBuffer(capacity=100, batch_size=50, flush_interval=10)
+    for minute in range(7):
+        buffer.offer(WaterLevelData, point(minute, value=None if minute == 3 else 1.0))
+    assert await buffer.flush() == 6
+    assert buffer.stats().dropped_rows == 1
+    assert await count_rows() == 6
+
+
+async def test_flush_requeues_then_drops_after_max_retries(database, monkeypatch):
+    buffer = WriteBehindBuffer(capacity=100, batch_size=50, flush_interval=10, max_retries=2)
+
+    async def unavailable(queues):
+        raise OSError("数据库不可用")
+
+    monkeypatch.setattr(buffer, "_write", unavailable)
+    buffer.offer(WaterLevelData, point(0))
+    buffer.offer(WaterLevelData, point(1))
+    for _ in range(2):
+        assert await buffer.flush() == 0
+        assert buffer.stats().queued == 2
+    assert await buffer.flush() == 0
+    stats = buffer.stats()
+    assert stats.queued == 0
+    assert stats.dropped_rows == 2
+    assert stats.failed_flushes == 3
+
+
+async def test_hook_failure_does_not_lose_later_batches(database, monkeypatch):
+    def broken(model, rows):
+        raise RuntimeError("hook")
+
+    monkeypatch.setattr(app.services.buffer, "after_commit", broken)
+    buffer = WriteBehindBuffer(capacity=100, batch_size=50, flush_interval=10)
+    buffer.offer(WaterLevelData, point(0))
+    assert await buffer.flush() == 1
+    buffer.offer(WaterLevelData, point(1))
+    assert await buffer.flush() == 1
+    assert await count_rows() == 2
+
+
+async def test_background_task_survives_failed_flush(database, monkeypatch):
+    buffer = WriteBehindBuffer(capacity=100, batch_size=1, flush_interval=0.01)
+    flush = buffer.flush
+    calls = 0
+
+    async def flaky() -> int:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RuntimeError("flush")
+        return await flush()
+
+    monkeypatch.setattr(buffer, "flush", flaky)
+    buffer.start()
+    buffer.offer(WaterLevelData, point(0))
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if buffer.stats().flushed_rows:
+            break
+    assert calls > 1
+    assert buffer.stats().flushed_rows == 1
+    await buffer.stop()
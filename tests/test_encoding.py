@@ -0,0 +1,93 @@
+import json
+import struct
+import pytest
+from app.services.encoding import (
+    BinaryResponse,
+    ColumnarResponse,
+    Columns,
+    accepts_binary,
+    decode_frames,
+    encode_frame,
+)
+
+# 2026-01-01T00:00:00Z 的 epoch 微秒
+T0 = 1_767_225_600_000_000
+
+
+def test_frame_round_trip():
+    times = [T0, T0 + 60_000_000, T0 + 61_500_000, T0 + 3_600_000_000]
+    values = [1.25, -0.5, 3.0, 100.0]
+    data = encode_frame(7, Columns(times, values))
+    assert len(data) == 4 + 12 + 12 * len(times)
+    assert decode_frames(data) == [(7, [time // 1000 for time in times], values)]
+
+
+def test_times_are_deltas_after_the_first():
+    data = encode_frame(1, Columns([T0, T0 + 5_000, T0 + 2_000], [0.0, 0.0, 0.0]))
+    assert struct.unpack_from("<3q", data, 16) == (T0 // 1000, 5, -3)
+
+
+def test_descending_times_round_trip():
+    times = [T0 + 2_000_000, T0 + 1_000_000, T0]
+    ((_, millis, _),) = decode_frames(encode_frame(1, Columns(times, [1.0, 2.0, 3.0])))
+    assert millis == [time // 1000 for time in times]
+
+
+def test_values_are_float32():
+    ((_, _, values),) = decode_frames(encode_frame(1, Columns([T0], [0.1])))
+    assert values[0] != 0.1
+    assert values[0] == pytest.approx(0.1, rel=1e-7)
+
+
+def test_empty_series():
+    data = encode_frame(3, Columns([], []))
+    assert len(data) == 16
+    assert decode_frames(data) == [(3, [], [])]
+
+
+def test_multiple_frames():
+    series = [
+        (1, Columns([T0, T0 + 1_000], [1.0, 2.0])),
+        (2, Columns([], [])),
+        (3, Columns([T0], [4.5])),
+    ]
+    body = BinaryResponse(series).body
+    assert decode_frames(body) == [
+        (1, [T0 // 1000, T0 // 1000 + 1], [1.0, 2.0]),
+        (2, [], []),
+        (3, [T0 // 1000], [4.5]),
+    ]
+    assert decode_frames(b"") == []
+
+
+def test_corrupt_frames_are_rejected():
+    data = bytearray(encode_frame(1, Columns([T0], [1.0])))
+    with pytest.raises(ValueError):
+        decode_frames(bytes(data[:4] + b"XX" + data[6:]))
+    with pytest.raises(ValueError):
+        decode_frames(struct.pack("<I", len(data)) + bytes(data[4:]))
+
+
+@pytest.mark.parametrize(
+    ("accept", "expected"),
+    [
+        (None, False),
+        ("application/json", False),
+        ("application/vnd.smarthydra.series", True),
+        ("application/json, application/vnd.smarthydra.series;q=0.9", True),
+        ("application/vnd.smarthydra.series-v2", False),
+    ],
+)
+def test_accepts_binary(accept, expected):
+    assert accepts_binary(accept) is expected
+
+
+def test_columnar_json_uses_milliseconds():
+    columns = Columns([T0, T0 + 1_999], [1.5, 2.0])
+    assert json.loads(ColumnarResponse(columns).body) == {
+        "t": [T0 // 1000, T0 // 1000 + 1],
+        "v": [1.5, 2.0],
+    }
+    assert json.loads(ColumnarResponse([(4, columns)]).body) == [
+        {"station_id": 4, "t": [T0 // 1000, T0 // 1000 + 1], "v": [1.5, 2.0]}
+    ]
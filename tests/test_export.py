@@ -0,0 +1,101 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.database.engine import get_sessionmaker
+from app.database.schema import WaterLevelData
+from app.services.export import ExportFormat, export_measurements
+from app.services.ingest import write_points
+
+pytestmark = pytest.mark.anyio
+
+BASE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+async def readings(stations, settings):
+    settings.query.export_chunk_size = 3
+    rows = [
+        {"station_id": station_id, "measure_at": BASE + timedelta(minutes=i), "value": i / 4}
+        for station_id in (2, 1, 3)
+        for i in range(5)
+    ]
+    async with get_sessionmaker()() as session:
+        await write_points(session, WaterLevelData, rows)
+        await session.commit()
+
+
+async def export(format: ExportFormat, gzip: bool = False, **kwargs) -> list[bytes]:
+    return [
+        chunk
+        async for chunk in export_measurements(
+            WaterLevelData,
+            kwargs.get("station_ids", [1, 2]),
+            kwargs.get("start"),
+            kwargs.get("end"),
+            format,
+            gzip,
+        )
+    ]
+
+
+def expected(station_ids=(1, 2), minutes=range(5)) -> list[tuple[int, str, float]]:
+    return [
+        (station_id, (BASE + timedelta(minutes=i)).isoformat(), i / 4)
+        for station_id in station_ids
+        for i in minutes
+    ]
+
+
+async def test_csv_is_ordered_by_station_and_time(readings):
+    chunks = await export(ExportFormat.CSV)
+    # 表头、每批 3 条共 4 批、结尾（CSV 为空）
+    assert len(chunks) == 6
+    assert chunks[-1] == b""
+    lines = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+    assert lines[0] == ["station_id", "measure_at", "value"]
+    assert [(int(s), t, float(v)) for s, t, v in lines[1:]] == expected()
+
+
+async def test_ndjson_with_time_range(readings):
+    start, end = BASE + timedelta(minutes=1), BASE + timedelta(minutes=3)
+    data = b"".join(await export(ExportFormat.NDJSON, station_ids=[3], start=start, end=end))
+    rows = [json.loads(line) for line in data.decode().splitlines()]
+    # 时间范围左闭右开
+    assert [(row["station_id"], row["measure_at"], row["value"]) for row in rows] == expected(
+        (3,), range(1, 3)
+    )
+
+
+async def test_gzip_output(readings):
+    plain = b"".join(await export(ExportFormat.CSV))
+    compressed = b"".join(await export(ExportFormat.CSV, gzip=True))
+    assert gzip.decompress(compressed) == plain
+
+
+async def test_empty_export(readings):
+    assert (
+        b"".join(await export(ExportFormat.CSV, station_ids=[4]))
+        == b"station_id,measure_at,value\n"
+    )
+    assert b"".join(await export(ExportFormat.NDJSON, station_ids=[4])) == b""
+
+
+@pytest.mark.parametrize("format", [ExportFormat.PARQUET, ExportFormat.ARROW])
+async def test_columnar_formats(readings, format):
+    pa = pytest.importorskip("pyarrow")
+    data = b"".join(await export(format))
+    if format == ExportFormat.PARQUET:
+        import pyarrow.parquet as pq
+
+        file = pq.ParquetFile(io.BytesIO(data))
+        # 每批一个 row group
+        assert file.num_row_groups == 4
+        table = file.read()
+    else:
+        table = pa.ipc.open_stream(data).read_all()
+    assert table.column_names == ["station_id", "measure_at", "value"]
+    rows = zip(*(table.column(name).to_pylist() for name in table.column_names))
+    assert [(s, t.isoformat(), v) for s, t, v in rows] == expected()
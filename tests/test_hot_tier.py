@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.database.engine import get_sessionmaker
+from app.database.schema import MeasurementRow, RainfallData, WaterLevelData
+from app.router.data import read_latest, read_latest_compact
+from app.services.hot_tier import HotTier, StationRing, from_micros, to_micros
+from app.services.ingest import write_points
+
+
+def times(ring: StationRing) -> list[int]:
+    """按时间升序返回缓冲区中的时间"""
+    return [time for _, time, _ in reversed(ring.latest(ring.capacity))]
+
+
+def test_micros_round_trip():
+    value = datetime(2026, 1, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    assert from_micros(to_micros(value)) == value
+    # 不带时区的时间按UTC处理
+    assert to_micros(value.replace(tzinfo=None)) == to_micros(value)
+
+
+def test_in_order_inserts_keep_latest_capacity():
+    ring = StationRing(4)
+    for i in range(10):
+        assert ring.insert(i, i * 10, float(i))
+    assert ring.size == 4
+    assert ring.latest(2) == [(9, 90, 9.0), (8, 80, 8.0)]
+    assert times(ring) == [60, 70, 80, 90]
+
+
+def test_late_insert_is_placed_in_order():
+    ring = StationRing(5)
+    for i, time in enumerate([10, 20, 40, 50]):
+        ring.insert(i, time, float(time))
+    assert ring.insert(99, 30, 30.0)
+    assert times(ring) == [10, 20, 30, 40, 50]
+    # 已满时迟到的数据挤掉最旧的一条
+    assert ring.insert(98, 15, 15.0)
+    assert times(ring) == [15, 20, 30, 40, 50]
+    assert ring.latest(5)[-1] == (98, 15, 15.0)
+
+
+def test_insert_ignores_duplicates_and_too_old_when_full():
+    ring = StationRing(3)
+    for time in (10, 20, 30):
+        ring.insert(time, time, 1.0)
+    assert not ring.insert(1, 20, 2.0)
+    assert not ring.insert(1, 5, 2.0)
+    assert times(ring) == [10, 20, 30]
+
+
+def test_out_of_order_inserts_across_wraparound():
+    ring = StationRing(4)
+    for time in (50, 10, 40, 20, 60, 30, 70, 5):
+        ring.insert(time, time, float(time))
+    assert times(ring) == [40, 50, 60, 70]
+    assert ring.latest_columns(2) == ([70, 60], [70.0, 60.0])
+
+
+def test_discard_before():
+    ring = StationRing(5)
+    for time in (10, 20, 30, 40):
+        ring.insert(time, time, 1.0)
+    assert ring.discard_before(25) == 2
+    assert times(ring) == [30, 40]
+    ring.insert(50, 50, 1.0)
+    assert times(ring) == [30, 40, 50]
+
+
+def test_hot_tier_latest_and_capacity_miss():
+    hot_tier = HotTier(capacity=3)
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    hot_tier.add(
+        WaterLevelData,
+        [MeasurementRow(i, 1, base + timedelta(minutes=i), float(i)) for i in range(5)],
+    )
+    assert hot_tier.latest(WaterLevelData, 1, 2) == [
+        {"id": 4, "station_id": 1, "value": 4.0, "measure_at": base + timedelta(minutes=4)},
+        {"id": 3, "station_id": 1, "value": 3.0, "measure_at": base + timedelta(minutes=3)},
+    ]
+    assert hot_tier.latest(WaterLevelData, 2, 2) == []
+    assert hot_tier.latest(RainfallData, 1, 2) == []
+    assert hot_tier.latest(WaterLevelData, 1, 4) is None
+    assert hot_tier.stats().misses == 1
+
+
+@pytest.mark.anyio
+async def test_default_rows_keep_all_columns(database):
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    rows = [
+        {"station_id": 1, "measure_at": base + timedelta(minutes=i), "value": i} for i in range(3)
+    ]
+    async with get_sessionmaker()() as session:
+        await write_points(session, WaterLevelData, rows)
+        await session.commit()
+        full = await read_latest(session, WaterLevelData, 1, 2)
+        compact = await read_latest_compact(session, WaterLevelData, 1, 2)
+    assert set(full[0]) == {"id", "station_id", "value", "measure_at", "created_at", "updated_at"}
+    assert [row["value"] for row in full] == [2.0, 1.0]
+    assert compact == [{key: row[key] for key in compact[0]} for row in full]
+    assert set(compact[0]) == {"id", "station_id", "value", "measure_at"}
@@ -0,0 +1,134 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+import pytest
+from fastapi import HTTPException
+from app.database.engine import get_sessionmaker
+from app.database.schema import RainfallData, WaterLevelData
+from app.services.ingest import write_points
+from app.services.pagination import Cursor, SortOrder, decode_cursor, encode_cursor, read_page
+
+BASE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+CURSOR = Cursor(
+    table="waterleveldata",
+    station_id=1,
+    start=None,
+    end=None,
+    order=SortOrder.DESC,
+    time=1_767_225_600_000_000,
+    id=42,
+    backward=False,
+)
+
+
+def b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def assert_rejected(token: str) -> None:
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(token)
+    assert error.value.status_code == 400
+
+
+def test_cursor_round_trip():
+    token = encode_cursor(CURSOR)
+    assert "=" not in token
+    assert decode_cursor(token) == CURSOR
+
+
+def test_tampered_payload_is_rejected():
+    payload, signature = encode_cursor(CURSOR).split(".")
+    forged = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    forged["station_id"] = 2
+    assert_rejected(f"{b64(json.dumps(forged).encode())}.{signature}")
+
+
+def test_tampered_signature_is_rejected():
+    payload, signature = encode_cursor(CURSOR).split(".")
+    flipped = "A" if signature[0] != "A" else "B"
+    assert_rejected(f"{payload}.{flipped}{signature[1:]}")
+
+
+@pytest.mark.parametrize("token", ["", "abc", "a.b.c", "!!!.???", f"{b64(b'{}')}.{b64(b'x')}"])
+def test_malformed_cursor_is_rejected(token):
+    assert_rejected(token)
+
+
+def test_cursor_signed_with_another_key_is_rejected(settings):
+    token = encode_cursor(CURSOR)
+    settings.security.secret_key = "another-secret"
+    assert_rejected(token)
+
+
+@pytest.fixture
+async def readings(database):
+    async with get_sessionmaker()() as session:
+        for station_id in (1, 2):
+            rows = [
+                {"station_id": station_id, "measure_at": BASE + timedelta(minutes=i), "value": i}
+                for i in range(10)
+            ]
+            await write_points(session, WaterLevelData, rows)
+        await session.commit()
+
+
+async def page(order: SortOrder, cursor: str | None = None, station_id: int = 1, **kwargs):
+    async with get_sessionmaker()() as session:
+        return await read_page(
+            session,
+            kwargs.get("model", WaterLevelData),
+            station_id,
+            kwargs.get("start"),
+            None,
+            order,
+            4,
+            cursor,
+        )
+
+
+def values(result) -> list[float]:
+    return [item.value for item in result.data]
+
+
+@pytest.mark.anyio
+async def test_pages_forward_and_back(readings):
+    first = await page(SortOrder.DESC)
+    assert values(first) == [9, 8, 7, 6]
+    assert first.prev_cursor is None
+    second = await page(SortOrder.DESC, first.next_cursor)
+    assert values(second) == [5, 4, 3, 2]
+    last = await page(SortOrder.DESC, second.next_cursor)
+    assert values(last) == [1, 0]
+    assert last.next_cursor is None
+
+    back = await page(SortOrder.DESC, last.prev_cursor)
+    assert values(back) == [5, 4, 3, 2]
+    assert values(await page(SortOrder.DESC, back.prev_cursor)) == [9, 8, 7, 6]
+
+
+@pytest.mark.anyio
+async def test_ascending_pages_cover_every_row_once(readings):
+    seen, cursor = [], None
+    while True:
+        result = await page(SortOrder.ASC, cursor)
+        seen += values(result)
+        cursor = result.next_cursor
+        if cursor is None:
+            break
+    assert seen == list(range(10))
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "changed",
+    [{"station_id": 2}, {"model": RainfallData}, {"start": BASE}],
+)
+async def test_cursor_rejected_for_other_query(readings, changed):
+    cursor = (await page(SortOrder.DESC)).next_cursor
+    with pytest.raises(HTTPException) as error:
+        await page(SortOrder.DESC, cursor, **changed)
+    assert error.value.status_code == 400
+    with pytest.raises(HTTPException):
+        await page(SortOrder.ASC, cursor)
@@ -0,0 +1,112 @@
+import math
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.database.engine import get_sessionmaker
+from app.database.schema import WaterLevelData
+from app.services.ingest import write_points
+from app.services.series import Aggregation, coarsen, lttb, query_series
+
+BASE = datetime(2026, 1, 5, tzinfo=timezone.utc)  # 周一
+
+
+def test_lttb_keeps_all_points_under_threshold():
+    xs = [float(i) for i in range(10)]
+    assert lttb(xs, xs, 10) == list(range(10))
+    assert lttb(xs, xs, 20) == list(range(10))
+
+
+def test_lttb_small_thresholds():
+    xs = [float(i) for i in range(10)]
+    assert lttb(xs, xs, 2) == [0, 9]
+    assert lttb(xs, xs, 1) == [0]
+    assert lttb(xs, xs, 0) == []
+
+
+def test_lttb_selects_increasing_indices_and_keeps_peaks():
+    n = 1000
+    xs = [float(i) for i in range(n)]
+    ys = [math.sin(i / 50) for i in range(n)]
+    ys[437] = 10.0
+    ys[712] = -10.0
+    selected = lttb(xs, ys, 50)
+    assert len(selected) == 50
+    assert selected[0] == 0 and selected[-1] == n - 1
+    assert selected == sorted(set(selected))
+    assert 437 in selected and 712 in selected
+
+
+@pytest.mark.parametrize(
+    ("aggregation", "span", "limit", "expected"),
+    [
+        (Aggregation.MINUTE, timedelta(hours=2), 1000, Aggregation.MINUTE),
+        (Aggregation.MINUTE, timedelta(days=2), 1000, Aggregation.HOUR),
+        (Aggregation.MINUTE, timedelta(days=365), 1000, Aggregation.DAY),
+        (Aggregation.HOUR, timedelta(days=3650), 100, Aggregation.MONTH),
+        (Aggregation.DAY, timedelta(days=3650), 1000, Aggregation.WEEK),
+        (Aggregation.MONTH, timedelta(days=36500), 10, Aggregation.MONTH),
+        (Aggregation.RAW, timedelta(days=365), 10, Aggregation.RAW),
+    ],
+)
+def test_coarsen(aggregation, span, limit, expected):
+    assert coarsen(aggregation, BASE, BASE + span, limit) == expected
+
+
+def test_coarsen_boundary_is_inclusive():
+    # 恰好 limit 个桶时不改变粒度
+    assert coarsen(Aggregation.HOUR, BASE, BASE + timedelta(hours=24), 24) == Aggregation.HOUR
+    assert coarsen(Aggregation.HOUR, BASE, BASE + timedelta(hours=25), 24) == Aggregation.DAY
+
+
+async def insert(points: list[tuple[datetime, float]]) -> None:
+    rows = [{"station_id": 1, "measure_at": t, "value": v} for t, v in points]
+    async with get_sessionmaker()() as session:
+        await write_points(session, WaterLevelData, rows)
+        await session.commit()
+
+
+async def series(aggregation: Aggregation, start: datetime, end: datetime):
+    async with get_sessionmaker()() as session:
+        return await query_series(session, WaterLevelData, 1, start, end, aggregation)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("use_rollups", [False, True])
+async def test_hour_buckets_truncate_to_bucket_start(database, settings, use_rollups):
+    settings.query.use_rollups = use_rollups
+    await insert(
+        [
+            (BASE + timedelta(minutes=59, seconds=59, microseconds=600000), 1.0),
+            (BASE + timedelta(hours=1), 3.0),
+            (BASE + timedelta(hours=1, minutes=30), 5.0),
+        ]
+    )
+    result = await series(Aggregation.HOUR, BASE, BASE + timedelta(hours=3))
+    assert result.aggregation == Aggregation.HOUR
+    assert [(p.t, p.count, p.value) for p in result.points] == [
+        (BASE, 1, 1.0),
+        (BASE + timedelta(hours=1), 2, 4.0),
+    ]
+
+
+@pytest.mark.anyio
+async def test_week_and_month_buckets(database, settings):
+    settings.query.use_rollups = False
+    sunday = BASE + timedelta(days=6, hours=23)
+    await insert(
+        [(BASE + timedelta(hours=1), 1.0), (sunday, 2.0), (sunday + timedelta(hours=2), 4.0)]
+    )
+
+    weeks = await series(Aggregation.WEEK, BASE, BASE + timedelta(days=14))
+    assert [(p.t, p.count) for p in weeks.points] == [(BASE, 2), (BASE + timedelta(days=7), 1)]
+
+    months = await series(Aggregation.MONTH, BASE, BASE + timedelta(days=14))
+    assert [(p.t, p.count) for p in months.points] == [
+        (datetime(2026, 1, 1, tzinfo=timezone.utc), 3)
+    ]
+
+
+@pytest.mark.anyio
+async def test_query_series_coarsens_to_max_points(database, settings):
+    settings.query.max_points = 10
+    result = await series(Aggregation.MINUTE, BASE, BASE + timedelta(hours=2))
+    assert result.aggregation == Aggregation.HOUR